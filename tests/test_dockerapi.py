@@ -0,0 +1,153 @@
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+
+from wireless_emulator.dockerapi import DockerClient, DockerApiError, demultiplexStream
+
+def httpResponse(status, body=b'', reason='OK'):
+    return (('HTTP/1.1 %d %s\r\nContent-Length: %d\r\nContent-Type: application/json\r\n\r\n' %
+             (status, reason, len(body))).encode('ascii') + body)
+
+def streamFrame(streamType, payload):
+    return struct.pack('>BxxxL', streamType, len(payload)) + payload
+
+class FakeDockerDaemon:
+    """Serves canned HTTP responses on a temporary UNIX socket.
+
+    Every request received takes the next of the responses, a response None closes the connection without answering,
+    like a daemon closing an idle persistent connection. The requests received are kept as (method, path).
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.connections = 0
+        self.directory = tempfile.mkdtemp()
+        self.socketPath = os.path.join(self.directory, 'docker.sock')
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.socketPath)
+        self.server.listen(5)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.close()
+        os.unlink(self.socketPath)
+        os.rmdir(self.directory)
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            with conn:
+                self.serve(conn)
+
+    def serve(self, conn):
+        reader = conn.makefile('rb')
+        while True:
+            requestLine = reader.readline()
+            if not requestLine:
+                return
+            method, path, _ = requestLine.decode('ascii').split(' ', 2)
+            length = 0
+            while True:
+                line = reader.readline().decode('ascii').strip()
+                if not line:
+                    break
+                name, value = line.split(':', 1)
+                if name.lower() == 'content-length':
+                    length = int(value)
+            reader.read(length)
+            self.requests.append((method, path))
+            response = self.responses.pop(0)
+            if response is None:
+                return
+            conn.sendall(response)
+
+class DockerClientTest(unittest.TestCase):
+
+    def startDaemon(self, responses):
+        daemon = FakeDockerDaemon(responses)
+        self.addCleanup(daemon.close)
+        client = DockerClient(daemon.socketPath, timeout=5)
+        self.addCleanup(client.closeConnection)
+        return daemon, client
+
+    def testJsonResponse(self):
+        daemon, client = self.startDaemon([httpResponse(200, b'[{"Id": "abc"}]')])
+        self.assertEqual(client.listContainers(), [{'Id': 'abc'}])
+        self.assertEqual(daemon.requests[0][0], 'GET')
+
+    def testPersistentConnectionIsReused(self):
+        daemon, client = self.startDaemon([httpResponse(200, b'[]'), httpResponse(200, b'[]')])
+        client.listContainers()
+        client.listNetworks()
+        self.assertEqual(daemon.connections, 1)
+
+    def testStaleConnectionIsRetried(self):
+        # the daemon closes the persistent connection when the second request comes
+        daemon, client = self.startDaemon([httpResponse(200, b'[]'), None, httpResponse(200, b'[{"Id": "abc"}]')])
+        client.listContainers()
+        self.assertEqual(client.listContainers(), [{'Id': 'abc'}])
+        self.assertEqual(len(daemon.requests), 3)
+        self.assertEqual(daemon.connections, 2)
+
+    def testSentPostIsNotRetried(self):
+        daemon, client = self.startDaemon([httpResponse(200, b'[]'), None, httpResponse(200, b'[]')])
+        client.listContainers()
+        with self.assertRaises(ConnectionError):
+            client.renameContainer('NE1', 'NE2')
+        self.assertEqual([method for method, path in daemon.requests], ['GET', 'POST'])
+        # the connection was reset, the next request is sent on a new one
+        self.assertEqual(client.listContainers(), [])
+        self.assertEqual(daemon.connections, 2)
+
+    def testErrorStatusRaisesDockerApiError(self):
+        daemon, client = self.startDaemon([httpResponse(404, json.dumps({'message': 'No such container: NE1'}).encode(),
+                                                        reason='Not Found'),
+                                           httpResponse(200, b'[]')])
+        with self.assertRaises(DockerApiError) as context:
+            client.startContainer('NE1')
+        self.assertEqual(context.exception.status, 404)
+        self.assertEqual(context.exception.message, 'No such container: NE1')
+        # an error status leaves the connection usable
+        self.assertEqual(client.listContainers(), [])
+        self.assertEqual(daemon.connections, 1)
+
+    def testMissingSocketKeepsRaisingTheSameError(self):
+        client = DockerClient(os.path.join(tempfile.gettempdir(), 'wte-missing-docker.sock'), timeout=5)
+        for attempt in range(0, 2):
+            with self.assertRaises(FileNotFoundError):
+                client.listContainers()
+
+    def testExecOutputIsDemultiplexed(self):
+        output = streamFrame(1, b'out1 ') + streamFrame(2, b'err') + streamFrame(1, b'out2')
+        daemon, client = self.startDaemon([httpResponse(201, b'{"Id": "e1"}'),
+                                           httpResponse(200, output),
+                                           httpResponse(200, b'{"ExitCode": 3}')])
+        self.assertEqual(client.execInContainer('NE1', ['ip', 'link']), (3, b'out1 out2', b'err'))
+        self.assertEqual([path for method, path in daemon.requests],
+                         ['/containers/NE1/exec', '/exec/e1/start', '/exec/e1/json'])
+
+class DemultiplexStreamTest(unittest.TestCase):
+
+    def testStdoutAndStderr(self):
+        data = streamFrame(1, b'a') + streamFrame(2, b'b') + streamFrame(1, b'') + streamFrame(1, b'cd')
+        self.assertEqual(demultiplexStream(data), (b'acd', b'b'))
+
+    def testEmptyStream(self):
+        self.assertEqual(demultiplexStream(b''), (b'', b''))
+
+    def testTruncatedHeaderIsIgnored(self):
+        data = streamFrame(2, b'err') + b'\x01\x00\x00'
+        self.assertEqual(demultiplexStream(data), (b'', b'err'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import ipaddress
+import os
+import tempfile
+import unittest
+
+from wireless_emulator.benchmark import allocateFromLists
+from wireless_emulator.ip import AddressAllocator, InterfaceIPFactory, ManagementNetworkIPFactory, MacAddressFactory
+from wireless_emulator.leases import LeaseStore
+
+class AddressAllocationTest(unittest.TestCase):
+
+    def testSameAddressesAsTheLists(self):
+        # the addresses are handed out in the order of the lists of the former implementation
+        for network in ['192.168.0.0/24', '10.10.0.0/20']:
+            numberOfNes = 64
+            listsAddresses, freeNetworkIpList, freeInterfaceIpList = allocateFromLists(network, numberOfNes)
+            mgmtIpFactory = ManagementNetworkIPFactory(network)
+            intfIpFactory = InterfaceIPFactory(network)
+            addresses = [(mgmtIpFactory.getFreeManagementNetworkIP(), intfIpFactory.getFreeInterfaceIp())
+                         for i in range(numberOfNes)]
+            self.assertEqual(addresses, listsAddresses, network)
+            self.assertEqual(mgmtIpFactory.freeNetworkIps.getNumberOfFreeValues(), len(freeNetworkIpList))
+            self.assertEqual(intfIpFactory.getNumberOfFreeInterfaceIpAddresses(), len(freeInterfaceIpList))
+
+    def testReleasedAddressesComeLast(self):
+        # as with pop(0) and append(), a released address is given again once all the others were used
+        intfIpFactory = InterfaceIPFactory('10.0.0.0/29')
+        addresses = [intfIpFactory.getFreeInterfaceIp() for i in range(3)]
+        intfIpFactory.returnBackUnusedIp(addresses[1])
+        intfIpFactory.returnBackUnusedIp(addresses[0])
+        others = [intfIpFactory.getFreeInterfaceIp() for i in range(3)]
+        self.assertEqual([str(address) for address in others], ['10.0.0.4', '10.0.0.5', '10.0.0.6'])
+        self.assertEqual(intfIpFactory.getFreeInterfaceIp(), addresses[1])
+        self.assertEqual(intfIpFactory.getFreeInterfaceIp(), addresses[0])
+        self.assertIsNone(intfIpFactory.getFreeInterfaceIp())
+
+    def testExhaustedManagementNetwork(self):
+        mgmtIpFactory = ManagementNetworkIPFactory('192.168.0.0/29')
+        self.assertEqual(mgmtIpFactory.getFreeManagementNetworkIP(), ipaddress.ip_network('192.168.0.0/30'))
+        self.assertEqual(mgmtIpFactory.getFreeManagementNetworkIP(), ipaddress.ip_network('192.168.0.4/30'))
+        self.assertIsNone(mgmtIpFactory.getFreeManagementNetworkIP())
+
+    def testLargeNetworkIsNotMaterialized(self):
+        mgmtIpFactory = ManagementNetworkIPFactory('10.0.0.0/8')
+        intfIpFactory = InterfaceIPFactory('10.0.0.0/8')
+        self.assertEqual(mgmtIpFactory.freeNetworkIps.getNumberOfFreeValues(), 2 ** 22)
+        self.assertEqual(intfIpFactory.getNumberOfFreeInterfaceIpAddresses(), 2 ** 24 - 2)
+        self.assertEqual(str(intfIpFactory.getFreeInterfaceIp()), '10.0.0.1')
+
+    def testReservedValuesAreSkipped(self):
+        allocator = AddressAllocator(100, 4, 2)
+        allocator.reserve(102)
+        allocator.reserve(200)
+        self.assertEqual([allocator.allocate() for i in range(4)], [100, 104, 106, None])
+
+class MacAddressTest(unittest.TestCase):
+
+    def testDerivedFromTheIds(self):
+        factory = MacAddressFactory()
+        self.assertEqual(factory.generateMacAddress(1, 2, 'NE1/ai1'), '00:00:00:00:01:02')
+        self.assertEqual(factory.generateMacAddress(0x123456, 0xff, 'NE2/ai1'), '00:00:12:34:56:ff')
+
+    def testLeasesAreKeptAcrossRestarts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fileName = os.path.join(directory, 'leases.jsonl')
+            factory = MacAddressFactory(LeaseStore(fileName))
+            self.assertEqual(factory.generateMacAddress(1, 1, 'NE1/ai1'), '00:00:00:00:01:01')
+
+            # NE1 is now the second NE of the topology, and another NE has its former id
+            factory = MacAddressFactory(LeaseStore(fileName))
+            otherMacAddress = factory.generateMacAddress(1, 1, 'NE0/ai1')
+            self.assertEqual(factory.generateMacAddress(2, 1, 'NE1/ai1'), '00:00:00:00:01:01')
+            self.assertNotEqual(otherMacAddress, '00:00:00:00:01:01')
+
+    def testTakenAddressIsDerivedFromTheKey(self):
+        factory = MacAddressFactory()
+        first = factory.generateMacAddress(1, 1, 'NE1/ai1')
+        second = factory.generateMacAddress(1, 1, 'NE1/ai2')
+        self.assertNotEqual(second, first)
+        self.assertIsNotNone(second)
+        # locally administered and unicast
+        self.assertEqual(int(second.split(':')[0], 16) & 0x03, 0x02)
+        self.assertEqual(len(bytes.fromhex(second.replace(':', ''))), 6)
+
+    def testPortIdTooLargeForTheAddress(self):
+        macAddress = MacAddressFactory().generateMacAddress(1, 300, 'NE1/ai300')
+        self.assertEqual(len(macAddress.split(':')), 6)
+        self.assertTrue(macAddress.startswith('02:'))
+
+    def testReleasedAddressIsGivenAgainToItsInterface(self):
+        factory = MacAddressFactory()
+        macAddress = factory.generateMacAddress(1, 1, 'NE1/ai1')
+        factory.releaseMacAddress(macAddress)
+        self.assertEqual(factory.generateMacAddress(1, 1, 'NE1/ai1'), macAddress)
+
+if __name__ == '__main__':
+    unittest.main()
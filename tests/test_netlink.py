@@ -0,0 +1,30 @@
+import struct
+import unittest
+
+from wireless_emulator.netlink import IFINFOMSG, IFLA_ADDRESS, IFLA_IFNAME, IFLA_NET_NS_PID, RTATTR_HEADER, \
+    packInterface
+
+def unpackAttributes(data):
+    attributes = {}
+    offset = 0
+    while offset + RTATTR_HEADER.size <= len(data):
+        length, attrType = RTATTR_HEADER.unpack_from(data, offset)
+        attributes[attrType] = data[offset + RTATTR_HEADER.size:offset + length]
+        offset += (length + 3) & ~3
+    return attributes
+
+class PackInterfaceTest(unittest.TestCase):
+
+    def testNameNamespaceAndMacAddress(self):
+        attributes = unpackAttributes(packInterface('ai1', 1234, macAddress='00:00:00:00:01:02')[IFINFOMSG.size:])
+        self.assertEqual(attributes[IFLA_IFNAME], b'ai1\0')
+        self.assertEqual(struct.unpack('=I', attributes[IFLA_NET_NS_PID])[0], 1234)
+        self.assertEqual(attributes[IFLA_ADDRESS], b'\x00\x00\x00\x00\x01\x02')
+
+    def testWithoutMacAddress(self):
+        attributes = unpackAttributes(packInterface('ety1', 1234, 7)[IFINFOMSG.size:])
+        self.assertNotIn(IFLA_ADDRESS, attributes)
+        self.assertEqual(IFINFOMSG.unpack_from(packInterface('ety1', 1234, 7))[2], 7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import contextlib
+import io
+import threading
+import unittest
+import xml.etree.ElementTree as ET
+
+from wireless_emulator.benchmark import StubOdlController
+from wireless_emulator.odlregistration import ControllerBalancer, ODL_CONNECTIONS, createNewXmlPayloadForOdl, \
+    registerNesToOdl, renderOdlNodePayload, unregisterNesFromOdlInParallel, registerNeToOdlNewVersion, \
+    getControllerName
+
+class StubOdlControllerTestCase(unittest.TestCase):
+
+    def startController(self, latency=0.0):
+        server = StubOdlController(latency)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+class OdlPayloadTest(unittest.TestCase):
+
+    def testPayloadIsTheSameAsTheElementTree(self):
+        for neUuid, neManagementIp, nePort in [('NE1', '192.168.0.1', 12001), ('NE<&>"2', '10.0.0.2', 830)]:
+            expected = ET.tostring(createNewXmlPayloadForOdl(neUuid, neManagementIp, nePort).getroot())
+            self.assertEqual(renderOdlNodePayload(neUuid, neManagementIp, nePort), expected)
+
+class BulkRegistrationTest(StubOdlControllerTestCase):
+
+    def testMountAndUnmountAll(self):
+        server = self.startController(0.005)
+        balancer = ControllerBalancer([server.getControllerInfo()])
+        nodes = [("NE%d" % i, "192.168.0.%d" % i, 12000 + i) for i in range(1, 41)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(registerNesToOdl(balancer, nodes), [])
+            self.assertEqual(len(balancer.getMounts()), 40)
+            self.assertEqual(unregisterNesFromOdlInParallel(balancer, [node[0] for node in nodes]), [])
+        self.assertEqual(server.requests, {'PUT': 40, 'DELETE': 40})
+        self.assertEqual(balancer.getMounts(), {})
+        # the requests go through the keep-alive connections of the pool
+        self.assertLessEqual(server.connections, ODL_CONNECTIONS)
+
+class FailoverTest(StubOdlControllerTestCase):
+
+    def testUnmountTriesTheNextControllerOn404(self):
+        servers = [self.startController(), self.startController()]
+        balancer = ControllerBalancer([server.getControllerInfo() for server in servers])
+        with contextlib.redirect_stdout(io.StringIO()):
+            # mounted by another run on both controllers, the balancer does not know where
+            for server in servers:
+                registerNeToOdlNewVersion(server.getControllerInfo(), 'NE1', '192.168.0.1', 12001)
+            self.assertTrue(balancer.unregisterNetworkElement('NE1'))
+            self.assertTrue(balancer.unregisterNetworkElement('NE1'))
+            # not mounted anywhere
+            self.assertFalse(balancer.unregisterNetworkElement('NE1'))
+        self.assertEqual(sorted(server.requests['DELETE'] for server in servers), [2, 3])
+
+    def testNesOfAFailedControllerAreMountedOnTheNextOne(self):
+        servers = [self.startController(), self.startController()]
+        controllers = [server.getControllerInfo() for server in servers]
+        balancer = ControllerBalancer(controllers)
+        nodes = [("NE%d" % i, "192.168.0.%d" % i, 12000 + i) for i in range(1, 21)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(registerNesToOdl(balancer, nodes), [])
+            self.assertEqual(balancer.checkControllers(), [])
+
+            mounts = balancer.getMounts()
+            failedNes = sorted(neUuid for neUuid, name in mounts.items() if name == getControllerName(controllers[0]))
+            self.assertTrue(0 < len(failedNes) < len(nodes))
+            servers[0].available = False
+            self.assertEqual(sorted(balancer.checkControllers()), failedNes)
+
+        self.assertEqual(set(balancer.getMounts().values()), {getControllerName(controllers[1])})
+        self.assertEqual(servers[1].requests['PUT'], len(nodes))
+        # only the NEs of the failed controller were mounted again
+        self.assertEqual(balancer.getStatistics()[1]['mounts'], len(nodes))
+
+if __name__ == '__main__':
+    unittest.main()
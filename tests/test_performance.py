@@ -0,0 +1,53 @@
+import copy
+import datetime
+import unittest
+import xml.etree.ElementTree as ET
+
+from xmlbaseline import XML_CONFIG_FILE, XML_STATUS_FILE, maskTimestamps
+
+from wireless_emulator.benchmark import HISTORICAL_PERFORMANCES_LAYERS, addHistoricalPerformancesDeepCopy
+from wireless_emulator.performance import addHistoricalPerformancesRecords, getHistoricalPerformancesValues, \
+    formatTimestamp
+from wireless_emulator.xmltemplates import XmlTemplates
+
+class HistoricalPerformancesTest(unittest.TestCase):
+
+    def getTemplateNodes(self):
+        templates = XmlTemplates(XML_CONFIG_FILE, XML_STATUS_FILE)
+        for layer, (templateName, path) in sorted(HISTORICAL_PERFORMANCES_LAYERS.items()):
+            yield layer, getattr(templates, templateName).find(path)
+
+    def testRecordsAreTheSameAsTheDeepCopies(self):
+        # only the timestamps can differ from the records deep copied from the template
+        for layer, templateNode in self.getTemplateNodes():
+            deepCopied = copy.deepcopy(templateNode)
+            addHistoricalPerformancesDeepCopy(deepCopied)
+            compact = copy.deepcopy(templateNode)
+            addHistoricalPerformancesRecords(compact)
+            self.assertEqual(maskTimestamps(ET.tostring(compact)), maskTimestamps(ET.tostring(deepCopied)), layer)
+
+    def testRecordsAreComputedFromOneTimestamp(self):
+        timeNow = datetime.datetime(2026, 3, 1, 10, 0, 0, 123456)
+        layer, templateNode = next(self.getTemplateNodes())
+        parentNode = copy.deepcopy(templateNode)
+        addHistoricalPerformancesRecords(parentNode, timeNow)
+
+        records = parentNode.findall('historical-performance-data-list')
+        self.assertEqual(len(records), 103)
+        self.assertEqual([record.find('history-data-id').text for record in records], [str(i) for i in range(103)])
+        self.assertEqual([record.find('granularity-period').text for record in records],
+                         ['period-15-min'] * 96 + ['period-24-hours'] * 7)
+        self.assertEqual(records[0].find('period-end-time').text, '2026-03-01T10:00:00.1Z')
+        self.assertEqual(records[95].find('period-end-time').text,
+                         formatTimestamp(timeNow - datetime.timedelta(minutes=15 * 95)))
+        self.assertEqual(records[102].find('period-end-time').text, '2026-02-23T10:00:00.1Z')
+
+    def testValuesOfTheRecords(self):
+        values = getHistoricalPerformancesValues(datetime.datetime(2026, 3, 1, 0, 0, 0))
+        self.assertEqual(values[1], {'history-data-id': '1', 'granularity-period': 'period-15-min',
+                                     'suspect-interval-flag': 'false', 'period-end-time': '2026-02-28T23:45:00.0Z'})
+        self.assertEqual(values[97], {'history-data-id': '97', 'granularity-period': 'period-24-hours',
+                                      'suspect-interval-flag': 'false', 'period-end-time': '2026-02-28T00:00:00.0Z'})
+
+if __name__ == '__main__':
+    unittest.main()
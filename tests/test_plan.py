@@ -0,0 +1,58 @@
+import json
+import unittest
+
+from xmlbaseline import getTopologyFile
+
+from wireless_emulator.plan import validateTopology
+
+def loadTopology(topologyName):
+    with open(getTopologyFile(topologyName)) as f:
+        return json.load(f)
+
+def getLtp(topoJson, neUuid, ltpId):
+    for ne in topoJson['network-elements']:
+        if ne['network-element']['uuid'] != neUuid:
+            continue
+        for intf in ne['network-element']['interfaces']:
+            for port in intf['LTPs']:
+                if port['id'] == ltpId:
+                    return port
+    raise KeyError(ltpId)
+
+class ValidateTopologyTest(unittest.TestCase):
+
+    def testTopologiesAreValid(self):
+        for topologyName in ['topology_ring_3', 'topology_mesh_4', 'topology_custom_4', 'berlin-lab-v1']:
+            self.assertEqual(validateTopology(loadTopology(topologyName)), [], topologyName)
+
+    def testMissingServerLtp(self):
+        topoJson = loadTopology('topology_ring_3')
+        getLtp(topoJson, 'NE1', 'pe1')['serverLTPs'] = [{'id': 'ai9'}]
+        getLtp(topoJson, 'NE2', 'me1')['serverLTPs'] = [{'uuid': 'pe1'}]
+        self.assertEqual(validateTopology(topoJson),
+                         ["The server LTP=ai9 of LTP=pe1 of NE=NE1 is not an LTP of the NE",
+                          "LTP=me1 of NE=NE2 has a server LTP which is not an object with a string id: "
+                          "{'uuid': 'pe1'}"])
+
+    def testMissingServerLtpList(self):
+        topoJson = loadTopology('topology_ring_3')
+        del getLtp(topoJson, 'NE2', 'me2')['serverLTPs']
+        getLtp(topoJson, 'NE1', 'pe2')['serverLTPs'] = [{'id': 'ai1'}, {'id': 'ety3'}]
+        self.assertEqual(validateTopology(topoJson),
+                         ["The server LTP=ety3 of LTP=pe2 of NE=NE1 is not an LTP of the NE",
+                          "ETC LTP=me2 of NE=NE2 has no serverLTPs list"])
+
+    def testMissingKeys(self):
+        topoJson = loadTopology('topology_ring_3')
+        del getLtp(topoJson, 'NE1', 'ai1')['physical-port-reference']
+        del getLtp(topoJson, 'NE2', 'ety2')['physical-port-reference']
+        del getLtp(topoJson, 'NE3', 'pe1')['conditional-package']
+        getLtp(topoJson, 'NE3', 'ai2')['supportedAlarms'] = None
+        self.assertEqual(validateTopology(topoJson),
+                         ["MWPS LTP=ai1 of NE=NE1 has no physical-port-reference",
+                          "ETY LTP=ety2 of NE=NE2 has no physical-port-reference",
+                          "LTP=ai2 of NE=NE3 has supportedAlarms which is not a string: None",
+                          "MWS LTP=pe1 of NE=NE3 has no conditional-package"])
+
+if __name__ == '__main__':
+    unittest.main()
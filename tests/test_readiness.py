@@ -0,0 +1,67 @@
+import socket
+import threading
+import unittest
+from timeit import default_timer as timer
+
+from wireless_emulator.benchmark import StubNetconfServers
+from wireless_emulator.readiness import NetconfReadinessProber
+
+class NetconfReadinessTest(unittest.TestCase):
+
+    def startServers(self, readyDelays):
+        servers = StubNetconfServers(readyDelays)
+        self.addCleanup(servers.stop)
+        return servers
+
+    def startProber(self, timeout, interval=0.05):
+        prober = NetconfReadinessProber(timeout=timeout, interval=interval)
+        self.addCleanup(prober.stop)
+        return prober
+
+    def testNetworkElementsAreRegisteredAfterTheirBanner(self):
+        readyDelays = [0.0, 0.2, 0.4, 0.6]
+        servers = self.startServers(readyDelays)
+        # the stand-ins accept the connections before they are ready, as docker-proxy does
+        for port in servers.ports:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+
+        prober = self.startProber(timeout=10)
+        registrationTimes = {}
+        lock = threading.Lock()
+        def onReady(index, ready):
+            with lock:
+                registrationTimes[index] = (timer(), ready)
+        futures = [prober.submitNetworkElement("NE%d" % index, '127.0.0.1', port,
+                                               onReady=lambda ready, index=index: onReady(index, ready))
+                   for index, port in enumerate(servers.ports)]
+        self.assertEqual([future.result(timeout=10) for future in futures], [True] * len(readyDelays))
+
+        for index, readyTime in enumerate(servers.readyTimes):
+            registrationTime, ready = registrationTimes[index]
+            self.assertTrue(ready)
+            self.assertGreaterEqual(registrationTime, readyTime)
+
+        statistics = prober.getStatistics()
+        self.assertEqual(statistics['ready'], len(readyDelays))
+        self.assertEqual(statistics['notReady'], 0)
+        self.assertEqual(statistics['histogram'][-1], {'le': '+Inf', 'count': len(readyDelays)})
+
+    def testNotReadyBeforeTheTimeout(self):
+        servers = self.startServers([60.0])
+        prober = self.startProber(timeout=0.3)
+        results = []
+        future = prober.submitNetworkElement('NE1', '127.0.0.1', servers.ports[0], onReady=results.append)
+        self.assertIs(future.result(timeout=10), False)
+        self.assertEqual(results, [False])
+        self.assertEqual(prober.getStatistics()['notReady'], 1)
+
+    def testProbingIsDisabled(self):
+        prober = self.startProber(timeout=0)
+        results = []
+        future = prober.submitNetworkElement('NE1', '127.0.0.1', 1, onReady=results.append)
+        self.assertIsNone(future.result(timeout=10))
+        self.assertEqual(results, [None])
+        self.assertEqual(prober.getStatistics()['ready'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from xmlbaseline import createEmulator, renderNetworkElements, releaseEmulator, getTopologyFile
+
+import wireless_emulator.networkelement as NE
+from wireless_emulator.emulator import Emulator
+from wireless_emulator.link import Link
+
+class ReloadTopologyTestCase(unittest.TestCase):
+    """The ring of three NEs, compiled without docker; the steps of a reload which use docker do nothing."""
+
+    def setUp(self):
+        self.addCleanup(releaseEmulator)
+        self.emulator = createEmulator('topology_ring_3')
+        renderNetworkElements(self.emulator)
+        self.failingNetworkElements = set()
+        for name, function in [('provisionNetworkElement', self.provisionNetworkElement),
+                               ('removeNetworkElement', lambda neObj, unregister: None),
+                               ('addInterfacesInDockerContainer', lambda neObj: None)]:
+            patcher = mock.patch.object(Emulator, name, side_effect=function)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for target, name in [(Link, 'addLink'), (Link, 'removeLink'),
+                             (NE.NetworkElement, 'addLinkEndInDockerContainer')]:
+            patcher = mock.patch.object(target, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def provisionNetworkElement(self, neObj):
+        if neObj.uuid in self.failingNetworkElements:
+            raise RuntimeError("Could not start the container of NE=%s" % neObj.uuid)
+
+    def writeTopology(self, portReference):
+        # the ring, with another physical port of NE2
+        with open(getTopologyFile('topology_ring_3')) as f:
+            topoJson = json.load(f)
+        for intf in topoJson['network-elements'][1]['network-element']['interfaces']:
+            if intf['layer'] == 'ETY':
+                intf['LTPs'][0]['physical-port-reference'] = portReference
+        fileName = os.path.join(self.directory, 'topology-%s.json' % portReference.replace(':', '-'))
+        with open(fileName, 'w') as f:
+            json.dump(topoJson, f)
+        return fileName
+
+    def reload(self, fileName):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.emulator.reloadTopology(fileName)
+
+    def getClaimedLeases(self):
+        # the ports and MAC addresses which cannot be given to another NE
+        emulator = self.emulator
+        return (set(emulator.netconfPortFactory.usedPorts), set(emulator.sshPortFactory.usedPorts),
+                set(emulator.macAddressFactory.generatedAddresses))
+
+class CompileFailureTest(ReloadTopologyTestCase):
+
+    def testLeasesAreGivenBackToTheRunningNes(self):
+        networkElements = list(self.emulator.networkElementList)
+        claimedLeases = self.getClaimedLeases()
+        with mock.patch.object(NE.NetworkElement, 'buildNetworkElementXml',
+                               side_effect=AttributeError("'NoneType' object has no attribute 'getInterfaceName'")):
+            self.assertFalse(self.reload(self.writeTopology('shelf9:slot1:card-type:port1')))
+        self.assertEqual(self.emulator.networkElementList, networkElements)
+        self.assertEqual(self.getClaimedLeases(), claimedLeases)
+
+        # NE2 gets its addresses and ports again when the topology is reloaded
+        self.assertTrue(self.reload(self.writeTopology('shelf9:slot1:card-type:port1')))
+        self.assertEqual(self.getClaimedLeases(), claimedLeases)
+        self.assertIsNot(self.emulator.getNeByName('NE2'), networkElements[1])
+
+class ApplyFailureTest(ReloadTopologyTestCase):
+
+    def testFailedNesAreCreatedAgainByTheNextReload(self):
+        fileName = self.writeTopology('shelf9:slot1:card-type:port1')
+        self.failingNetworkElements.add('NE2')
+        self.assertFalse(self.reload(fileName))
+        self.assertEqual(self.emulator.failedNetworkElements, {'NE2'})
+
+        # the same topology again, NE2 did not change but was not created
+        self.failingNetworkElements.clear()
+        self.assertTrue(self.reload(fileName))
+        self.assertEqual(self.emulator.failedNetworkElements, set())
+        self.assertEqual([call[0][0].uuid for call in Emulator.provisionNetworkElement.call_args_list],
+                         ['NE2', 'NE2'])
+
+        # and once it is created, the topology did not change
+        self.assertTrue(self.reload(fileName))
+        self.assertEqual(Emulator.provisionNetworkElement.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
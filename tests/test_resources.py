@@ -0,0 +1,115 @@
+import collections
+import itertools
+import os
+import tempfile
+import unittest
+
+from wireless_emulator.resources import CGROUP_V1, CGROUP_V2, ContainerCgroup, ResourceSampler, getCgroupMounts, \
+    readInterfaceFlags, isInterfaceUp
+
+def writeFiles(directory, files):
+    for name, content in files.items():
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(content)
+
+def createCgroup(version, cpuDirectory, memoryDirectory):
+    # the cgroup of a container, without the /proc files of its process
+    cgroup = ContainerCgroup.__new__(ContainerCgroup)
+    cgroup.version = version
+    cgroup.cpuDirectory = cpuDirectory
+    cgroup.memoryDirectory = memoryDirectory
+    return cgroup
+
+def addNetworkElement(sampler, neUuid, cgroup):
+    sampler.cgroups[neUuid] = cgroup
+    sampler.buffers[neUuid] = collections.deque(maxlen=sampler.samples)
+
+class FakeCgroup:
+    """A cgroup whose cpu time grows by one second at every sample."""
+
+    def __init__(self, memoryBytes, limit):
+        self.cpuSeconds = itertools.count()
+        self.memoryBytes = memoryBytes
+        self.limit = limit
+
+    def getCpuSeconds(self):
+        return next(self.cpuSeconds)
+
+    def getMemory(self):
+        return self.memoryBytes, self.limit
+
+class CgroupTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def testMounts(self):
+        mountsFileName = os.path.join(self.directory, 'mounts')
+        writeFiles(self.directory, {'mounts': 'proc /proc proc rw 0 0\n'
+                                              'cgroup /sys/fs/cgroup/cpu,cpuacct cgroup rw,cpu,cpuacct 0 0\n'
+                                              'cgroup /sys/fs/cgroup/memory cgroup rw,memory 0 0\n'
+                                              'cgroup2 /sys/fs/cgroup/unified cgroup2 rw 0 0\n'})
+        self.assertEqual(getCgroupMounts(mountsFileName), {'cpuacct': '/sys/fs/cgroup/cpu,cpuacct',
+                                                           'memory': '/sys/fs/cgroup/memory',
+                                                           CGROUP_V2: '/sys/fs/cgroup/unified'})
+
+    def testVersion1(self):
+        writeFiles(self.directory, {'cpuacct.usage': '2500000000\n', 'memory.usage_in_bytes': '1000\n',
+                                    'memory.stat': 'cache 300\ntotal_inactive_file 200\n',
+                                    'memory.limit_in_bytes': '4096\n'})
+        cgroup = createCgroup(CGROUP_V1, self.directory, self.directory)
+        self.assertEqual(cgroup.getCpuSeconds(), 2.5)
+        self.assertEqual(cgroup.getMemory(), (800, 4096))
+
+    def testVersion2(self):
+        writeFiles(self.directory, {'cpu.stat': 'usage_usec 1500000\nuser_usec 1000000\n',
+                                    'memory.current': '1000\n', 'memory.stat': 'anon 500\ninactive_file 100\n',
+                                    'memory.max': 'max\n'})
+        cgroup = createCgroup(CGROUP_V2, self.directory, self.directory)
+        self.assertEqual(cgroup.getCpuSeconds(), 1.5)
+        self.assertEqual(cgroup.getMemory(), (900, None))
+
+class ResourceSamplerTest(unittest.TestCase):
+
+    def testUsageOfTheLastSamples(self):
+        sampler = ResourceSampler(samples=3)
+        sampler.hostMemoryBytes = 1000
+        addNetworkElement(sampler, 'NE1', FakeCgroup(100, None))
+        addNetworkElement(sampler, 'NE2', FakeCgroup(50, 500))
+        for i in range(5):
+            sampler.takeSamples()
+
+        # the first sample of an NE only gives the cpu time the next one is compared with
+        self.assertEqual([len(sampler.buffers[neUuid]) for neUuid in ['NE1', 'NE2']], [3, 3])
+        perNe, total = sampler.getUsage()
+        self.assertEqual(sorted(perNe), ['NE1', 'NE2'])
+        self.assertEqual(perNe['NE1'][1:], (100, 10.0))
+        self.assertEqual(perNe['NE2'][1:], (50, 10.0))
+        self.assertGreater(perNe['NE1'][0], 0)
+        self.assertEqual(total[1:], (150, 20.0))
+
+    def testRemovedNetworkElements(self):
+        sampler = ResourceSampler()
+        addNetworkElement(sampler, 'NE1', FakeCgroup(100, 1000))
+        sampler.takeSamples()
+        sampler.takeSamples()
+        sampler.removeNetworkElements(['NE1'])
+        self.assertEqual(sampler.getUsage(), ({}, (0, 0, 0)))
+
+class InterfaceFlagsTest(unittest.TestCase):
+
+    def testFlagsOfTheInterfaces(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # up and running, up without carrier (its veth peer is down), and down
+            for name, flags in [('mwps-ai1', '0x11043'), ('mwps-ai2', '0x1003'), ('eth-ai3', '0x1002')]:
+                os.mkdir(os.path.join(directory, name))
+                writeFiles(os.path.join(directory, name), {'flags': flags + '\n'})
+            flags = readInterfaceFlags(1, ['mwps-ai1', 'mwps-ai2', 'eth-ai3', 'missing'], directory)
+        self.assertEqual(flags, {'mwps-ai1': 0x11043, 'mwps-ai2': 0x1003, 'eth-ai3': 0x1002})
+        self.assertEqual([isInterfaceUp(flags.get(name)) for name in ['mwps-ai1', 'mwps-ai2', 'eth-ai3', 'missing']],
+                         [True, False, False, False])
+
+if __name__ == '__main__':
+    unittest.main()
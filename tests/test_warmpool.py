@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+
+from wireless_emulator.dockerapi import DockerApiError
+from wireless_emulator.warmpool import WarmContainerPool, WARM_CONTAINER_NETWORK
+
+class WarmContainerPoolTest(unittest.TestCase):
+    """A pool whose containers are created without docker, and whose background thread is not started."""
+
+    def setUp(self):
+        self.client = mock.Mock()
+        patcher = mock.patch('wireless_emulator.warmpool.getDockerClient', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def createPool(self, ports):
+        # one warm container of each of the ports, None for a container publishing no ports
+        pool = WarmContainerPool({'openyuma': len(ports)}, lambda name, image: ports.pop(0), 'wte_warm_')
+        for i in range(pool.sizes['openyuma']):
+            pool.addContainer('openyuma')
+        return pool
+
+    def testReleasedReservationGoesBackToThePool(self):
+        pool = self.createPool([(12100, 15100)])
+        self.assertEqual(pool.reserveContainer('openyuma', 'NE1'), (12100, 15100))
+        self.assertIsNone(pool.reserveContainer('openyuma', 'NE2'))
+
+        pool.releaseReservation('NE1')
+        pool.releaseReservation('NE1')
+        self.assertEqual(pool.getStatistics()['warm'], 1)
+        self.assertEqual(pool.reserveContainer('openyuma', 'NE2'), (12100, 15100))
+        self.assertTrue(pool.claimContainer('openyuma', 'NE2'))
+        self.client.renameContainer.assert_called_once_with('wte_warm_1', 'NE2')
+
+    def testClaimedContainer(self):
+        pool = self.createPool([None])
+        self.assertTrue(pool.claimContainer('openyuma', 'NE1', 'wte_net_1'))
+        self.client.disconnectNetwork.assert_called_once_with(WARM_CONTAINER_NETWORK, 'NE1')
+        self.client.connectNetwork.assert_called_once_with('wte_net_1', 'NE1')
+        self.assertEqual(pool.getStatistics(), {'taken': 1, 'created': 0, 'warm': 0})
+        self.assertFalse(pool.claimContainer('openyuma', 'NE2', 'wte_net_2'))
+        self.assertEqual(pool.getStatistics(), {'taken': 1, 'created': 1, 'warm': 0})
+
+    def testContainerWhichCouldNotBeTakenIsRemoved(self):
+        pool = self.createPool([None, None])
+        self.client.connectNetwork.side_effect = DockerApiError(404, 'network wte_net_1 not found')
+        self.assertFalse(pool.claimContainer('openyuma', 'NE1', 'wte_net_1'))
+        # renamed before it failed, it is removed under the name of the NE
+        self.client.removeContainer.assert_called_once_with('NE1', force=True)
+
+        self.client.renameContainer.side_effect = DockerApiError(409, 'name NE2 is already in use')
+        self.assertFalse(pool.claimContainer('openyuma', 'NE2', 'wte_net_2'))
+        self.client.removeContainer.assert_called_with('wte_warm_2', force=True)
+        self.assertEqual(pool.getStatistics(), {'taken': 0, 'created': 2, 'warm': 0})
+
+if __name__ == '__main__':
+    unittest.main()
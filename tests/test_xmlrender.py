@@ -0,0 +1,28 @@
+import unittest
+
+from xmlbaseline import createEmulator, renderNetworkElements, releaseEmulator, loadBaselineDocument, \
+    maskTimestamps
+
+class XmlRenderPoolTest(unittest.TestCase):
+
+    def testDocumentsAreTheSameAsInProcess(self):
+        # the workers render the documents of the baseline, and the same bytes as the orchestrator
+        self.addCleanup(releaseEmulator)
+        emulator = createEmulator('topology_ring_3', xmlRenderWorkers=2)
+        emulator.xmlTimestamp = emulator.xmlTimestamp.replace(microsecond=0)
+        pooled = renderNetworkElements(emulator)
+
+        inProcessEmulator = createEmulator('topology_ring_3')
+        inProcessEmulator.xmlTimestamp = emulator.xmlTimestamp
+        inProcess = renderNetworkElements(inProcessEmulator)
+
+        self.assertEqual(sorted(pooled), ['NE1', 'NE2', 'NE3'])
+        for neName, (configDocument, statusDocument) in sorted(pooled.items()):
+            self.assertEqual((configDocument, statusDocument), inProcess[neName], neName)
+            self.assertEqual(maskTimestamps(configDocument), loadBaselineDocument('topology_ring_3', 'config', neName),
+                             neName)
+            self.assertEqual(maskTimestamps(statusDocument), loadBaselineDocument('topology_ring_3', 'status', neName),
+                             neName)
+
+if __name__ == '__main__':
+    unittest.main()
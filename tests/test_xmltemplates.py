@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from xmlbaseline import XML_CONFIG_FILE, XML_STATUS_FILE, createEmulator, renderNetworkElements, releaseEmulator, \
+    loadBaselineDocument, maskTimestamps
+
+from wireless_emulator.xmltemplates import XmlTemplates, serializeXmlTree
+
+class XmlTemplatesTest(unittest.TestCase):
+
+    def testSkeletonsAreCopied(self):
+        templates = XmlTemplates(XML_CONFIG_FILE, XML_STATUS_FILE)
+        configSkeleton = ET.tostring(templates.configSkeleton)
+        statusSkeleton = ET.tostring(templates.statusSkeleton)
+
+        configTree = templates.newConfigTree()
+        statusTree = templates.newStatusTree()
+        configTree.getroot().clear()
+        statusTree.getroot().clear()
+
+        self.assertEqual(ET.tostring(templates.configSkeleton), configSkeleton)
+        self.assertEqual(ET.tostring(templates.statusSkeleton), statusSkeleton)
+        self.assertIsNot(templates.newConfigTree().getroot(), templates.newConfigTree().getroot())
+
+    def testSerializationIsTheSameAsWritingTheFile(self):
+        tree = XmlTemplates(XML_CONFIG_FILE, XML_STATUS_FILE).newStatusTree()
+        with tempfile.TemporaryDirectory() as directory:
+            fileName = os.path.join(directory, 'status.xml')
+            tree.write(fileName)
+            with open(fileName, 'rb') as f:
+                self.assertEqual(serializeXmlTree(tree), f.read())
+
+class BaselineRenderingTest(unittest.TestCase):
+
+    def testDocumentsAreTheSameAsTheBaseline(self):
+        # the NEs built on the shared templates render the documents of the NEs which parsed the files themselves
+        self.addCleanup(releaseEmulator)
+        documents = renderNetworkElements(createEmulator('topology_ring_3'))
+        self.assertEqual(sorted(documents), ['NE1', 'NE2', 'NE3'])
+        for neName, (configDocument, statusDocument) in sorted(documents.items()):
+            self.assertEqual(maskTimestamps(configDocument), loadBaselineDocument('topology_ring_3', 'config', neName),
+                             neName)
+            self.assertEqual(maskTimestamps(statusDocument), loadBaselineDocument('topology_ring_3', 'status', neName),
+                             neName)
+
+if __name__ == '__main__':
+    unittest.main()
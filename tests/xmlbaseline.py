@@ -0,0 +1,62 @@
+"""The XML documents of the NEs, as the emulator rendered them before its start-up was optimized.
+
+tests/baseline/<topology> holds the gzipped output-config-<NE>.xml and output-status-<NE>.xml files written by the
+original emulator for tests/<topology>.json and config.json, with all the timestamps replaced by TS.
+"""
+
+import contextlib
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+
+from wireless_emulator.emulator import Emulator
+from wireless_emulator.utils import Singleton
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+BASE_DIRECTORY = os.path.dirname(TESTS_DIRECTORY)
+XML_CONFIG_FILE = os.path.join(BASE_DIRECTORY, 'yang', 'microwave-model-config.xml')
+XML_STATUS_FILE = os.path.join(BASE_DIRECTORY, 'yang', 'microwave-model-status.xml')
+
+TIMESTAMP = re.compile(rb'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\dZ')
+
+def maskTimestamps(document):
+    return TIMESTAMP.sub(b'TS', document)
+
+def getTopologyFile(topologyName):
+    return os.path.join(TESTS_DIRECTORY, topologyName + '.json')
+
+def loadBaselineDocument(topologyName, kind, neName):
+    fileName = os.path.join(TESTS_DIRECTORY, 'baseline', topologyName, 'output-%s-%s.xml.gz' % (kind, neName))
+    with gzip.open(fileName, 'rb') as f:
+        return f.read()
+
+def createEmulator(topologyName, xmlRenderWorkers=1):
+    # a new emulator with the configuration of the baseline, without lease file, journal, XML cache or profile
+    with open(os.path.join(BASE_DIRECTORY, 'config.json')) as f:
+        configJson = json.load(f)
+    configJson.update({'xmlRenderWorkers': xmlRenderWorkers, 'leaseFile': None, 'journalFile': None,
+                       'xmlCacheDirectory': None, 'startupProfileFile': None, 'writeDebugXmlFiles': False})
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(configJson, f)
+    try:
+        Singleton._instances.pop(Emulator, None)
+        return Emulator(getTopologyFile(topologyName), XML_CONFIG_FILE, f.name)
+    finally:
+        os.remove(f.name)
+
+def renderNetworkElements(emulator):
+    # returns NE name -> (config document, status document)
+    with contextlib.redirect_stdout(io.StringIO()):
+        emulator.createNetworkElements()
+    documents = {}
+    for neObj in emulator.networkElementList:
+        if neObj.xmlConfigurationBytes is None:
+            neObj.renderXmlDocuments()
+        documents[neObj.dockerName] = (neObj.xmlConfigurationBytes, neObj.xmlStatusBytes)
+    return documents
+
+def releaseEmulator():
+    Singleton._instances.pop(Emulator, None)
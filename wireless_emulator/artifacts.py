@@ -0,0 +1,42 @@
+import logging
+import os
+import tarfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# paths inside the NE containers, relative to the root of the container file system
+OPENYUMA_PATH = 'usr/src/OpenYuma'
+YANG_MODULES_PATH = 'usr/share/yuma/modules'
+
+def buildTarMembers(files):
+    """Returns the tar headers and data blocks for the (path, data, mode) tuples, without end-of-archive marker.
+
+    The result can be concatenated with other members, so that parts shared by all the NEs are built only once.
+    """
+    parts = []
+    mtime = time.time()
+    for path, data, mode in files:
+        info = tarfile.TarInfo(path)
+        info.size = len(data)
+        info.mode = mode
+        info.mtime = mtime
+        parts.append(info.tobuf(tarfile.GNU_FORMAT, 'utf-8', 'surrogateescape'))
+        parts.append(data)
+        remainder = len(data) % tarfile.BLOCKSIZE
+        if remainder > 0:
+            parts.append(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+    return b''.join(parts)
+
+def buildTarArchive(*members):
+    return b''.join(members) + tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+
+def buildYangArchiveMembers(directory):
+    files = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".yang"):
+            with open(os.path.join(directory, filename), 'rb') as f:
+                files.append((YANG_MODULES_PATH + '/' + filename, f.read(), 0o644))
+
+    logger.debug("Packed %d YANG modules from %s", len(files), directory)
+    return buildTarMembers(files)
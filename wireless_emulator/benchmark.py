@@ -0,0 +1,462 @@
+"""Micro-benchmarks for the parts of the emulator start-up that do not need docker.
+
+Usage: python3 -m wireless_emulator.benchmark [options] <benchmark>
+"""
+
+import asyncio
+import contextlib
+import copy
+import datetime
+import gc
+import glob
+import io
+import ipaddress
+import json
+import multiprocessing
+import os
+import random
+import socketserver
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+import resource
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from optparse import OptionParser
+
+import requests
+from timeit import default_timer as timer
+
+from wireless_emulator.xmltemplates import XmlTemplates
+from wireless_emulator.emulator import Emulator
+from wireless_emulator.utils import Singleton
+from wireless_emulator.performance import addHistoricalPerformancesRecords, formatTimestamp
+from wireless_emulator.ip import InterfaceIPFactory, ManagementNetworkIPFactory
+from wireless_emulator.readiness import NetconfReadinessProber
+from wireless_emulator.resources import ResourceSampler
+from wireless_emulator.odlregistration import createNewXmlPayloadForOdl, registerNesToOdl, \
+    unregisterNesFromOdlInParallel, ControllerBalancer, ODL_HEADERS, ODL_NODE_URL
+
+# layers whose status XML contains historical performances, with the template node and the historical
+# performances container inside it
+HISTORICAL_PERFORMANCES_LAYERS = {
+    'MWPS': ('airInterfaceStatusXmlNode', 'air-interface-historical-performances'),
+    'MWS': ('pureEthernetStatusXmlNode', 'pure-ethernet-structure-historical-performances'),
+    'ETC': ('ethernetContainerStatusXmlNode', 'ethernet-container-historical-performances')
+}
+
+# host networks of the IP allocation benchmark, the materialized lists are not built for the larger ones
+IP_ALLOCATION_NETWORKS = ['10.0.0.0/20', '10.0.0.0/16', '10.0.0.0/12', '10.0.0.0/8']
+IP_ALLOCATION_MAX_LIST_SIZE = 2 ** 20
+
+def loadTopology(topologyFileName):
+    with open(topologyFileName) as json_data:
+        return json.load(json_data)
+
+def getNumberOfNetworkElements(topologyFileName):
+    return len(loadTopology(topologyFileName)['network-elements'])
+
+def getRingTopologies(topologiesPattern):
+    topologies = [(getNumberOfNetworkElements(fileName), fileName) for fileName in glob.glob(topologiesPattern)]
+    return sorted(topologies)
+
+def getInterfacesPerLayer(topologyFileName):
+    result = {}
+    for ne in loadTopology(topologyFileName)['network-elements']:
+        for intf in ne['network-element'].get('interfaces') or []:
+            result[intf['layer']] = result.get(intf['layer'], 0) + len(intf['LTPs'])
+    return result
+
+def getMaxRssMiB():
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def parsePerNetworkElement(xmlConfigFile, xmlStatusFile, numberOfNes):
+    # what every NE used to do: parse both files and cut out the templates on its own
+    result = []
+    for i in range(0, numberOfNes):
+        templates = XmlTemplates(xmlConfigFile, xmlStatusFile)
+        result.append((templates, templates.newConfigTree(), templates.newStatusTree()))
+    return result
+
+def parseOnceAndClone(xmlConfigFile, xmlStatusFile, numberOfNes):
+    templates = XmlTemplates(xmlConfigFile, xmlStatusFile)
+    result = []
+    for i in range(0, numberOfNes):
+        result.append((templates, templates.newConfigTree(), templates.newStatusTree()))
+    return result
+
+def measure(function, *args):
+    gc.collect()
+    start = timer()
+    function(*args)
+    elapsed = timer() - start
+
+    # memory is measured on a second run, tracemalloc slows down the allocations
+    tracemalloc.start()
+    result = function(*args)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+
+    return elapsed, retained / (1024.0 * 1024.0)
+
+def benchmarkXmlTemplates(options):
+    xmlConfigFile = options.xmlConfigFile
+    xmlStatusFile = xmlConfigFile.replace("config", "status")
+
+    print("XML templates parse-and-split, %s + %s" % (xmlConfigFile, xmlStatusFile))
+    print("%6s | %12s %12s | %12s %12s | %8s" %
+          ("NEs", "per-NE [s]", "per-NE [MiB]", "cached [s]", "cached [MiB]", "speedup"))
+    for numberOfNes, fileName in getRingTopologies(options.topologies):
+        perNeTime, perNeMemory = measure(parsePerNetworkElement, xmlConfigFile, xmlStatusFile, numberOfNes)
+        cachedTime, cachedMemory = measure(parseOnceAndClone, xmlConfigFile, xmlStatusFile, numberOfNes)
+        print("%6d | %12.4f %12.2f | %12.4f %12.2f | %7.1fx" %
+              (numberOfNes, perNeTime, perNeMemory, cachedTime, cachedMemory, perNeTime / cachedTime))
+    print("Max resident set size: %.1f MiB" % getMaxRssMiB())
+
+def addHistoricalPerformancesDeepCopy(parentNode):
+    # the previous implementation, one deep copy of the template and one utcnow() per record
+    histPerfDataList = parentNode.find('historical-performance-data-list')
+    savedNode = copy.deepcopy(histPerfDataList)
+    parentNode.remove(histPerfDataList)
+
+    for index in range(0, 103):
+        histPerfDataList = copy.deepcopy(savedNode)
+        timeNow = datetime.datetime.utcnow()
+        if index < 96:
+            histPerfDataList.find('history-data-id').text = str(index)
+            histPerfDataList.find('granularity-period').text = "period-15-min"
+            timestamp = timeNow - datetime.timedelta(minutes=15*index)
+        else:
+            histPerfDataList.find('history-data-id').text = str(index)
+            histPerfDataList.find('granularity-period').text = "period-24-hours"
+            timestamp = timeNow - datetime.timedelta(days=1*(index - 96))
+        histPerfDataList.find('suspect-interval-flag').text = "false"
+        histPerfDataList.find('period-end-time').text = formatTimestamp(timestamp)
+        parentNode.append(histPerfDataList)
+
+def getHistoricalPerformancesTemplates(templates, interfacesPerLayer):
+    result = []
+    for layer, (templateName, path) in sorted(HISTORICAL_PERFORMANCES_LAYERS.items()):
+        node = getattr(templates, templateName).find(path)
+        result += [node] * interfacesPerLayer.get(layer, 0)
+    return result
+
+def buildHistoricalPerformances(function, templateNodes):
+    result = []
+    for templateNode in templateNodes:
+        parentNode = copy.deepcopy(templateNode)
+        function(parentNode)
+        result.append(parentNode)
+    return result
+
+def benchmarkHistoricalPerformances(options):
+    xmlConfigFile = options.xmlConfigFile
+    templates = XmlTemplates(xmlConfigFile, xmlConfigFile.replace("config", "status"))
+
+    print("Historical performances generation for the MWPS, MWS and ETC interfaces")
+    print("%6s %10s | %12s %12s | %8s" % ("NEs", "interfaces", "deepcopy [s]", "compact [s]", "speedup"))
+    for numberOfNes, fileName in getRingTopologies(options.topologies):
+        templateNodes = getHistoricalPerformancesTemplates(templates, getInterfacesPerLayer(fileName))
+
+        gc.collect()
+        start = timer()
+        buildHistoricalPerformances(addHistoricalPerformancesDeepCopy, templateNodes)
+        deepCopyTime = timer() - start
+
+        gc.collect()
+        start = timer()
+        buildHistoricalPerformances(addHistoricalPerformancesRecords, templateNodes)
+        compactTime = timer() - start
+
+        print("%6d %10d | %12.4f %12.4f | %7.1fx" %
+              (numberOfNes, len(templateNodes), deepCopyTime, compactTime, deepCopyTime / compactTime))
+
+def allocateFromLists(network, numberOfNes):
+    # the previous implementation, lists of all the management subnets and host addresses, handed out with pop(0)
+    freeNetworkIpList = list(ipaddress.ip_network(network).subnets(new_prefix=30))
+    freeInterfaceIpList = list(ipaddress.ip_network(network).hosts())
+    result = []
+    for i in range(0, numberOfNes):
+        result.append((freeNetworkIpList.pop(0), freeInterfaceIpList.pop(0)))
+    return result, freeNetworkIpList, freeInterfaceIpList
+
+def allocateArithmetically(network, numberOfNes):
+    mgmtIpFactory = ManagementNetworkIPFactory(network)
+    intfIpFactory = InterfaceIPFactory(network)
+    result = []
+    for i in range(0, numberOfNes):
+        result.append((mgmtIpFactory.getFreeManagementNetworkIP(), intfIpFactory.getFreeInterfaceIp()))
+    return result, mgmtIpFactory, intfIpFactory
+
+def benchmarkIpAllocation(options):
+    numberOfNes = max([numberOfNes for numberOfNes, fileName in getRingTopologies(options.topologies)] or [100])
+
+    print("Management subnet and host IP allocation for %d NEs" % numberOfNes)
+    print("%14s | %12s %12s | %12s %12s | %8s" %
+          ("network", "lists [s]", "lists [MiB]", "cursor [s]", "cursor [MiB]", "speedup"))
+    for network in IP_ALLOCATION_NETWORKS:
+        cursorTime, cursorMemory = measure(allocateArithmetically, network, numberOfNes)
+        if ipaddress.ip_network(network).num_addresses > IP_ALLOCATION_MAX_LIST_SIZE:
+            print("%14s | %12s %12s | %12.4f %12.2f | %8s" % (network, "-", "-", cursorTime, cursorMemory, "-"))
+            continue
+
+        listsTime, listsMemory = measure(allocateFromLists, network, numberOfNes)
+        print("%14s | %12.4f %12.2f | %12.4f %12.2f | %7.1fx" %
+              (network, listsTime, listsMemory, cursorTime, cursorMemory, listsTime / cursorTime))
+    print("Max resident set size: %.1f MiB" % getMaxRssMiB())
+
+class StubOdlHandler(BaseHTTPRequestHandler):
+    # answers the RESTCONF mount and unmount requests after the latency of the server, over keep-alive connections;
+    # unmounting an NE which is not mounted answers 404, like ODL, and every request answers 503 while unavailable
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.mountedPaths.add(self.path)
+        self.answer(201)
+
+    def do_DELETE(self):
+        with self.server.lock:
+            mounted = self.path in self.server.mountedPaths
+            self.server.mountedPaths.discard(self.path)
+        self.answer(200 if mounted else 404)
+
+    def do_GET(self):
+        self.answer(200)
+
+    def answer(self, status):
+        time.sleep(self.server.latency)
+        self.server.countRequest(self.command)
+        if self.server.available is not True:
+            status = 503
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class StubOdlController(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), StubOdlHandler)
+        self.latency = latency
+        self.requests = {}
+        self.connections = 0
+        self.mountedPaths = set()
+        self.available = True
+        self.lock = threading.Lock()
+
+    def countRequest(self, method):
+        with self.lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def getControllerInfo(self):
+        return {'ip-address': self.server_address[0], 'port': self.server_address[1],
+                'username': 'admin', 'password': 'admin'}
+
+def mountOneByOne(controllerInfo, nodes):
+    # the previous implementation, one ElementTree and one new connection for each NE
+    for neUuid, neManagementIp, nePort in nodes:
+        payload = ET.tostring(createNewXmlPayloadForOdl(neUuid, neManagementIp, nePort).getroot())
+        requests.request("PUT", ODL_NODE_URL.format(controllerInfo['ip-address'], controllerInfo['port'], neUuid),
+                         data=payload, headers=ODL_HEADERS,
+                         auth=(controllerInfo['username'], controllerInfo['password']))
+    for neUuid, neManagementIp, nePort in nodes:
+        requests.request("DELETE", ODL_NODE_URL.format(controllerInfo['ip-address'], controllerInfo['port'], neUuid),
+                         headers=ODL_HEADERS, auth=(controllerInfo['username'], controllerInfo['password']))
+
+def mountInParallel(controllerInfo, nodes):
+    balancer = ControllerBalancer([controllerInfo])
+    failed = registerNesToOdl(balancer, nodes)
+    failed += unregisterNesFromOdlInParallel(balancer, [node[0] for node in nodes])
+    if failed:
+        raise RuntimeError("Could not mount or unmount %s" % ', '.join(failed))
+
+def benchmarkOdlRegistration(options):
+    latency = options.odlLatency / 1000.0
+    print("ODL mount and unmount of all the NEs, stub controller answering after %.1f ms" % options.odlLatency)
+    print("%6s | %12s %12s | %12s %12s | %8s" %
+          ("NEs", "serial [s]", "connections", "pooled [s]", "connections", "speedup"))
+    for numberOfNes, fileName in getRingTopologies(options.topologies):
+        nodes = [("NE%d" % i, "192.168.0.%d" % (i % 250 + 1), 12000 + i) for i in range(1, numberOfNes + 1)]
+        results = []
+        for function in [mountOneByOne, mountInParallel]:
+            server = StubOdlController(latency)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            start = timer()
+            with contextlib.redirect_stdout(io.StringIO()):
+                function(server.getControllerInfo(), nodes)
+            results.append((timer() - start, server.connections))
+            server.shutdown()
+            server.server_close()
+        print("%6d | %12.4f %12d | %12.4f %12d | %7.1fx" %
+              (numberOfNes, results[0][0], results[0][1], results[1][0], results[1][1], results[0][0] / results[1][0]))
+
+class StubNetconfServers:
+    """Stand-ins of the NETCONF servers of the NEs, one port each, served by one event loop.
+
+    Before its ready time, a server accepts and closes the connections, as docker-proxy does while netconfd is not
+    listening in the container; afterwards it sends an SSH banner.
+    """
+
+    def __init__(self, readyDelays):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.servers = asyncio.run_coroutine_threadsafe(self.startServers(len(readyDelays)), self.loop).result()
+        self.ports = [server.sockets[0].getsockname()[1] for server in self.servers]
+        start = timer()
+        self.readyTimes = [start + delay for delay in readyDelays]
+
+    async def startServers(self, numberOfServers):
+        servers = []
+        for index in range(numberOfServers):
+            handler = lambda reader, writer, index=index: self.answer(index, writer)
+            servers.append(await asyncio.start_server(handler, '127.0.0.1', 0))
+        return servers
+
+    async def answer(self, index, writer):
+        if timer() >= self.readyTimes[index]:
+            writer.write(b'SSH-2.0-OpenSSH_stub\r\n')
+            await writer.drain()
+        writer.close()
+
+    def stop(self):
+        async def closeServers():
+            for server in self.servers:
+                server.close()
+                await server.wait_closed()
+        asyncio.run_coroutine_threadsafe(closeServers(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+def benchmarkNetconfReadiness(options):
+    print("Readiness of the NETCONF servers, ready at random times during %.1f seconds" % options.readySpread)
+    print("%6s | %10s | %15s %15s | %12s %12s" %
+          ("NEs", "total [s]", "early, connect", "early, banner", "lag avg [s]", "lag max [s]"))
+    randomGenerator = random.Random(0)
+    for numberOfNes, fileName in getRingTopologies(options.topologies):
+        readyDelays = [randomGenerator.uniform(0, options.readySpread) for i in range(numberOfNes)]
+        servers = StubNetconfServers(readyDelays)
+        start = timer()
+        earlyOnConnect = sum(1 for readyTime in servers.readyTimes if timer() < readyTime)
+
+        prober = NetconfReadinessProber(timeout=options.readySpread + 10)
+        registrationTimes = {}
+        futures = []
+        for index, port in enumerate(servers.ports):
+            onReady = lambda ready, index=index: registrationTimes.__setitem__(index, timer())
+            futures.append(prober.submitNetworkElement("NE%d" % index, '127.0.0.1', port, start, onReady))
+        for future in futures:
+            future.result()
+        total = timer() - start
+        prober.stop()
+        servers.stop()
+
+        lags = [registrationTimes[index] - servers.readyTimes[index] for index in range(numberOfNes)]
+        earlyOnBanner = sum(1 for lag in lags if lag < 0)
+        print("%6d | %10.3f | %15d %15d | %12.4f %12.4f" %
+              (numberOfNes, total, earlyOnConnect, earlyOnBanner, sum(lags) / len(lags), max(lags)))
+
+def benchmarkResourceSampling(options):
+    # every NE is given the cgroup of the benchmark itself, the cost of reading the accounting files is the same
+    print("Sampling the cpu and memory usage from the cgroups, and averaging the samples for print_resource_usage")
+    print("%6s | %14s | %14s" % ("NEs", "sample [ms]", "usage [ms]"))
+    for numberOfNes, fileName in getRingTopologies(options.topologies):
+        sampler = ResourceSampler(samples=10)
+        sampler.start([("NE%d" % i, os.getpid()) for i in range(numberOfNes)])
+        sampler.stop()
+        for i in range(10):
+            sampler.takeSamples()
+        sampleSeconds = min(measure(sampler.takeSamples)[0] for i in range(5))
+        usageSeconds = min(measure(sampler.getUsage, 10)[0] for i in range(5))
+        print("%6d | %14.3f | %14.3f" % (numberOfNes, sampleSeconds * 1000, usageSeconds * 1000))
+
+def createRenderEmulator(options, xmlRenderWorkers):
+    # a new emulator for every run, without lease file, journal, XML cache or startup profile
+    with open(options.configFile) as f:
+        configJson = json.load(f)
+    configJson.update({'xmlRenderWorkers': xmlRenderWorkers, 'leaseFile': None, 'journalFile': None,
+                       'xmlCacheDirectory': None, 'startupProfileFile': None})
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(configJson, f)
+    try:
+        Singleton._instances.pop(Emulator, None)
+        return Emulator(options.topology, options.xmlConfigFile, f.name)
+    finally:
+        os.remove(f.name)
+
+def buildAndRenderXml(emulator):
+    with contextlib.redirect_stdout(io.StringIO()):
+        emulator.createNetworkElements()
+    for neObj in emulator.networkElementList:
+        if getattr(neObj, 'xmlConfigurationBytes', b'') is None:
+            neObj.renderXmlDocuments()
+
+def benchmarkXmlRender(options):
+    numberOfCpus = multiprocessing.cpu_count()
+    print("XML build and serialization of all the NEs of %s, %d cpus" % (options.topology, numberOfCpus))
+    print("%8s | %10s | %8s" % ("workers", "time [s]", "speedup"))
+    workers = [1] + [2 ** i for i in range(1, 8) if 2 ** i <= max(2, numberOfCpus)]
+    inProcessSeconds = None
+    for xmlRenderWorkers in workers:
+        emulator = createRenderEmulator(options, xmlRenderWorkers)
+        gc.collect()
+        start = timer()
+        buildAndRenderXml(emulator)
+        seconds = timer() - start
+        if inProcessSeconds is None:
+            inProcessSeconds = seconds
+        print("%8s | %10.3f | %7.1fx" % (xmlRenderWorkers if xmlRenderWorkers > 1 else 'none', seconds,
+                                         inProcessSeconds / seconds))
+    Singleton._instances.pop(Emulator, None)
+
+BENCHMARKS = {
+    'xml-templates': benchmarkXmlTemplates,
+    'historical-performances': benchmarkHistoricalPerformances,
+    'ip-allocation': benchmarkIpAllocation,
+    'odl-registration': benchmarkOdlRegistration,
+    'netconf-readiness': benchmarkNetconfReadiness,
+    'resource-sampling': benchmarkResourceSampling,
+    'xml-render': benchmarkXmlRender,
+}
+
+def main():
+    usage = ('%prog [options] <benchmark>\n'
+             'available benchmarks: ' + ', '.join(sorted(BENCHMARKS.keys())))
+    opts = OptionParser(usage=usage)
+    opts.add_option('--xml', '-x', dest='xmlConfigFile', default=os.path.join('yang', 'microwave-model-config.xml'),
+                    help='the file containig the XML configuration for the NE')
+    opts.add_option('--topologies', dest='topologies', default=os.path.join('tests', 'topology_ring_*.json'),
+                    help='glob pattern of the JSON topologies giving the number of NEs')
+    opts.add_option('--topology', dest='topology', default=os.path.join('tests', 'topology_tree_127.json'),
+                    help='the JSON topology of the xml-render benchmark')
+    opts.add_option('--config', dest='configFile', default='config.json',
+                    help='the configuration file of the xml-render benchmark')
+    opts.add_option('--odl-latency', dest='odlLatency', type='float', default=5.0,
+                    help='time in ms taken by the stub ODL controller to answer a request')
+    opts.add_option('--ready-spread', dest='readySpread', type='float', default=2.0,
+                    help='the stand-ins of the NETCONF servers get ready at random times within these seconds')
+
+    options, args = opts.parse_args()
+    if len(args) != 1 or args[0] not in BENCHMARKS:
+        opts.print_help()
+        exit(1)
+
+    BENCHMARKS[args[0]](options)
+
+if __name__ == '__main__':
+    main()
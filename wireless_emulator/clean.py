@@ -1,139 +1,221 @@
 import logging
 import subprocess
 import json
-from wireless_emulator.odlregistration import unregisterNeFromOdl, unregisterNeFromOdlNewVersion
+from concurrent.futures import ThreadPoolExecutor, wait
+from timeit import default_timer as timer
+from wireless_emulator.odlregistration import unregisterNeFromOdl, unregisterNeFromOdlNewVersion, \
+    unregisterNesFromOdlInParallel, ControllerBalancer
+from wireless_emulator.dockerapi import getDockerClient, DockerApiError, EMULATOR_LABEL, RUN_ID_LABEL
+from wireless_emulator.journal import CreationJournal, getJournalFileName, getRecordKey, CONTAINER, NETWORK, VETH, \
+    BRIDGE, ODL_MOUNT
+from wireless_emulator.warmpool import WARM_CONTAINER_PREFIX
+from wireless_emulator.netlink import deleteLink
 import wireless_emulator.emulator
 
 logger = logging.getLogger(__name__)
 
-def cleanup(configFileName = None):
+# number of containers and networks removed in parallel, when the configuration file does not give it
+CLEANUP_WORKERS = 8
+# the resources which are removed when their records are undone, the other records are only dropped
+UNDONE_RESOURCES = [ODL_MOUNT, VETH, BRIDGE, CONTAINER, NETWORK]
 
-    dockerNames = getDockerNames()
-    dockerNetworks = getDockerNetworks()
-
-    stopAndRemoveDockerContainers(dockerNames)
-    removeDockerNetworks(dockerNetworks)
-
-    removeLinkBridges()
+def cleanup(configFileName = None, runId = None):
+    # the resources recorded in the journal are removed first, then the containers and networks labelled by the
+    # emulator which are still there; only the ones of runId, if given
+    start = timer()
 
+    configJson = None
     if configFileName is not None:
         try:
             with open(configFileName) as json_data:
                 configJson = json.load(json_data)
-                autoReg = configJson['automatic-odl-registration']
-                if autoReg is True:
-                    for controller in configJson['controller']:
-                        unregisterNesFromOdl(controller, dockerNames)
         except IOError as err:
             logger.critical("Could not open configuration file=%s", configFileName)
             logger.critical("I/O error({0}): {1}".format(err.errno, err.strerror))
 
-    print("All cleaned up!")
-    return True
+    workers = CLEANUP_WORKERS
+    if configJson is not None and configJson.get('neBringUpWorkers') is not None:
+        workers = max(1, int(configJson['neBringUpWorkers']))
 
-#TODO add support for new docker container
-def getDockerNames():
-    dockerNamesList = []
+    journal = CreationJournal(getJournalFileName(configJson), runId)
+    records = journal.getRecords(runId)
 
-    stringCmd = "docker ps -a | grep openyuma | awk '{print $NF}'"
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        removed, undoneRecords = undoJournalRecords(records, configJson, executor)
 
-    cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        dockerNames = getDockerNames(runId)
+        dockerNetworks = getDockerNetworks(runId)
+        removed[CONTAINER] += removeDockerContainers(dockerNames, executor)
+        removed[NETWORK] += removeDockerNetworks(dockerNetworks, executor)
 
-    for line in cmd.stderr:
-        strLine = line.decode("utf-8").rstrip('\n')
-        logger.critical("Could not get names of docker containers having image openyuma.\n Stderr: %s", strLine)
-        print("Could not get docker container names")
-        #raise RuntimeError("Could not get docker container names")
+    removeLinkBridges()
 
-    for line in cmd.stdout:
-        strLine = line.decode("utf-8").rstrip('\n')
-        dockerNamesList.append(strLine)
+    # the ODL mounts are recorded in the journal, when it has none for the run the NEs are unmounted from every
+    # controller: there is no journal, or it was written before the NEs were registered
+    odlMountRecorded = any(record['resource'] == ODL_MOUNT for record in records)
+    if not odlMountRecorded and configJson is not None and configJson['automatic-odl-registration'] is True:
+        neNames = [name for name in dockerNames if not name.startswith(WARM_CONTAINER_PREFIX)]
+        for controller in configJson['controller']:
+            unregisterNesFromOdl(controller, neNames)
+
+    # the resources which could not be removed stay in the journal, for the next cleanup
+    undoneKeys = set(getRecordKey(record) for record in undoneRecords)
+    keptRecords = [record for record in records
+                   if record['resource'] in UNDONE_RESOURCES and getRecordKey(record) not in undoneKeys]
+    journal.removeRuns(runId, keptRecords)
+
+    end = timer()
+    print("Removed %d docker containers, %d docker networks, %d veth pairs, %d OVS bridges and %d ODL mounts "
+          "in %6.3f seconds using %d workers" % (removed[CONTAINER], removed[NETWORK], removed[VETH], removed[BRIDGE],
+                                                 removed[ODL_MOUNT], end - start, workers))
+    if keptRecords:
+        print("%d resources could not be removed, they are kept in %s for the next cleanup" %
+              (len(set(getRecordKey(record) for record in keptRecords)), journal.fileName))
+        return False
+    print("All cleaned up!")
+    return True
+
+def undoJournalRecords(records, configJson, executor):
+    """Removes the resources of the records, returns the number removed of each kind and the records undone.
+
+    The journal is replayed backwards, one kind of resource after the other, so that the links are removed before
+    the containers and the containers before their networks; the resources of one kind are removed in parallel. The
+    undo functions return True when they removed the resource, None when it was already gone and False when they
+    could not remove it, its record is then not undone.
+    """
+    undoFunctions = [(ODL_MOUNT, lambda record: unregisterOdlMount(record, configJson)),
+                     (VETH, removeVethPair),
+                     (BRIDGE, removeBridge),
+                     (CONTAINER, lambda record: removeDockerContainer(record['name'])),
+                     (NETWORK, lambda record: removeDockerNetwork(record['name']))]
+    removed = {}
+    undoneRecords = []
+    for resource, undo in undoFunctions:
+        toUndo = []
+        seen = set()
+        for record in reversed(records):
+            key = getRecordKey(record)
+            if record['resource'] == resource and key not in seen:
+                seen.add(key)
+                toUndo.append(record)
+        futures = [executor.submit(undo, record) for record in toUndo]
+        wait(futures)
+        removed[resource] = sum(1 for future in futures if future.result() is True)
+        undoneRecords.extend(record for record, future in zip(toUndo, futures) if future.result() is not False)
+    return removed, undoneRecords
+
+def unregisterOdlMount(record, configJson):
+    if configJson is None:
+        logger.error("No configuration file, NE=%s is not unregistered from the ODL controller", record['name'])
+        return False
+    for controller in configJson['controller']:
+        if controller['ip-address'] == record.get('controller') and controller['port'] == record.get('port'):
+            try:
+                if unregisterNeFromOdlNewVersion(controller, record['name']) is False:
+                    return None
+            except (RuntimeError, OSError):
+                print("Failed to unregister NE=%s from ODL controller" % record['name'])
+                return False
+            return True
+    logger.error("Controller %s:%s of the ODL mount of NE=%s is not in the configuration file",
+                 record.get('controller'), record.get('port'), record['name'])
+    return False
+
+def removeVethPair(record):
+    # only a pair left in the host namespace under its temporary name is still there, the others are removed with
+    # the network namespaces of the containers
+    try:
+        if deleteLink(record['name']) is False:
+            return None
+        return True
+    except RuntimeError:
+        print("Could not remove veth pair %s" % record['name'])
+        return False
+
+def removeBridge(record):
+    cmd = subprocess.Popen(['ovs-vsctl', '--if-exists', 'del-br', record['name']],
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = cmd.communicate()
+    if cmd.returncode != 0:
+        logger.error("Could not remove OVS bridge %s: %s", record['name'], stderr.decode('utf-8').strip())
+        print("Could not remove OVS bridge %s" % record['name'])
+        return False
+    logger.info("Bridge %s deleted!", record['name'])
+    return True
 
-    #Changed from javasimulator to netconfserversimulator
-    dockerName="netconfserversimulator"
-    stringCmd = "docker ps -a | grep "+dockerName+" | awk '{print $NF}'"
+def getLabelFilters(runId = None):
+    if runId is not None:
+        return {'label': ['%s=%s' % (RUN_ID_LABEL, runId)]}
+    return {'label': [EMULATOR_LABEL]}
 
-    cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+def getDockerNames(runId = None):
+    dockerNamesList = []
 
-    for line in cmd.stderr:
-        strLine = line.decode("utf-8").rstrip('\n')
-        logger.critical("Could not get names of docker containers having image "+dockerName+".\n Stderr: %s", strLine)
+    try:
+        containers = getDockerClient().listContainers(all=True, filters=getLabelFilters(runId))
+    except (RuntimeError, OSError) as err:
+        logger.critical("Could not get names of docker containers.\n Error: %s", err)
         print("Could not get docker container names")
-        #raise RuntimeError("Could not get docker container names")
+        return dockerNamesList
 
-    for line in cmd.stdout:
-        strLine = line.decode("utf-8").rstrip('\n')
-        dockerNamesList.append(strLine)
+    for container in containers:
+        dockerNamesList.append(container['Names'][0].lstrip('/'))
 
     return dockerNamesList
 
 
-def getDockerNetworks():
+def getDockerNetworks(runId = None):
     dockerNetworksList = []
 
-    stringCmd = "docker network ls | grep wte_net | awk '{print $2}'"
-
-    cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    for line in cmd.stderr:
-        strLine = line.decode("utf-8").rstrip('\n')
-        logger.critical("Could not get names of docker networks having names oywe.\n Stderr: %s", strLine)
+    try:
+        networks = getDockerClient().listNetworks(filters=getLabelFilters(runId))
+    except (RuntimeError, OSError) as err:
+        logger.critical("Could not get names of docker networks created by the emulator.\n Error: %s", err)
         print("Could not get docker networks")
-        #raise RuntimeError("Could not get docker networks")
+        return dockerNetworksList
 
-    for line in cmd.stdout:
-        strLine = line.decode("utf-8").rstrip('\n')
-        dockerNetworksList.append(strLine)
+    for network in networks:
+        dockerNetworksList.append(network['Name'])
 
     return dockerNetworksList
 
-def stopAndRemoveDockerContainers(dockerNames):
-    for container in dockerNames:
-        print("Killing docker container %s" % container)
-        stringCmd = "docker kill %s" % (container)
-
-        cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        for line in cmd.stderr:
-            strLine = line.decode("utf-8").rstrip('\n')
-            logger.critical("Could not kill docker container %s\n Stderr: %s", container, strLine)
-            print("Could not kill docker container %s" % container)
-            # raise RuntimeError("Could not stop docker container %s" % container)
-
-        print("Stopping docker container %s" % container)
-        stringCmd = "docker stop %s" % (container)
-
-        cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        for line in cmd.stderr:
-            strLine = line.decode("utf-8").rstrip('\n')
-            logger.critical("Could not stop docker container %s\n Stderr: %s", container, strLine)
-            print("Could not stop docker container %s" % container)
-            #raise RuntimeError("Could not stop docker container %s" % container)
-
-        print("Removing docker container %s" % container)
-        stringCmd = "docker rm %s" % (container)
-
-        cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        for line in cmd.stderr:
-            strLine = line.decode("utf-8").rstrip('\n')
-            logger.critical("Could not remove docker container %s\n Stderr: %s", container, strLine)
-            print("Could not remove docker container %s" % container)
-            #raise RuntimeError("Could not remove docker container ")
-
-def removeDockerNetworks(dockerNetworks):
-    for network in dockerNetworks:
-        print("Removing docker network %s" % network)
-        stringCmd = "docker network rm %s" % (network)
+def removeDockerContainer(container):
+    # a forced remove kills the container if it is running
+    try:
+        getDockerClient().removeContainer(container, force=True)
+    except (RuntimeError, OSError) as err:
+        # already removed, e.g. by an earlier cleanup
+        if isinstance(err, DockerApiError) and err.status == 404:
+            return None
+        logger.critical("Could not remove docker container %s\n Error: %s", container, err)
+        print("Could not remove docker container %s" % container)
+        return False
+    logger.info("Removed docker container %s", container)
+    return True
 
-        cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+def removeDockerContainers(dockerNames, executor):
+    # the networks can only be removed once all the containers are gone
+    futures = [executor.submit(removeDockerContainer, container) for container in dockerNames]
+    wait(futures)
+    return sum(1 for future in futures if future.result() is True)
+
+def removeDockerNetwork(network):
+    try:
+        getDockerClient().removeNetwork(network)
+    except (RuntimeError, OSError) as err:
+        # already removed, e.g. by an earlier cleanup
+        if isinstance(err, DockerApiError) and err.status == 404:
+            return None
+        logger.critical("Could not remove docker network %s\n Error: %s", network, err)
+        print("Could not remove docker network %s" % network)
+        return False
+    logger.info("Removed docker network %s", network)
+    return True
 
-        for line in cmd.stderr:
-            strLine = line.decode("utf-8").rstrip('\n')
-            logger.critical("Could not remove docker network %s\n Stderr: %s", network, strLine)
-            print("Could not remove docker network %s", network)
-            #raise RuntimeError("Could not remove docker network %s", network)
+def removeDockerNetworks(dockerNetworks, executor):
+    futures = [executor.submit(removeDockerNetwork, network) for network in dockerNetworks]
+    wait(futures)
+    return sum(1 for future in futures if future.result() is True)
 
 def removeLinkBridges():
     cmd = subprocess.Popen('ovs-vsctl list-br | grep -i oywe-br', shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -157,9 +239,4 @@ def unregisterNesFromOdl(controllerInfo, neNamesList):
 
         return True
 
-    for uuid in neNamesList:
-        try:
-            unregisterNeFromOdlNewVersion(controllerInfo, uuid)
-            # unregisterNeFromOdl(controllerInfo, uuid)
-        except RuntimeError:
-            print("Failed to unregister NE=%s from ODL controller" % uuid)
+    unregisterNesFromOdlInParallel(ControllerBalancer([controllerInfo]), neNamesList)
@@ -10,7 +10,7 @@ import multiprocessing
 
 from wireless_emulator import *
 from wireless_emulator.clean import cleanup
-from wireless_emulator.odlregistration import registerNeToOdlNewVersion, unregisterNeFromOdlNewVersion
+from wireless_emulator.odlregistration import registerNesToOdl, unregisterNesFromOdlInParallel
 
 class CLI(Cmd):
     prompt = 'WirelessTransportEmulator>'
@@ -60,7 +60,11 @@ class CLI(Cmd):
 
     def do_exit(self, _line):
         "Exit"
-        cleanup(self.emulator.configFileName)
+        self.emulator.resourceSampler.stop()
+        self.emulator.controllerBalancer.stop()
+        if self.emulator.warmContainerPool is not None:
+            self.emulator.warmContainerPool.stop()
+        cleanup(self.emulator.configFileName, self.emulator.runId)
         return 'exited by user command'
 
     def do_quit(self, line):
@@ -145,37 +149,23 @@ class CLI(Cmd):
             return
 
         nodeUuid = args[0]
+        # the NEs mounted by hand are also moved to another controller when theirs fails
+        self.emulator.controllerBalancer.start(self.emulator.controllerHealthCheckInterval)
 
         if nodeUuid == 'all':
-            for node in self.emulator.networkElementList:
-                if node is not None:
-                    for controller in self.emulator.controllerList:
-                        try:
-                            registerNeToOdlNewVersion(controller, node.uuid,
-                                                  node.managementIPAddressString,
-                                                  node.netconfPortNumber)
-                            break
-                        except:
-                            print("Failed to register NE=%s having IP=%s and port=%s to the ODL controller having IP=%s" %
-                                  (node.uuid, node.managementIPAddressString, node.netconfPortNumber, controller['ip-address']))
-                            continue
-                else:
-                    print('ERROR: Node %s not found' % node)
-                    print('ERROR: usage: mount <all> for mounting all NEs')
-                    print('ERROR: usage: mount <NE_uuid> for mounting a single network element')
+            # all the NEs are registered in parallel, over the keep-alive connections to the controllers
+            start = timer()
+            nodes = [(node.uuid, node.managementIPAddressString, node.netconfPortNumber)
+                     for node in self.emulator.networkElementList]
+            failed = registerNesToOdl(self.emulator.controllerBalancer, nodes)
+            print("Mounted %d of %d NEs in %6.3f seconds" % (len(nodes) - len(failed), len(nodes), timer() - start))
+            self.emulator.controllerBalancer.printStatistics()
         else:
             node = self.emulator.getNeByName(nodeUuid)
 
             if node is not None:
-                for controller in self.emulator.controllerList:
-                    try:
-                        registerNeToOdlNewVersion(controller, node.uuid, node.managementIPAddressString,
-                                              node.netconfPortNumber)
-                        break
-                    except:
-                        print("Failed to register NE=%s having IP=%s and port=%s to the ODL controller having IP=%s" %
-                              (node.uuid, node.managementIPAddressString, node.netconfPortNumber, controller['ip-address']))
-                        continue
+                self.emulator.controllerBalancer.registerNetworkElement(node.uuid, node.managementIPAddressString,
+                                                                        node.netconfPortNumber)
             else:
                 print('ERROR: Node %s not found' % node)
                 print('ERROR: usage: mount <all> for mounting all NEs')
@@ -192,77 +182,47 @@ class CLI(Cmd):
         nodeUuid = args[0]
 
         if nodeUuid == 'all':
-            for node in self.emulator.networkElementList:
-                if node is not None:
-                    for controller in self.emulator.controllerList:
-                        try:
-                            unregisterNeFromOdlNewVersion(controller, node.uuid)
-                            break
-                        except:
-                            print("Failed to unregister NE=%s having IP=%s and port=%s from the ODL controller having IP=%s" %
-                                  (node.uuid, node.managementIPAddressString, node.netconfPortNumber, controller['ip-address']))
-                            continue
-                else:
-                    print('ERROR: Node %s not found' % node)
-                    print('ERROR: usage: unmount <all> for unmounting all NEs')
-                    print('ERROR: usage: unmount <NE_uuid> for unmounting a single network element')
+            start = timer()
+            neUuids = [node.uuid for node in self.emulator.networkElementList]
+            failed = unregisterNesFromOdlInParallel(self.emulator.controllerBalancer, neUuids)
+            print("Unmounted %d of %d NEs in %6.3f seconds" %
+                  (len(neUuids) - len(failed), len(neUuids), timer() - start))
         else:
             node = self.emulator.getNeByName(nodeUuid)
 
             if node is not None:
-                for controller in self.emulator.controllerList:
-                    try:
-                        unregisterNeFromOdlNewVersion(controller, node.uuid)
-                        break
-                    except:
-                        print("Failed to unregister NE=%s having IP=%s and port=%s from the ODL controller having IP=%s" %
-                              (node.uuid, node.managementIPAddressString, node.netconfPortNumber, controller['ip-address']))
-                        continue
+                self.emulator.controllerBalancer.unregisterNetworkElement(node.uuid)
             else:
                 print('ERROR: Node %s not found' % node)
                 print('ERROR: usage: unmount <all> for unmounting all NEs')
                 print('ERROR: usage: unmount <NE_uuid> for unmounting a single network element')
 
-    def do_print_resource_usage(self, line):
-        "Compute the average amount of resources (CPU and Memory) consumed by the WTE in a specified interval"
-        memory_percent = 0.0
+    def do_reload(self, line):
+        "Changes the running emulation to another JSON topology, only the NEs and links which changed are created again"
         args = line.split()
+        if len(args) != 1:
+            print('ERROR: usage: reload <topology.json>')
+            return
 
-        start = timer()
-
-        interval = 10
-        if len(args) > 0:
-            interval = int(args[0])
-
-        print("Computing CPU and memory usage by taking %d samples. Please wait..." % interval)
-
-        # processes = []
-        # results = Manager().dict()
-        # for i, ne in enumerate(self.emulator.networkElementList):
-        #     p = Process(target=ne.getCpuUsage, args=(interval, i, results))
-        #     processes.append(p)
-        #     p.start()
-        # for p in processes:
-        #     p.join()
+        self.emulator.reloadTopology(args[0])
 
-        cpu_percent = 0.0
-        for i in range(0, interval):
-            cpu_percent += self.emulator.getCpuUsage()
+    def do_controllers(self, line):
+        "Prints the number of NEs mounted on each ODL controller and the latency of the mount requests"
+        self.emulator.controllerBalancer.printStatistics()
 
-        cpu_percent /= float(interval)
+    def do_print_resource_usage(self, line):
+        "Prints the CPU and memory usage of each NE and of the WTE, averaged over the last samples taken in the background"
+        args = line.split()
 
-        cpu_percent /= float(multiprocessing.cpu_count())
+        start = timer()
 
-        # for ne in self.emulator.networkElementList:
-        #     cmd = "ps -g `docker inspect -f '{{.State.Pid}}' %s` --no-headers -o \"pmem\"" % ne.dockerName
-        #     output = self.emulator.executeCommandAndGetResultInOS(cmd)
-        #     for line in output:
-        #         memory_percent += float(line)
+        numberOfSamples = 10
+        if len(args) > 0:
+            numberOfSamples = int(args[0])
 
-        memory_percent = self.emulator.getMemUsage()
+        print("CPU and memory usage averaged over the last %d samples:" % numberOfSamples)
+        self.emulator.resourceSampler.printUsage(numberOfSamples)
 
         end = timer()
 
-        print('CPU Usage: %2.2f%%' % cpu_percent)
-        print('Memory usage: %2.2f%%' % memory_percent)
         print('Command took %6.3f seconds' % (end - start))
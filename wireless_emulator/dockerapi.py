@@ -0,0 +1,253 @@
+import http.client
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+DOCKER_SOCKET = '/var/run/docker.sock'
+
+# labels of the containers and networks created by the emulator, the run id is different for every start
+EMULATOR_LABEL = 'org.wte.emulator'
+RUN_ID_LABEL = 'org.wte.run-id'
+
+# the errors of a persistent connection which the daemon closed, and the requests which can then be sent again
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+
+class DockerApiError(RuntimeError):
+
+    def __init__(self, status, message):
+        super().__init__("Docker Engine API error %s: %s" % (status, message))
+        self.status = status
+        self.message = message
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, socketPath, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socketPath = socketPath
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socketPath)
+        self.sock = sock
+
+class DockerClient:
+    """Minimal Docker Engine API client talking HTTP over the docker UNIX socket.
+
+    Every thread keeps its own persistent connection, so the client can be shared
+    by the workers provisioning the NEs in parallel.
+    """
+
+    def __init__(self, socketPath=None, timeout=300):
+        if socketPath is None:
+            socketPath = DOCKER_SOCKET
+            dockerHost = os.environ.get('DOCKER_HOST')
+            if dockerHost is not None and dockerHost.startswith('unix://'):
+                socketPath = dockerHost[len('unix://'):]
+        self.socketPath = socketPath
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def getConnection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = UnixHTTPConnection(self.socketPath, self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def closeConnection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def request(self, method, path, params=None, body=None, headers=None):
+        if params:
+            path = path + '?' + urllib.parse.urlencode(params)
+        sendHeaders = {}
+        if headers is not None:
+            sendHeaders.update(headers)
+        if body is not None and not isinstance(body, (bytes, bytearray)):
+            body = json.dumps(body).encode('utf-8')
+            sendHeaders['Content-Type'] = 'application/json'
+
+        for attempt in range(0, 2):
+            conn = self.getConnection()
+            sent = False
+            try:
+                conn.request(method, path, body=body, headers=sendHeaders)
+                sent = True
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except BaseException as err:
+                # whatever failed, the connection may be left waiting for a response, the next request needs a new one
+                self.closeConnection()
+                # the daemon may have closed an idle persistent connection, the request is then sent again once on a
+                # fresh one, unless the daemon may have received it and it is not idempotent
+                if attempt == 1 or not isinstance(err, STALE_CONNECTION_ERRORS) or \
+                        (sent is True and method not in IDEMPOTENT_METHODS):
+                    raise
+
+        if response.status >= 400:
+            message = data.decode('utf-8', 'replace')
+            try:
+                message = json.loads(message)['message']
+            except (ValueError, KeyError, TypeError):
+                pass
+            logger.debug("%s %s failed with status %d: %s", method, path, response.status, message)
+            raise DockerApiError(response.status, message)
+
+        return response.status, data
+
+    def requestJson(self, method, path, params=None, body=None):
+        status, data = self.request(method, path, params, body)
+        if not data:
+            return None
+        return json.loads(data.decode('utf-8'))
+
+    # containers
+
+    def createContainer(self, name, image, portBindings=None, network=None, env=None, privileged=True, labels=None):
+        # equivalent of docker create -it --privileged -p hostIp:hostPort:containerPort ...
+        config = {
+            'Image': image,
+            'Tty': True,
+            'OpenStdin': True,
+            'AttachStdin': True,
+            'AttachStdout': True,
+            'AttachStderr': True,
+            'ExposedPorts': {},
+            'HostConfig': {
+                'Privileged': privileged,
+                'PortBindings': {}
+            }
+        }
+        if env is not None:
+            config['Env'] = env
+        if labels is not None:
+            config['Labels'] = labels
+        if portBindings is not None:
+            for hostIp, hostPort, containerPort in portBindings:
+                key = '%s/tcp' % containerPort
+                config['ExposedPorts'][key] = {}
+                config['HostConfig']['PortBindings'].setdefault(key, []).append(
+                    {'HostIp': str(hostIp), 'HostPort': str(hostPort)})
+        if network is not None:
+            config['HostConfig']['NetworkMode'] = network
+
+        result = self.requestJson('POST', '/containers/create', params={'name': name}, body=config)
+        return result['Id']
+
+    def startContainer(self, name):
+        self.request('POST', '/containers/%s/start' % name)
+
+    def inspectContainer(self, name):
+        return self.requestJson('GET', '/containers/%s/json' % name)
+
+    def getContainerPid(self, name):
+        return self.inspectContainer(name)['State']['Pid']
+
+    def killContainer(self, name):
+        self.request('POST', '/containers/%s/kill' % name)
+
+    def stopContainer(self, name):
+        self.request('POST', '/containers/%s/stop' % name)
+
+    def removeContainer(self, name, force=False):
+        params = None
+        if force is True:
+            params = {'force': '1'}
+        self.request('DELETE', '/containers/%s' % name, params=params)
+
+    def renameContainer(self, name, newName):
+        self.request('POST', '/containers/%s/rename' % name, params={'name': newName})
+
+    def listContainers(self, all=True, filters=None):
+        params = {}
+        if all is True:
+            params['all'] = '1'
+        if filters is not None:
+            params['filters'] = json.dumps(filters)
+        return self.requestJson('GET', '/containers/json', params=params)
+
+    def putArchive(self, name, path, data):
+        # extracts the tar stream in data inside the container, under path
+        self.request('PUT', '/containers/%s/archive' % name, params={'path': path}, body=data,
+                     headers={'Content-Type': 'application/x-tar'})
+
+    def execInContainer(self, name, cmd):
+        """Runs cmd inside the container and returns (exitCode, stdout, stderr)."""
+        execConfig = {'AttachStdout': True, 'AttachStderr': True, 'Tty': False, 'Cmd': cmd}
+        execId = self.requestJson('POST', '/containers/%s/exec' % name, body=execConfig)['Id']
+
+        status, data = self.request('POST', '/exec/%s/start' % execId, body={'Detach': False, 'Tty': False})
+        # the daemon hijacks the connection for the output stream, do not reuse it
+        self.closeConnection()
+        stdout, stderr = demultiplexStream(data)
+
+        exitCode = self.requestJson('GET', '/exec/%s/json' % execId)['ExitCode']
+        return exitCode, stdout, stderr
+
+    # networks
+
+    def createNetwork(self, name, subnet, ipRange=None, driver='bridge', labels=None):
+        ipamConfig = {'Subnet': subnet}
+        if ipRange is not None:
+            ipamConfig['IPRange'] = ipRange
+        config = {
+            'Name': name,
+            'Driver': driver,
+            'CheckDuplicate': True,
+            'IPAM': {'Config': [ipamConfig]}
+        }
+        if labels is not None:
+            config['Labels'] = labels
+        return self.requestJson('POST', '/networks/create', body=config)['Id']
+
+    def listNetworks(self, filters=None):
+        params = None
+        if filters is not None:
+            params = {'filters': json.dumps(filters)}
+        return self.requestJson('GET', '/networks', params=params)
+
+    def removeNetwork(self, name):
+        self.request('DELETE', '/networks/%s' % name)
+
+    def connectNetwork(self, name, container):
+        self.request('POST', '/networks/%s/connect' % name, body={'Container': container})
+
+    def disconnectNetwork(self, name, container):
+        self.request('POST', '/networks/%s/disconnect' % name, body={'Container': container})
+
+def demultiplexStream(data):
+    # non-TTY output is framed as [stream type (1 byte), 3 bytes padding, payload size (4 bytes BE)] + payload
+    stdout = bytearray()
+    stderr = bytearray()
+    offset = 0
+    while offset + 8 <= len(data):
+        streamType, size = struct.unpack('>BxxxL', data[offset:offset + 8])
+        offset += 8
+        if streamType == 2:
+            stderr += data[offset:offset + size]
+        else:
+            stdout += data[offset:offset + size]
+        offset += size
+    return bytes(stdout), bytes(stderr)
+
+_dockerClient = None
+_dockerClientLock = threading.Lock()
+
+def getDockerClient():
+    global _dockerClient
+    with _dockerClientLock:
+        if _dockerClient is None:
+            _dockerClient = DockerClient()
+        return _dockerClient
@@ -3,28 +3,57 @@ import logging
 import subprocess
 import xml.etree.ElementTree as ET
 import copy
+import datetime
 import ipaddress
+import multiprocessing
+import uuid
+from concurrent.futures import wait
+from timeit import default_timer as timer
 
 from wireless_emulator.utils import printErrorAndExit
-from wireless_emulator.ip import ManagementNetworkIPFactory, InterfaceIPFactory, MacAddressFactory
+from wireless_emulator.ip import ManagementNetworkIPFactory, InterfaceIPFactory, MacAddressFactory, PortFactory
+from wireless_emulator.leases import LeaseStore, NETCONF_PORT_LEASE, SSH_PORT_LEASE
 import wireless_emulator.networkelement as NE
 import wireless_emulator.netconfserversimulator as JNE
 from wireless_emulator.utils import Singleton
-from wireless_emulator.topology import Topology
+from wireless_emulator.topology import Topology, LINK_LAYERS, getLinkEnds, getNetworkElementLinkEnds, getLinkKey
+from wireless_emulator.artifacts import buildYangArchiveMembers
+from wireless_emulator.xmltemplates import XmlTemplates
+from wireless_emulator.profiler import StartupProfiler
+from wireless_emulator.xmlrender import XmlRenderPool
+from wireless_emulator.xmlcache import XmlDocumentCache
+from wireless_emulator.plan import validateTopology, buildPlan, writePlan, getPlanDifferences
+from wireless_emulator.reconcile import TopologyChanges, REMOVE_NETWORK_ELEMENT_STEP, REMOVE_LINK_STEP, LINK_END_STEP
+from wireless_emulator.scheduler import TaskScheduler, DOCKER_TASKS, NETLINK_TASKS
+from wireless_emulator.odlregistration import ControllerBalancer, CONTROLLER_PLACEMENTS, HASH_PLACEMENT, \
+    ODL_CONNECTIONS, CONTROLLER_HEALTH_CHECK_INTERVAL
+from wireless_emulator.readiness import NetconfReadinessProber, DEFAULT_READY_TIMEOUT
+from wireless_emulator.resources import ResourceSampler, RESOURCE_SAMPLE_INTERVAL, RESOURCE_SAMPLES
+from wireless_emulator.warmpool import WarmContainerPool, WARM_CONTAINER_IMAGES, WARM_CONTAINER_PREFIX
+from wireless_emulator.dockerapi import getDockerClient, DockerApiError, EMULATOR_LABEL, RUN_ID_LABEL
+from wireless_emulator.journal import CreationJournal, getJournalFileName, CONTAINER, NETWORK, VETH, \
+    NETWORK_ELEMENT_STEP, LINK_STEP, INTERFACE_SCRIPT_STEP
 
 logger = logging.getLogger(__name__)
 
 class Emulator(metaclass=Singleton):
 
-    def __init__(self, topologyFileName = None, xmlConfigFile = None, configFileName = None):
+    def __init__(self, topologyFileName = None, xmlConfigFile = None, configFileName = None, resume = False,
+                 offline = False, plan = None):
+        self.topologyFileName = topologyFileName
         self.networkElementList = []
         self.neNamesList = []
         self.topologies = []
+        # indexes, filled as the NEs and the links are created
+        self.networkElementsByUuid = {}
+        self.linkedInterfaces = set()
+        self.linkEnds = {}
         self.controllerList = []
         self.topoJson = None
         self.configJson = None
         self.xmlConfigFile = xmlConfigFile
         self.xmlStatusFile = None
+        self.xmlTemplates = None
         self.registerToOdl = False
         if xmlConfigFile is not None:
             self.xmlStatusFile = xmlConfigFile.replace("config", "status")
@@ -48,35 +77,142 @@ class Emulator(metaclass=Singleton):
                 logger.critical("I/O error({0}): {1}".format(err.errno, err.strerror))
                 printErrorAndExit()
 
+        # the docker containers and networks of this run are labelled with its id, for the cleanup; an interrupted
+        # start is resumed with the id it had
+        self.resume = resume
+        # offline, the topology is only compiled in a plan: nothing is written in the journal and the lease file
+        self.offline = offline
+        self.plan = plan
+        self.journal = CreationJournal(None if offline else getJournalFileName(self.configJson))
+        self.runId = None
+        if resume is True:
+            self.runId = self.journal.getLastRunId()
+        if self.runId is None:
+            self.runId = uuid.uuid4().hex
+        self.journal.runId = self.runId
+        # what the interrupted start already did and is kept when resuming it
+        self.resumedNetworkElements = set()
+        self.resumedLinks = set()
+        self.resumedInterfaceScripts = set()
+        self.leftoverResources = set()
+        # what a failed reload left: the uuids of the NEs of the topology which were not completely created, and the
+        # NEs no longer in the topology which could not be removed; the next reload creates and removes them again
+        self.failedNetworkElements = set()
+        self.failedRemovals = {}
+
+        # the addresses and ports given to the NEs are kept across restarts, so that unchanged NEs keep them
+        self.leaseFile = 'leases.jsonl'
+        if 'leaseFile' in self.configJson:
+            self.leaseFile = self.configJson['leaseFile'] or None
+        self.leaseStore = LeaseStore(self.leaseFile, self.journal, readOnly=offline)
+        # the addresses and ports of a plan are given to its NEs, whatever the lease file contains
+        if plan is not None:
+            for lease in plan['leases']:
+                self.leaseStore.saveLease(lease['type'], lease['key'], lease['value'])
+
         self.mgmtIpFactory = None
         self.intfIpFactory = None
 
         if self.configJson['managementIpNetwork'] is not None and self.configJson['hostIpNetwork'] is not None:
             if self.validatePreferedIpNetworks(self.configJson['managementIpNetwork'],
                                             self.configJson['hostIpNetwork']) == False:
-                self.mgmtIpFactory = ManagementNetworkIPFactory(self.configJson['managementIpNetwork'])
-                self.intfIpFactory = InterfaceIPFactory(self.configJson['hostIpNetwork'])
+                self.mgmtIpFactory = ManagementNetworkIPFactory(self.configJson['managementIpNetwork'], self.leaseStore)
+                self.intfIpFactory = InterfaceIPFactory(self.configJson['hostIpNetwork'], self.leaseStore)
             else:
                 logger.error("Management IP Network and Host IP Network overlap! Starting with default values!")
                 print("Management IP Network and Host IP Network overlap! Starting with default values!")
-                self.mgmtIpFactory = ManagementNetworkIPFactory('192.168.0.0/16')
-                self.intfIpFactory = InterfaceIPFactory('10.10.0.0/16')
+                self.mgmtIpFactory = ManagementNetworkIPFactory('192.168.0.0/16', self.leaseStore)
+                self.intfIpFactory = InterfaceIPFactory('10.10.0.0/16', self.leaseStore)
         else:
-            self.mgmtIpFactory = ManagementNetworkIPFactory('192.168.0.0/16')
-            self.intfIpFactory = InterfaceIPFactory('10.10.0.0/16')
+            self.mgmtIpFactory = ManagementNetworkIPFactory('192.168.0.0/16', self.leaseStore)
+            self.intfIpFactory = InterfaceIPFactory('10.10.0.0/16', self.leaseStore)
 
-        self.macAddressFactory = MacAddressFactory()
+        self.macAddressFactory = MacAddressFactory(self.leaseStore)
 
         self.netconfPortBase = None
         self.sshPortBase = None
+        self.netconfPortFactory = None
+        self.sshPortFactory = None
         self.portBasedEmulation = False
         self.emulatorIp = None
         if self.configJson['portBasedEmulation'] is True:
             self.netconfPortBase = self.configJson['netconfPortBase']
             self.sshPortBase = self.configJson['sshPortBase']
+            self.netconfPortFactory = PortFactory(self.netconfPortBase, NETCONF_PORT_LEASE, self.leaseStore)
+            self.sshPortFactory = PortFactory(self.sshPortBase, SSH_PORT_LEASE, self.leaseStore)
             self.portBasedEmulation = True
             self.emulatorIp = self.configJson['emulatorIpAddress']
 
+        # number of NEs that are provisioned (docker create/copy/start, ODL registration) in parallel
+        self.neBringUpWorkers = 1
+        if self.configJson.get('neBringUpWorkers') is not None:
+            self.neBringUpWorkers = max(1, int(self.configJson['neBringUpWorkers']))
+        self.neBringUpTimes = {}
+        self.yangArchiveMembers = None
+
+        # number of processes building and serializing the XML documents of the NEs, 0 for one per cpu; with 1 they
+        # are built here and serialized while the NEs are provisioned
+        self.xmlRenderWorkers = 1
+        if self.configJson.get('xmlRenderWorkers') is not None:
+            self.xmlRenderWorkers = int(self.configJson['xmlRenderWorkers'])
+            if self.xmlRenderWorkers <= 0:
+                self.xmlRenderWorkers = multiprocessing.cpu_count()
+
+        # the serialized XML documents of the NEs are kept across runs, and the performance timestamps of all the
+        # documents of a run are computed from the same time
+        self.xmlTimestamp = datetime.datetime.utcnow()
+        self.xmlCacheDirectory = 'xml-cache'
+        if 'xmlCacheDirectory' in self.configJson:
+            self.xmlCacheDirectory = self.configJson['xmlCacheDirectory'] or None
+        self.xmlCache = None
+
+        # the XML documents of every NE are also written in the current folder, for debugging
+        self.writeDebugXmlFiles = False
+        if self.configJson.get('writeDebugXmlFiles') is True:
+            self.writeDebugXmlFiles = True
+
+        # the duration of every startup phase, per NE and per link, is written in a JSON and a folded stacks report
+        self.profiler = StartupProfiler()
+        self.startupProfileFile = 'startup-profile'
+        if 'startupProfileFile' in self.configJson:
+            self.startupProfileFile = self.configJson['startupProfileFile']
+
+        # the NEs are registered to ODL in the background, once their NETCONF server sent its banner
+        self.netconfReadyTimeout = DEFAULT_READY_TIMEOUT
+        if self.configJson.get('netconfReadyTimeout') is not None:
+            self.netconfReadyTimeout = float(self.configJson['netconfReadyTimeout'])
+        self.readinessProber = NetconfReadinessProber(self.netconfReadyTimeout, workers=ODL_CONNECTIONS)
+        self.odlRegistrations = []
+
+        # the cpu and memory usage of the containers is sampled in the background, from their cgroups
+        resourceSampleInterval = RESOURCE_SAMPLE_INTERVAL
+        if self.configJson.get('resourceSampleInterval') is not None:
+            resourceSampleInterval = float(self.configJson['resourceSampleInterval'])
+        resourceSamples = RESOURCE_SAMPLES
+        if self.configJson.get('resourceSamples') is not None:
+            resourceSamples = max(1, int(self.configJson['resourceSamples']))
+        self.resourceSampler = ResourceSampler(resourceSampleInterval, resourceSamples)
+
+        # containers created in advance, per image, which the NEs created once the emulation runs take instead of
+        # creating theirs; their ports cannot be published, so without port based emulation the NEs are then managed
+        # on their own address, and not through the gateway of their docker network
+        self.warmContainerPoolSizes = {}
+        for image, size in (self.configJson.get('warmContainerPool') or {}).items():
+            if image not in WARM_CONTAINER_IMAGES:
+                logger.error("Containers of image %s cannot be created in advance", image)
+                print("Containers of image %s cannot be created in advance" % image)
+            elif int(size) > 0:
+                self.warmContainerPoolSizes[image] = int(size)
+        self.publishManagementPorts = self.portBasedEmulation is True or not self.warmContainerPoolSizes
+        self.warmContainerPool = None
+        if self.warmContainerPoolSizes and offline is False:
+            self.warmContainerPool = WarmContainerPool(self.warmContainerPoolSizes, self.createWarmContainer,
+                                                       '%s%s_' % (WARM_CONTAINER_PREFIX, self.runId[:8]))
+
+        # the metrics are served over HTTP, in the Prometheus text format, only when a port is given
+        self.metricsPort = self.configJson.get('metricsPort')
+        self.metricsAddress = self.configJson.get('metricsAddress') or '0.0.0.0'
+
         self.saveControllerInfo()
 
     def validatePreferedIpNetworks(self, mngIpNetwork, hostIpNetwork):
@@ -94,9 +230,20 @@ class Emulator(metaclass=Singleton):
             controllerInfo['port'] = controller['port']
             controllerInfo['username'] = controller['username']
             controllerInfo['password'] = controller['password']
+            controllerInfo['weight'] = controller.get('weight', 1)
 
             self.controllerList.append(controllerInfo)
 
+        placement = self.configJson.get('controllerPlacement', HASH_PLACEMENT)
+        if placement not in CONTROLLER_PLACEMENTS:
+            logger.error("Invalid controllerPlacement=%s, using %s", placement, HASH_PLACEMENT)
+            print("Invalid controllerPlacement=%s, using %s" % (placement, HASH_PLACEMENT))
+            placement = HASH_PLACEMENT
+        self.controllerBalancer = ControllerBalancer(self.controllerList, placement, self.journal)
+        self.controllerHealthCheckInterval = CONTROLLER_HEALTH_CHECK_INTERVAL
+        if self.configJson.get('controllerHealthCheckInterval') is not None:
+            self.controllerHealthCheckInterval = float(self.configJson['controllerHealthCheckInterval'])
+
 
         # if self.controllerInfo['ip-address'] is None or self.controllerInfo['port'] is None \
         #     or self.controllerInfo['username'] is None or self.controllerInfo['password'] is None:
@@ -106,38 +253,208 @@ class Emulator(metaclass=Singleton):
         self.registerToOdl = self.configJson['automatic-odl-registration']
 
 
+    def getXmlTemplates(self):
+        # the XML default values files are parsed and split only once, the NEs get copies of the skeletons
+        if self.xmlTemplates is None:
+            self.xmlTemplates = XmlTemplates(self.xmlConfigFile, self.xmlStatusFile)
+        return self.xmlTemplates
+
     def createNetworkElements(self):
         logger.debug("Creating Network Elements")
 
+        self.saveLinkEnds()
+        if self.xmlCacheDirectory is not None:
+            self.xmlCache = XmlDocumentCache(self.xmlCacheDirectory, self.xmlConfigFile, self.xmlStatusFile,
+                                             self.configJson)
+        # the NEs whose XML documents are neither built nor found in the cache, for the render pool
+        pendingNetworkElements = []
+
         neId = 1
         for ne in self.topoJson['network-elements']:
             neUuid = ne['network-element']['uuid']
-            interfaces = None
-            if ne['network-element'].get('interfaces') is not None:
-                interfaces = ne['network-element']['interfaces']
-            eth_x_conn = None
-            dockerType = None
-            ptpClock = None
-            if ne['network-element'].get('eth-cross-connections') is not None:
-                eth_x_conn = ne['network-element']['eth-cross-connections']
-            if ne['network-element'].get('type') is not None:
-                dockerType = ne['network-element']['type']
-            if ne['network-element'].get('ptp-clock') is not None:
-                ptpClock = ne['network-element']['ptp-clock']
             neObj = None
-            try:
-                if (dockerType == "JavaNetconfServer"):
-                    neObj = JNE.NetconfServerSimulator(neUuid, neId, dockerType, ne['network-element'] )
+            with self.profiler.phase('create-network-elements', neUuid, 'xml-build'):
+                try:
+                    neObj = self.createNetworkElementObject(ne['network-element'], neId)
+                except ValueError:
+                    logger.critical("Could not create Network Element=%s", neUuid)
+                    printErrorAndExit()
+                # the XML model is built in JSON order, so that NE ids and IP/port allocation stay deterministic
+                if self.offline is True:
+                    # a plan only gives the key of the XML documents, they are built when it is applied
+                    self.setXmlCacheKey(neObj, ne['network-element'])
+                    neObj.buildNetworkElementObjects()
+                elif self.loadCachedXmlDocuments(neObj, ne['network-element']) is True:
+                    neObj.buildNetworkElementObjects()
+                elif self.xmlRenderWorkers == 1:
+                    neObj.buildNetworkElementXml()
                 else:
-                    neObj = NE.NetworkElement(neUuid, neId, interfaces, eth_x_conn, dockerType, ptpClock)
-            except ValueError:
-                logger.critical("Could not create Network Element=%s", neUuid)
-                printErrorAndExit()
-            neObj.addNetworkElement()
+                    pendingNetworkElements.append((len(self.networkElementList), neObj))
             self.networkElementList.append(neObj)
+            self.networkElementsByUuid.setdefault(neObj.uuid, neObj)
             self.neNamesList.append(neObj.uuid)
             neId += 1
 
+        if pendingNetworkElements:
+            self.renderXmlDocumentsInPool(pendingNetworkElements)
+        if self.xmlCache is not None and self.offline is False:
+            statistics = self.xmlCache.getStatistics()
+            print("XML documents of %d NEs found in the cache, %d built" % (statistics['hits'], statistics['misses']))
+
+    def createNetworkElementObject(self, neJson, neId):
+        # neJson is the 'network-element' object of an NE of the JSON topology
+        dockerType = neJson.get('type')
+        if dockerType == "JavaNetconfServer":
+            return JNE.NetconfServerSimulator(neJson['uuid'], neId, dockerType, neJson)
+        return NE.NetworkElement(neJson['uuid'], neId, neJson.get('interfaces'), neJson.get('eth-cross-connections'),
+                                 dockerType, neJson.get('ptp-clock'))
+
+    def loadCachedXmlDocuments(self, neObj, neJson):
+        if self.setXmlCacheKey(neObj, neJson) is False:
+            return False
+        cached = self.xmlCache.load(neObj.xmlCacheKey, self.xmlTimestamp)
+        if cached is None:
+            return False
+        neObj.xmlConfigurationBytes, neObj.xmlStatusBytes = cached
+        return True
+
+    def setXmlCacheKey(self, neObj, neJson):
+        if self.xmlCache is None or not isinstance(neObj, NE.NetworkElement):
+            return False
+        linkEnds = getNetworkElementLinkEnds(self.linkEnds, neObj.uuid, neJson)
+        # the documents built in this run are stored by the NE, once they are serialized
+        neObj.xmlCacheKey = self.xmlCache.getKey(neJson, linkEnds, neObj.managementIPAddressString)
+        return True
+
+    def renderXmlDocumentsInPool(self, networkElements):
+        # networkElements gives the NEs with their index in networkElementList
+        renderPool = XmlRenderPool(self.xmlRenderWorkers)
+        renderPool.start()
+        try:
+            # the workers build the XML model of their copy of the NEs, here only the objects are built
+            futures = [(neObj, renderPool.submit(index)) for index, neObj in networkElements
+                       if isinstance(neObj, NE.NetworkElement)]
+            for index, neObj in networkElements:
+                with self.profiler.phase('create-network-elements', neObj.uuid, 'object-build'):
+                    neObj.buildNetworkElementObjects()
+            with self.profiler.phase('create-network-elements', 'xml-render-pool'):
+                for neObj, future in futures:
+                    neObj.xmlConfigurationBytes, neObj.xmlStatusBytes = future.result()
+        finally:
+            renderPool.stop()
+
+    def saveLinkEnds(self):
+        self.linkEnds = getLinkEnds(self.topoJson)
+
+    def getLinkEnd(self, layer, neUuid, intfUuid):
+        return self.linkEnds[layer].get((neUuid, intfUuid))
+
+    def provisionNetworkElement(self, neObj):
+        start = timer()
+        with self.profiler.phase('provision-network-elements', neObj.uuid):
+            if neObj.uuid in self.resumedNetworkElements:
+                neObj.saveNetworkNamespace()
+                # it may have been stopped before the registration, which can be repeated
+                if self.registerToOdl is True:
+                    self.registerNetworkElementWhenReady(neObj)
+            else:
+                if self.resume is True:
+                    self.removeLeftoverNetworkElement(neObj)
+                try:
+                    neObj.provisionNetworkElement()
+                except Exception:
+                    self.releaseWarmContainer(neObj)
+                    raise
+                self.journal.recordStep(NETWORK_ELEMENT_STEP, neObj.uuid)
+        self.neBringUpTimes[neObj.uuid] = timer() - start
+        logger.info("Network Element %s was provisioned in %6.3f seconds", neObj.uuid, self.neBringUpTimes[neObj.uuid])
+
+    def bringUpNetwork(self):
+        # every NE, link and interface script is a task, started as soon as the tasks it depends on are done: a link
+        # once its two NEs are provisioned, an interface script once its NE and all the links of the NE are added
+        logger.debug("Bringing up %d Network Elements using %d workers",
+                     len(self.networkElementList), self.neBringUpWorkers)
+        start = timer()
+
+        if self.yangArchiveMembers is None:
+            self.yangArchiveMembers = buildYangArchiveMembers('yang')
+        if self.resume is True:
+            self.removeLeftoverVethPairs()
+
+        scheduler = TaskScheduler({DOCKER_TASKS: self.neBringUpWorkers, NETLINK_TASKS: self.neBringUpWorkers})
+        for neObj in self.networkElementList:
+            scheduler.addTask((NETWORK_ELEMENT_STEP, neObj.uuid), DOCKER_TASKS,
+                              lambda neObj=neObj: self.provisionNetworkElement(neObj))
+
+        linksByNetworkElement = {}
+        for topo in self.topologies:
+            for linkObj in topo.linkList:
+                if linkObj.getJournalName() in self.resumedLinks:
+                    continue
+                dependencies = [(NETWORK_ELEMENT_STEP, intf.getNeName()) for intf in linkObj.interfacesObj]
+                task = scheduler.addTask((LINK_STEP, linkObj.getJournalName()), NETLINK_TASKS, linkObj.addLink,
+                                         set(dependencies))
+                for intf in linkObj.interfacesObj:
+                    linksByNetworkElement.setdefault(intf.getNeName(), []).append(task)
+
+        for neObj in self.networkElementList:
+            if neObj.uuid in self.resumedInterfaceScripts:
+                continue
+            dependencies = [(NETWORK_ELEMENT_STEP, neObj.uuid)] + linksByNetworkElement.get(neObj.uuid, [])
+            scheduler.addTask((INTERFACE_SCRIPT_STEP, neObj.uuid), DOCKER_TASKS,
+                              lambda neObj=neObj: self.addInterfacesInDockerContainer(neObj), dependencies)
+
+        try:
+            scheduler.run()
+        except Exception:
+            step, name = scheduler.failedTask
+            if step == NETWORK_ELEMENT_STEP:
+                print("Could not provision Network Element=%s" % name)
+            elif step == LINK_STEP:
+                print("Could not add link %s" % name)
+            else:
+                print("Could not add the interfaces in docker container %s" % name)
+            raise
+
+        end = timer()
+        self.printNetworkElementsBringUpTimes(end - start)
+        print("Critical path of the bring-up: %6.3f seconds, sum of all the steps: %6.3f seconds" %
+              (scheduler.getCriticalPathSeconds(), scheduler.getTotalTaskSeconds()))
+
+    def registerNetworkElementWhenReady(self, neObj):
+        startTime = timer()
+        future = self.readinessProber.submitNetworkElement(
+            neObj.uuid, neObj.managementIPAddressString, neObj.netconfPortNumber, startTime,
+            lambda ready: self.registerNetworkElementToOdl(neObj, ready, startTime))
+        self.odlRegistrations.append(future)
+
+    def registerNetworkElementToOdl(self, neObj, ready, startTime):
+        phase = 'register-network-elements'
+        if ready is not None:
+            self.profiler.addDuration((phase, neObj.uuid, 'netconf-ready'), timer() - startTime)
+        if ready is False:
+            print("NETCONF server of NE=%s was not ready after %d seconds, registering it anyway" %
+                  (neObj.uuid, self.netconfReadyTimeout))
+        with self.profiler.phase(phase, neObj.uuid, 'odl-registration'):
+            self.controllerBalancer.registerNetworkElement(neObj.uuid, neObj.managementIPAddressString,
+                                                           neObj.netconfPortNumber)
+
+    def waitForOdlRegistrations(self):
+        wait(self.odlRegistrations)
+        for future in self.odlRegistrations:
+            if future.exception() is not None:
+                logger.error("Could not register a Network Element to ODL: %s", future.exception())
+        self.readinessProber.stop()
+        self.readinessProber.printStatistics()
+        self.controllerBalancer.printStatistics()
+
+    def printNetworkElementsBringUpTimes(self, totalTime):
+        print("Network Elements bring-up times:")
+        for neObj in self.networkElementList:
+            print("  %s: %6.3f seconds" % (neObj.uuid, self.neBringUpTimes[neObj.uuid]))
+        print("Provisioned %d Network Elements in %6.3f seconds using %d workers" %
+              (len(self.networkElementList), totalTime, self.neBringUpWorkers))
+
     def createTopologiesList(self):
 
         logger.debug("Creating topologies list mwps...")
@@ -145,6 +462,8 @@ class Emulator(metaclass=Singleton):
         mwpsTopo = self.topoJson['topologies']['mwps']
 
         topoObj = Topology(mwpsTopo, "mwps")
+        topoObj.createLinks()
+        self.linkedInterfaces.update(topoObj.linkedInterfaces)
         self.topologies.append(topoObj)
 
         logger.debug("Creating topologies list ety...")
@@ -152,40 +471,516 @@ class Emulator(metaclass=Singleton):
         etyTopo = self.topoJson['topologies']['ety']
 
         etyObj = Topology(etyTopo, "ety")
+        etyObj.createLinks()
+        self.linkedInterfaces.update(etyObj.linkedInterfaces)
         self.topologies.append(etyObj)
 
-    def buildTopologies(self):
-        logger.debug("Building topologies...")
-        for topo in self.topologies:
-            topo.buildTopology()
-
-    def createTopologies(self):
-        self.createTopologiesList()
-        self.buildTopologies()
-
     def isInterfaceObjPartOfLink(self, intfObj):
         logger.debug("checking if interface is part of object for intf=%s", intfObj.uuid)
-        for topo in self.topologies:
-            if topo.isInterfaceObjPartOfLink(intfObj) is True:
-                return True
-
-        return False
+        return intfObj in self.linkedInterfaces
 
-    def addInterfacesInDocker(self):
+    def createInterfaceScripts(self):
         for ne in self.networkElementList:
-            print("Adding relevant interfaces in docker container %s..." % ne.uuid)
             ne.addInterfacesInDockerContainerToScript()
 
+    def addInterfacesInDockerContainer(self, neObj):
+        print("Adding relevant interfaces in docker container %s..." % neObj.uuid)
+        neObj.runInterfaceScriptInDockerContainer()
+        self.journal.recordStep(INTERFACE_SCRIPT_STEP, neObj.uuid)
+
+    def isDockerContainerRunning(self, dockerName):
+        try:
+            return getDockerClient().inspectContainer(dockerName)['State']['Running'] is True
+        except DockerApiError as err:
+            if err.status == 404:
+                return False
+            raise
+
+    def planResume(self):
+        # an NE is kept if it was provisioned and its container still runs, a link if both its NEs are kept, and an
+        # interface script if its NE is kept; an NE whose script already ran must be provisioned again when one of
+        # its links is added again, the script configures the link ends
+        completedNetworkElements = self.journal.getCompletedSteps(NETWORK_ELEMENT_STEP)
+        completedLinks = self.journal.getCompletedSteps(LINK_STEP)
+        completedInterfaceScripts = self.journal.getCompletedSteps(INTERFACE_SCRIPT_STEP)
+        self.leftoverResources = set((record['resource'], record['name'])
+                                     for record in self.journal.getRecords(self.runId))
+
+        self.resumedNetworkElements = set()
+        for neObj in self.networkElementList:
+            if neObj.uuid in completedNetworkElements and self.isDockerContainerRunning(neObj.dockerName):
+                self.resumedNetworkElements.add(neObj.uuid)
+
+        links = [linkObj for topo in self.topologies for linkObj in topo.linkList]
+        changed = True
+        while changed:
+            changed = False
+            self.resumedLinks = set()
+            for linkObj in links:
+                if linkObj.getJournalName() in completedLinks and \
+                        all(intf.getNeName() in self.resumedNetworkElements for intf in linkObj.interfacesObj):
+                    self.resumedLinks.add(linkObj.getJournalName())
+            for linkObj in links:
+                if linkObj.getJournalName() in self.resumedLinks:
+                    continue
+                for intf in linkObj.interfacesObj:
+                    if intf.getNeName() in self.resumedNetworkElements and \
+                            intf.getNeName() in completedInterfaceScripts:
+                        self.resumedNetworkElements.discard(intf.getNeName())
+                        changed = True
+
+        self.resumedInterfaceScripts = completedInterfaceScripts & self.resumedNetworkElements
+
+        print("Resuming run %s: keeping %d of %d Network Elements and %d of %d links" %
+              (self.runId, len(self.resumedNetworkElements), len(self.networkElementList),
+               len(self.resumedLinks), len(links)))
+
+    def removeLeftoverNetworkElement(self, neObj):
+        # the container and the network of the interrupted start, if they were created, are created again
+        client = getDockerClient()
+        if (CONTAINER, neObj.dockerName) in self.leftoverResources:
+            try:
+                client.removeContainer(neObj.dockerName, force=True)
+            except DockerApiError as err:
+                if err.status != 404:
+                    raise
+        if (NETWORK, neObj.networkName) in self.leftoverResources:
+            try:
+                client.removeNetwork(neObj.networkName)
+            except DockerApiError as err:
+                if err.status != 404:
+                    raise
+
+    def removeLeftoverVethPairs(self):
+        linksByJournalName = {}
+        for topo in self.topologies:
+            for linkObj in topo.linkList:
+                linksByJournalName[linkObj.getJournalName()] = linkObj
+        for record in self.journal.getRecords(self.runId, VETH):
+            linkObj = linksByJournalName.get(record.get('link'))
+            if linkObj is not None and record['link'] not in self.resumedLinks:
+                linkObj.removeLeftoverVethPair(record['name'])
+
+    def compileTopology(self):
+        # everything that can be derived from the JSON topology is done before the first container is created:
+        # the links are validated and the interface scripts are copied in the containers with the XML files
+        errors = validateTopology(self.topoJson)
+        if errors:
+            for error in errors:
+                logger.critical(error)
+                print(error)
+            printErrorAndExit()
+
+        with self.profiler.phase('create-network-elements'):
+            self.createNetworkElements()
+        with self.profiler.phase('create-topologies'):
+            self.createTopologiesList()
+        with self.profiler.phase('create-interface-scripts'):
+            self.createInterfaceScripts()
+
+    def compilePlan(self, planFileName):
+        start = timer()
+        self.compileTopology()
+        plan = buildPlan(self)
+        writePlan(plan, planFileName)
+        print("Plan of %d NEs and %d links written to %s in %6.3f seconds" %
+              (len(plan['networkElements']), len(plan['links']), planFileName, timer() - start))
+
+    def checkPlan(self):
+        differences = getPlanDifferences(self.plan, buildPlan(self))
+        if differences:
+            for difference in differences:
+                logger.critical("The topology does not follow the plan: %s", difference)
+                print("The topology does not follow the plan: %s" % difference)
+            printErrorAndExit()
+
     def startEmulator(self):
-        self.createNetworkElements()
-        self.createTopologies()
-        self.addInterfacesInDocker()
+        self.compileTopology()
+        if self.plan is not None:
+            self.checkPlan()
+        if self.resume is True:
+            self.planResume()
+
+        with self.profiler.phase('bring-up'):
+            self.bringUpNetwork()
+
+        if self.registerToOdl is True:
+            with self.profiler.phase('register-network-elements'):
+                self.waitForOdlRegistrations()
+
+        self.writeStartupProfile()
+
+        self.resourceSampler.start([(neObj.uuid, neObj.networkNamespace) for neObj in self.networkElementList])
+        if self.registerToOdl is True:
+            self.controllerBalancer.start(self.controllerHealthCheckInterval)
+        # only now, so that the NEs of the topology get the ports of their id
+        if self.warmContainerPool is not None:
+            self.warmContainerPool.start()
+
+    def writeStartupProfile(self):
+        if not self.startupProfileFile:
+            return
+        numberOfLinks = 0
+        for topo in self.topologies:
+            numberOfLinks += len(topo.linkList)
+        extraInfo = {'numberOfNetworkElements': len(self.networkElementList),
+                     'numberOfLinks': numberOfLinks,
+                     'neBringUpWorkers': self.neBringUpWorkers,
+                     'xmlRenderWorkers': self.xmlRenderWorkers}
+        if self.xmlCache is not None:
+            extraInfo['xmlCache'] = self.xmlCache.getStatistics()
+        if self.registerToOdl is True:
+            extraInfo['controllers'] = self.controllerBalancer.getStatistics()
+            extraInfo['netconfReadiness'] = self.readinessProber.getStatistics()
+        try:
+            jsonFileName, foldedFileName = self.profiler.writeReports(self.startupProfileFile, extraInfo)
+        except IOError as err:
+            logger.error("Could not write the startup profile %s: %s", self.startupProfileFile, err.strerror)
+            return
+        print("Startup profile written to %s and %s" % (jsonFileName, foldedFileName))
+
+    def reloadTopology(self, topologyFileName):
+        """Changes the running emulation to the topology of topologyFileName.
+
+        Only the NEs and the links which changed are created, removed or connected again, the other NEs keep running
+        and stay mounted on the controller. Returns False when the topology could not be reloaded.
+        """
+        start = timer()
+        try:
+            with open(topologyFileName) as json_data:
+                topoJson = json.load(json_data)
+        except (IOError, ValueError) as err:
+            logger.error("Could not read topology file=%s: %s", topologyFileName, err)
+            print("Could not read topology file %s: %s" % (topologyFileName, err))
+            return False
+        errors = validateTopology(topoJson)
+        if errors:
+            for error in errors:
+                logger.error(error)
+                print(error)
+            print("The topology was not reloaded")
+            return False
+
+        changes = TopologyChanges(self.topoJson, topoJson)
+        changes.recreateNetworkElements(self.failedNetworkElements)
+        if changes.isEmpty() and not self.failedRemovals:
+            self.topologyFileName = topologyFileName
+            print("The topology did not change")
+            return True
+        changes.printChanges()
+        # what an interrupted start left is only kept by the start which resumed it
+        self.resumedNetworkElements = set()
+        self.resumedLinks = set()
+        self.resumedInterfaceScripts = set()
+
+        removedNetworkElements = [self.networkElementsByUuid[neUuid]
+                                  for neUuid in changes.removedNetworkElements + changes.changedNetworkElements]
+        removedLinks = [(topo.topologyLayer, linkObj) for topo in self.topologies for linkObj in topo.linkList
+                        if (topo.topologyLayer, getLinkKey(linkObj.linkEnds)) not in changes.keptLinks]
+        state = (self.topoJson, self.linkEnds, self.networkElementList, self.networkElementsByUuid,
+                 self.neNamesList, self.topologies, self.linkedInterfaces)
+        addedNetworkElements = []
+        try:
+            with self.profiler.phase('reload-topology', 'compile'):
+                self.compileTopologyChanges(topoJson, changes, removedNetworkElements, addedNetworkElements)
+        except (ValueError, RuntimeError, KeyError, AttributeError, TypeError) as err:
+            # the NEs keep running with their addresses and ports, the ones given to the new NEs are released
+            logger.error("Could not compile the reloaded topology: %s", err)
+            print("Could not compile the reloaded topology, it was not reloaded: %s" % err)
+            for neObj in addedNetworkElements:
+                self.releaseNetworkElementLeases(neObj)
+                self.releaseWarmContainer(neObj)
+            for neObj in removedNetworkElements:
+                self.claimNetworkElementLeases(neObj)
+            self.topoJson, self.linkEnds, self.networkElementList, self.networkElementsByUuid, self.neNamesList, \
+                self.topologies, self.linkedInterfaces = state
+            return False
+        self.topologyFileName = topologyFileName
+
+        # the NEs which a former reload could not remove are removed first
+        failedRemovals = list(self.failedRemovals.values())
+        addedLinks = [(topo.topologyLayer, linkObj) for topo in self.topologies for linkObj in topo.linkList
+                      if (topo.topologyLayer, getLinkKey(linkObj.linkEnds)) not in changes.keptLinks]
+        try:
+            with self.profiler.phase('reload-topology', 'apply'):
+                self.applyTopologyChanges(failedRemovals + removedNetworkElements,
+                                          [linkObj for layer, linkObj in removedLinks],
+                                          addedNetworkElements, [linkObj for layer, linkObj in addedLinks])
+        except Exception as err:
+            print("The topology was only partly reloaded: %s" % err)
+            print("%d NEs will be created again and %d NEs removed again by the next reload" %
+                  (len(self.failedNetworkElements), len(self.failedRemovals)))
+            return False
+        finally:
+            self.resourceSampler.removeNetworkElements(neObj.uuid for neObj in removedNetworkElements)
+            self.resourceSampler.addNetworkElements([(neObj.uuid, neObj.networkNamespace)
+                                                     for neObj in addedNetworkElements
+                                                     if neObj.uuid not in self.failedNetworkElements])
+            if self.registerToOdl is True:
+                self.waitForOdlRegistrations()
+
+        if self.warmContainerPool is not None:
+            self.warmContainerPool.printStatistics()
+        print("Reloaded the topology in %6.3f seconds" % (timer() - start))
+        return True
+
+    def compileTopologyChanges(self, topoJson, changes, removedNetworkElements, addedNetworkElements):
+        # the NE and link objects of the new topology, the ones which are kept are reused; the new NEs are added to
+        # addedNetworkElements as soon as they are created, so that their leases are released if the compile fails
+        for neObj in removedNetworkElements:
+            self.releaseNetworkElementLeases(neObj)
+        keptLinks = dict((layer, {}) for layer in LINK_LAYERS)
+        for topo in self.topologies:
+            for linkObj in topo.linkList:
+                linkKey = getLinkKey(linkObj.linkEnds)
+                if (topo.topologyLayer, linkKey) in changes.keptLinks:
+                    keptLinks[topo.topologyLayer][linkKey] = linkObj
+
+        # the changed NEs keep their id, and so their docker network, the new ones get ids which were never used
+        ids = dict((neObj.uuid, neObj.id) for neObj in self.networkElementList)
+        neId = max(list(ids.values()) + [0]) + 1
+
+        self.topoJson = topoJson
+        self.saveLinkEnds()
+        self.networkElementsByUuid = dict((neUuid, neObj) for neUuid, neObj in self.networkElementsByUuid.items()
+                                          if neUuid in changes.keptNetworkElements)
+        networkElementList = []
+        for ne in topoJson['network-elements']:
+            neJson = ne['network-element']
+            neObj = self.networkElementsByUuid.get(neJson['uuid'])
+            if neObj is None:
+                if neJson['uuid'] not in ids:
+                    ids[neJson['uuid']] = neId
+                    neId += 1
+                with self.profiler.phase('reload-topology', neJson['uuid'], 'xml-build'):
+                    neObj = self.createNetworkElementObject(neJson, ids[neJson['uuid']])
+                    addedNetworkElements.append(neObj)
+                    if self.loadCachedXmlDocuments(neObj, neJson) is True:
+                        neObj.buildNetworkElementObjects()
+                    else:
+                        neObj.buildNetworkElementXml()
+                self.networkElementsByUuid[neObj.uuid] = neObj
+            networkElementList.append(neObj)
+        self.networkElementList = networkElementList
+        self.neNamesList = [neObj.uuid for neObj in networkElementList]
+
+        topologies = []
+        linkedInterfaces = set()
+        for layer in LINK_LAYERS:
+            topoObj = Topology(topoJson['topologies'][layer], layer)
+            topoObj.createLinks(keptLinks[layer])
+            linkedInterfaces.update(topoObj.linkedInterfaces)
+            topologies.append(topoObj)
+        self.topologies = topologies
+        self.linkedInterfaces = linkedInterfaces
+
+        for neObj in addedNetworkElements:
+            neObj.addInterfacesInDockerContainerToScript()
+
+    def releaseNetworkElementLeases(self, neObj):
+        # the addresses and ports stay leased to the NE, they are given again to it when it is created again
+        self.mgmtIpFactory.releaseLeasedNetworkIp(neObj.networkIPAddress)
+        if self.portBasedEmulation is True:
+            self.netconfPortFactory.releasePort(neObj.netconfPortNumber)
+            self.sshPortFactory.releasePort(neObj.sshPortNumber)
+        for xconn in getattr(neObj, 'ethCrossConnectList', []):
+            if xconn.hostIpAddress is not None:
+                self.intfIpFactory.releaseLeasedIp(xconn.hostIpAddress)
+        for intfObj in getattr(neObj, 'interfaceList', []):
+            if getattr(intfObj, 'macAddress', None) is not None:
+                self.macAddressFactory.releaseMacAddress(intfObj.macAddress)
+
+    def claimNetworkElementLeases(self, neObj):
+        # the addresses and ports released by releaseNetworkElementLeases, given back to the NE which keeps running
+        self.mgmtIpFactory.claimLeasedNetworkIp(neObj.networkIPAddress)
+        if self.portBasedEmulation is True:
+            self.netconfPortFactory.claimPort(neObj.netconfPortNumber)
+            self.sshPortFactory.claimPort(neObj.sshPortNumber)
+        for xconn in getattr(neObj, 'ethCrossConnectList', []):
+            if xconn.hostIpAddress is not None:
+                self.intfIpFactory.claimLeasedIp(xconn.hostIpAddress)
+        for intfObj in getattr(neObj, 'interfaceList', []):
+            if getattr(intfObj, 'macAddress', None) is not None:
+                self.macAddressFactory.claimMacAddress(intfObj.macAddress)
+
+    def applyTopologyChanges(self, removedNetworkElements, removedLinks, addedNetworkElements, addedLinks):
+        # the NEs and links are removed and added as a dependency graph: a new link end of a kept NE once the link
+        # which used its interface is removed, a link once its NEs are running, a script once the links of its NE
+        # are added
+        scheduler = TaskScheduler({DOCKER_TASKS: self.neBringUpWorkers, NETLINK_TASKS: self.neBringUpWorkers})
+        self.odlRegistrations = []
+
+        removedTasks = {}
+        for neObj in removedNetworkElements:
+            unregister = neObj.uuid not in self.networkElementsByUuid
+            removedTasks[neObj.uuid] = scheduler.addTask(
+                (REMOVE_NETWORK_ELEMENT_STEP, neObj.uuid), DOCKER_TASKS,
+                lambda neObj=neObj, unregister=unregister: self.removeNetworkElement(neObj, unregister))
+
+        # (NE uuid, interface uuid) of a kept NE -> the task after which its link end is removed
+        freedInterfaces = {}
+        for linkObj in removedLinks:
+            task = None
+            for intf in linkObj.interfacesObj:
+                if intf.neObj.uuid in removedTasks:
+                    task = removedTasks[intf.neObj.uuid]
+                    break
+            if task is None:
+                task = scheduler.addTask((REMOVE_LINK_STEP, linkObj.getJournalName()), DOCKER_TASKS, linkObj.removeLink)
+            for intf in linkObj.interfacesObj:
+                freedInterfaces[(intf.neObj.uuid, intf.getInterfaceUuid())] = task
+
+        addedTasks = {}
+        for neObj in addedNetworkElements:
+            dependencies = []
+            if neObj.uuid in removedTasks:
+                dependencies.append(removedTasks[neObj.uuid])
+            addedTasks[neObj.uuid] = scheduler.addTask((NETWORK_ELEMENT_STEP, neObj.uuid), DOCKER_TASKS,
+                                                       lambda neObj=neObj: self.provisionNetworkElement(neObj),
+                                                       dependencies)
+
+        linksByNetworkElement = {}
+        for linkObj in addedLinks:
+            dependencies = set()
+            for intf in linkObj.interfacesObj:
+                if intf.neObj.uuid in addedTasks:
+                    dependencies.add(addedTasks[intf.neObj.uuid])
+                elif (intf.neObj.uuid, intf.getInterfaceUuid()) in freedInterfaces:
+                    dependencies.add(freedInterfaces[(intf.neObj.uuid, intf.getInterfaceUuid())])
+            task = scheduler.addTask((LINK_STEP, linkObj.getJournalName()), NETLINK_TASKS, linkObj.addLink,
+                                     dependencies)
+            for intf in linkObj.interfacesObj:
+                if intf.neObj.uuid in addedTasks:
+                    linksByNetworkElement.setdefault(intf.neObj.uuid, []).append(task)
+                else:
+                    scheduler.addTask((LINK_END_STEP, intf.neObj.uuid, intf.getInterfaceUuid()), DOCKER_TASKS,
+                                      lambda intf=intf: intf.neObj.addLinkEndInDockerContainer(intf), [task])
+
+        for neObj in addedNetworkElements:
+            dependencies = [addedTasks[neObj.uuid]] + linksByNetworkElement.get(neObj.uuid, [])
+            scheduler.addTask((INTERFACE_SCRIPT_STEP, neObj.uuid), DOCKER_TASKS,
+                              lambda neObj=neObj: self.addInterfacesInDockerContainer(neObj), dependencies)
+
+        try:
+            scheduler.run()
+        except Exception:
+            print("Could not reload the topology, task %s failed" % (scheduler.failedTask,))
+            self.saveFailedChanges(scheduler, removedNetworkElements, removedLinks, addedNetworkElements, addedLinks)
+            raise
+        self.failedNetworkElements = set()
+        self.failedRemovals = {}
+        print("Critical path of the reload: %6.3f seconds, sum of all the steps: %6.3f seconds" %
+              (scheduler.getCriticalPathSeconds(), scheduler.getTotalTaskSeconds()))
+
+    def saveFailedChanges(self, scheduler, removedNetworkElements, removedLinks, addedNetworkElements, addedLinks):
+        # the NEs whose steps did not all run are created or removed again by the next reload; the links of an NE are
+        # added again with it, the NEs of another link which was not added or removed are created again
+        self.failedNetworkElements = set()
+        self.failedRemovals = {}
+        for neObj in removedNetworkElements:
+            if scheduler.isTaskDone((REMOVE_NETWORK_ELEMENT_STEP, neObj.uuid)) is False and \
+                    neObj.uuid not in self.networkElementsByUuid:
+                self.failedRemovals[neObj.uuid] = neObj
+        for neObj in addedNetworkElements:
+            if scheduler.isTaskDone((INTERFACE_SCRIPT_STEP, neObj.uuid)) is False:
+                self.failedNetworkElements.add(neObj.uuid)
+        for linkObj in removedLinks:
+            if (REMOVE_LINK_STEP, linkObj.getJournalName()) in scheduler.tasks and \
+                    scheduler.isTaskDone((REMOVE_LINK_STEP, linkObj.getJournalName())) is False:
+                self.failedNetworkElements.update(intf.neObj.uuid for intf in linkObj.interfacesObj
+                                                  if intf.neObj.uuid in self.networkElementsByUuid)
+        for linkObj in addedLinks:
+            steps = [(LINK_STEP, linkObj.getJournalName())] + \
+                    [(LINK_END_STEP, intf.neObj.uuid, intf.getInterfaceUuid()) for intf in linkObj.interfacesObj]
+            if any(intf.neObj.uuid in self.failedNetworkElements for intf in linkObj.interfacesObj):
+                continue
+            if not all(scheduler.isTaskDone(step) for step in steps if step in scheduler.tasks):
+                self.failedNetworkElements.update(intf.neObj.uuid for intf in linkObj.interfacesObj)
+        for neUuid in sorted(self.failedNetworkElements):
+            logger.error("NE=%s was not completely created, it is created again by the next reload", neUuid)
+        for neUuid in sorted(self.failedRemovals):
+            logger.error("NE=%s was not removed, it is removed again by the next reload", neUuid)
+
+    def removeNetworkElement(self, neObj, unregister):
+        # the veth ends in its namespace are deleted with the container, and with them their peers
+        with self.profiler.phase('reload-topology', neObj.uuid, 'remove'):
+            if unregister is True and self.registerToOdl is True:
+                self.controllerBalancer.unregisterNetworkElement(neObj.uuid)
+            # an NE created again may have reserved a container under the same name
+            if unregister is True:
+                self.releaseWarmContainer(neObj)
+            print("Removing docker container %s..." % neObj.dockerName)
+            client = getDockerClient()
+            try:
+                client.removeContainer(neObj.dockerName, force=True)
+            except DockerApiError as err:
+                if err.status != 404:
+                    raise
+            if self.portBasedEmulation is not True:
+                try:
+                    client.removeNetwork(neObj.networkName)
+                except DockerApiError as err:
+                    if err.status != 404:
+                        raise
+        self.neBringUpTimes.pop(neObj.uuid, None)
+
+    def getManagementAddress(self, neObj, image=None):
+        """Returns the IP address and the NETCONF and SSH ports on which the NE is managed.
+
+        Port based, they are the emulator IP and ports published by the container, and a new NE of an image having warm
+        containers gets the ports of the one it reserves. Otherwise the gateway of the docker network of the NE
+        publishes the ports 8300 and 2200, or the NE is managed on its own address in that network when there are
+        warm containers.
+        """
+        if self.portBasedEmulation is True:
+            ports = None
+            if image is not None and self.warmContainerPool is not None and \
+                    self.leaseStore.getLease(NETCONF_PORT_LEASE, neObj.uuid) is None:
+                ports = self.warmContainerPool.reserveContainer(image, neObj.dockerName)
+            if ports is not None:
+                self.netconfPortFactory.leasePort(neObj.uuid, ports[0])
+                self.sshPortFactory.leasePort(neObj.uuid, ports[1])
+            else:
+                ports = (self.netconfPortFactory.getPort(neObj.id, neObj.uuid),
+                         self.sshPortFactory.getPort(neObj.id, neObj.uuid))
+            return self.emulatorIp, ports[0], ports[1]
+        if self.publishManagementPorts is False:
+            return str(neObj.networkIPAddress[2]), 830, 22
+        return str(neObj.networkIPAddress[1]), 8300, 2200
+
+    def getManagementPortBindings(self, neObj):
+        if self.publishManagementPorts is False:
+            return None
+        return [(neObj.managementIPAddressString, neObj.netconfPortNumber, 830),
+                (neObj.managementIPAddressString, neObj.sshPortNumber, 22)]
+
+    def releaseWarmContainer(self, neObj):
+        # the warm container the NE reserved and did not take
+        if self.warmContainerPool is not None:
+            self.warmContainerPool.releaseReservation(neObj.dockerName)
+
+    def createWarmContainer(self, name, image):
+        # port based, the container publishes ports given to no NE, the NE which reserves it then gets them
+        ports = None
+        portBindings = None
+        if self.portBasedEmulation is True:
+            ports = (self.netconfPortFactory.getFreePort(), self.sshPortFactory.getFreePort())
+            portBindings = [(self.emulatorIp, ports[0], 830), (self.emulatorIp, ports[1], 22)]
+        self.journal.record(CONTAINER, name)
+        try:
+            getDockerClient().createContainer(name, image, portBindings=portBindings, labels=self.getDockerLabels())
+        except DockerApiError:
+            if ports is not None:
+                self.netconfPortFactory.releasePort(ports[0])
+                self.sshPortFactory.releasePort(ports[1])
+            raise
+        return ports
+
+    def getDockerLabels(self):
+        return {EMULATOR_LABEL: 'true', RUN_ID_LABEL: self.runId}
 
     def getNeByName(self, name):
-        for ne in self.networkElementList:
-            if ne.uuid == name:
-                return ne
-        return None
+        return self.networkElementsByUuid.get(name)
 
     def executeCommandInOS(self, command):
         if command == '' or command is None:
@@ -218,53 +1013,11 @@ class Emulator(metaclass=Singleton):
 
         cmd = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
 
-    def getCpuUsage(self):
-        cmd = 'docker stats --no-stream | awk \'{if (NR!=1) {gsub(/\%/,"");print $2}}\''
-
-        cpu_percentage = 0.0
-        try:
-            output = self.executeCommandAndGetResultInOS(cmd)
-        except:
-            return 0.0
-
-        for line in output:
-            line.strip()
-            try:
-                cpu_percentage += float(line)
-            except:
-                continue
-
-        return cpu_percentage
-
-    def getMemUsage(self):
-        cmd = 'docker stats --no-stream | awk \'{if (NR!=1) {gsub(/\%/,"");print $8}}\''
-
-        mem_percentage = 0.0
-        try:
-            output = self.executeCommandAndGetResultInOS(cmd)
-        except:
-            return 0.0
-
-        for line in output:
-            line.strip()
-            try:
-                mem_percentage += float(line)
-            except:
-                continue
-
-        #newer docker versions have the memory report in column 6
-        if mem_percentage == 0.0:
-            cmd = 'docker stats --no-stream | awk \'{if (NR!=1) {gsub(/\%/,"");print $6}}\''
-            try:
-                output = self.executeCommandAndGetResultInOS(cmd)
-            except:
-                return 0.0
-
-            for line in output:
-                line.strip()
-                try:
-                    mem_percentage += float(line)
-                except:
-                    continue
+    def getCpuUsage(self, numberOfSamples=None):
+        # in percent of one cpu, summed over the containers
+        perNe, total = self.resourceSampler.getUsage(numberOfSamples)
+        return total[0]
 
-        return mem_percentage
\ No newline at end of file
+    def getMemUsage(self, numberOfSamples=None):
+        perNe, total = self.resourceSampler.getUsage(numberOfSamples)
+        return total[2]
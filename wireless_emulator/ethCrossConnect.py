@@ -2,6 +2,7 @@ import logging
 import copy
 
 from wireless_emulator.utils import addCoreDefaultValuesToNode, printErrorAndExit, addCoreDefaultStatusValuesToNode
+from wireless_emulator.leases import getLeaseKey
 
 
 logger = logging.getLogger(__name__)
@@ -17,6 +18,8 @@ class EthCrossConnect:
 
         self.fcPortList = ethCrossConnect['fcPorts']
         self.fcRoute = ethCrossConnect['fcRoute']
+        # the IP address of the bridge, when the cross connection is available to the host
+        self.hostIpAddress = None
 
         self.interfacesObj = []
 
@@ -30,6 +33,9 @@ class EthCrossConnect:
 
         logger.debug("Link object was created")
 
+    def getLeaseKey(self):
+        return getLeaseKey(self.neObj.uuid, 'eth-cross-connection', self.fcPortList[0]['ltp'], self.fcPortList[1]['ltp'])
+
     def validateXConnEnds(self):
 
         intfObj = self.neObj.getInterfaceFromInterfaceUuid(self.fcPortList[0]['ltp'])
@@ -76,7 +82,7 @@ class EthCrossConnect:
         self.neObj.executeCommandInContainer(command)
 
         if self.hostAvailable is True:
-            ipAddress = str(self.neObj.emEnv.intfIpFactory.getFreeInterfaceIp())
+            ipAddress = str(self.neObj.emEnv.intfIpFactory.getFreeInterfaceIp(self.getLeaseKey()))
             mask = str(self.neObj.emEnv.intfIpFactory.netmask)
 
             command = "ip address add %s/%s dev %s" % (ipAddress, mask, bridgeName)
@@ -100,7 +106,8 @@ class EthCrossConnect:
         self.neObj.scriptIntf.write(command)
 
         if self.hostAvailable is True:
-            ipAddress = str(self.neObj.emEnv.intfIpFactory.getFreeInterfaceIp())
+            self.hostIpAddress = self.neObj.emEnv.intfIpFactory.getFreeInterfaceIp(self.getLeaseKey())
+            ipAddress = str(self.hostIpAddress)
             mask = str(self.neObj.emEnv.intfIpFactory.netmask)
 
             command = "ip address add %s/%s dev %s\n" % (ipAddress, mask, bridgeName)
@@ -1,10 +1,10 @@
 import logging
 import subprocess
 import copy
-import datetime
 
 import wireless_emulator.emulator
 from wireless_emulator.utils import addCoreDefaultValuesToNode, addCoreDefaultStatusValuesToNode
+from wireless_emulator.performance import addHistoricalPerformancesRecords, formatTimestamp
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +30,8 @@ class MwpsInterface:
         self.ltpUuid = self.interfaceName
         self.lpUuid = self.ltpUuid + '-LP-1'
         self.clientLtpNode = None
+        # leased by the NE, the address of the veth end or of the dummy interface
+        self.macAddress = None
 
         self.emEnv = wireless_emulator.emulator.Emulator()
 
@@ -43,6 +45,9 @@ class MwpsInterface:
     def getInterfaceName(self):
         return self.interfaceName
 
+    def getMacAddress(self):
+        return self.macAddress
+
     def getNeName(self):
         return self.neObj.dockerName
 
@@ -222,7 +227,7 @@ class MwpsInterface:
         node = currentPerformanceDataList.find('suspect-interval-flag')
         node.text = "false"
         node = currentPerformanceDataList.find('timestamp')
-        node.text = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
+        node.text = formatTimestamp(self.emEnv.xmlTimestamp)
         node = currentPerformanceDataList.find('administrative-state')
         node.text = "unlocked"
         parentNode.append(currentPerformanceDataList)
@@ -235,53 +240,13 @@ class MwpsInterface:
         node = currentPerformanceDataList.find('suspect-interval-flag')
         node.text = "false"
         node = currentPerformanceDataList.find('timestamp')
-        node.text = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
+        node.text = formatTimestamp(self.emEnv.xmlTimestamp)
         node = currentPerformanceDataList.find('administrative-state')
         node.text = "unlocked"
         parentNode.append(currentPerformanceDataList)
 
     def addHistoricalPerformancesXmlValues(self, parentNode):
-        histPerfDataList = parentNode.find('historical-performance-data-list')
-        savedNode = copy.deepcopy(histPerfDataList)
-        parentNode.remove(histPerfDataList)
-
-        for i in range(0,96):
-            self.addHistoricalPerformances15minutes(parentNode, savedNode, i)
-
-        for i in range(0,7):
-            self.addHistoricalPerformances24hours(parentNode, savedNode, i)
-
-    def addHistoricalPerformances15minutes(self, parentNode, savedNode, index):
-        histPerfDataList = copy.deepcopy(savedNode)
-        timeNow = datetime.datetime.utcnow()
-
-        node = histPerfDataList.find('history-data-id')
-        node.text = str(index)
-        node = histPerfDataList.find('granularity-period')
-        node.text = "period-15-min"
-        node = histPerfDataList.find('suspect-interval-flag')
-        node.text = "false"
-        node = histPerfDataList.find('period-end-time')
-        timestamp = timeNow - datetime.timedelta(minutes=15*index)
-        node.text = timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
-
-        parentNode.append(histPerfDataList)
-
-    def addHistoricalPerformances24hours(self, parentNode, savedNode, index):
-        histPerfDataList = copy.deepcopy(savedNode)
-        timeNow = datetime.datetime.utcnow()
-
-        node = histPerfDataList.find('history-data-id')
-        node.text = str(index + 96)
-        node = histPerfDataList.find('granularity-period')
-        node.text = "period-24-hours"
-        node = histPerfDataList.find('suspect-interval-flag')
-        node.text = "false"
-        node = histPerfDataList.find('period-end-time')
-        timestamp = timeNow - datetime.timedelta(days=1*index)
-        node.text = timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
-
-        parentNode.append(histPerfDataList)
+        addHistoricalPerformancesRecords(parentNode, self.emEnv.xmlTimestamp)
 
     def buildPtpModelConfigXml(self):
         parentNode = self.neObj.ptpInstanceListConfigXmlNode
@@ -361,11 +326,9 @@ class MwpsInterface:
             self.buildPtpModelStatusXml()
 
     def findRadioSignalId(self):
-        for link in self.emEnv.topoJson['topologies']['mwps']['links']:
-            if self.neObj.getNeUuid() == link[0]['uuid'] and self.uuid == link[0]['ltp']:
-                return link[0]['radio-signal-id']
-            elif self.neObj.getNeUuid() == link[1]['uuid'] and self.uuid == link[1]['ltp']:
-                return link[1]['radio-signal-id']
+        linkEnd = self.emEnv.getLinkEnd('mwps', self.neObj.getNeUuid(), self.uuid)
+        if linkEnd is not None:
+            return linkEnd['radio-signal-id']
         return None
 
 
@@ -583,7 +546,7 @@ class MwsInterface:
         node = currentPerformanceDataList.find('suspect-interval-flag')
         node.text = "false"
         node = currentPerformanceDataList.find('timestamp')
-        node.text = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
+        node.text = formatTimestamp(self.emEnv.xmlTimestamp)
         node = currentPerformanceDataList.find('administrative-state')
         node.text = "unlocked"
         parentNode.append(currentPerformanceDataList)
@@ -596,53 +559,13 @@ class MwsInterface:
         node = currentPerformanceDataList.find('suspect-interval-flag')
         node.text = "false"
         node = currentPerformanceDataList.find('timestamp')
-        node.text = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
+        node.text = formatTimestamp(self.emEnv.xmlTimestamp)
         node = currentPerformanceDataList.find('administrative-state')
         node.text = "unlocked"
         parentNode.append(currentPerformanceDataList)
 
     def addHistoricalPerformancesXmlValues(self, parentNode):
-        histPerfDataList = parentNode.find('historical-performance-data-list')
-        savedNode = copy.deepcopy(histPerfDataList)
-        parentNode.remove(histPerfDataList)
-
-        for i in range(0,96):
-            self.addHistoricalPerformances15minutes(parentNode, savedNode, i)
-
-        for i in range(0,7):
-            self.addHistoricalPerformances24hours(parentNode, savedNode, i)
-
-    def addHistoricalPerformances15minutes(self, parentNode, savedNode, index):
-        histPerfDataList = copy.deepcopy(savedNode)
-        timeNow = datetime.datetime.utcnow()
-
-        node = histPerfDataList.find('history-data-id')
-        node.text = str(index)
-        node = histPerfDataList.find('granularity-period')
-        node.text = "period-15-min"
-        node = histPerfDataList.find('suspect-interval-flag')
-        node.text = "false"
-        node = histPerfDataList.find('period-end-time')
-        timestamp = timeNow - datetime.timedelta(minutes=15*index)
-        node.text = timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
-
-        parentNode.append(histPerfDataList)
-
-    def addHistoricalPerformances24hours(self, parentNode, savedNode, index):
-        histPerfDataList = copy.deepcopy(savedNode)
-        timeNow = datetime.datetime.utcnow()
-
-        node = histPerfDataList.find('history-data-id')
-        node.text = str(index + 96)
-        node = histPerfDataList.find('granularity-period')
-        node.text = "period-24-hours"
-        node = histPerfDataList.find('suspect-interval-flag')
-        node.text = "false"
-        node = histPerfDataList.find('period-end-time')
-        timestamp = timeNow - datetime.timedelta(days=1*index)
-        node.text = timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
-
-        parentNode.append(histPerfDataList)
+        addHistoricalPerformancesRecords(parentNode, self.emEnv.xmlTimestamp)
 
     def buildXmlFiles(self):
         self.buildCoreModelConfigXml()
@@ -885,7 +808,7 @@ class MwEthContainerInterface:
         node = currentPerformanceDataList.find('suspect-interval-flag')
         node.text = "false"
         node = currentPerformanceDataList.find('timestamp')
-        node.text = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
+        node.text = formatTimestamp(self.emEnv.xmlTimestamp)
         node = currentPerformanceDataList.find('administrative-state')
         node.text = "unlocked"
         parentNode.append(currentPerformanceDataList)
@@ -898,53 +821,13 @@ class MwEthContainerInterface:
         node = currentPerformanceDataList.find('suspect-interval-flag')
         node.text = "false"
         node = currentPerformanceDataList.find('timestamp')
-        node.text = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
+        node.text = formatTimestamp(self.emEnv.xmlTimestamp)
         node = currentPerformanceDataList.find('administrative-state')
         node.text = "unlocked"
         parentNode.append(currentPerformanceDataList)
 
     def addHistoricalPerformancesXmlValues(self, parentNode):
-        histPerfDataList = parentNode.find('historical-performance-data-list')
-        savedNode = copy.deepcopy(histPerfDataList)
-        parentNode.remove(histPerfDataList)
-
-        for i in range(0,96):
-            self.addHistoricalPerformances15minutes(parentNode, savedNode, i)
-
-        for i in range(0,7):
-            self.addHistoricalPerformances24hours(parentNode, savedNode, i)
-
-    def addHistoricalPerformances15minutes(self, parentNode, savedNode, index):
-        histPerfDataList = copy.deepcopy(savedNode)
-        timeNow = datetime.datetime.utcnow()
-
-        node = histPerfDataList.find('history-data-id')
-        node.text = str(index)
-        node = histPerfDataList.find('granularity-period')
-        node.text = "period-15-min"
-        node = histPerfDataList.find('suspect-interval-flag')
-        node.text = "false"
-        node = histPerfDataList.find('period-end-time')
-        timestamp = timeNow - datetime.timedelta(minutes=15*index)
-        node.text = timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
-
-        parentNode.append(histPerfDataList)
-
-    def addHistoricalPerformances24hours(self, parentNode, savedNode, index):
-        histPerfDataList = copy.deepcopy(savedNode)
-        timeNow = datetime.datetime.utcnow()
-
-        node = histPerfDataList.find('history-data-id')
-        node.text = str(index + 96)
-        node = histPerfDataList.find('granularity-period')
-        node.text = "period-24-hours"
-        node = histPerfDataList.find('suspect-interval-flag')
-        node.text = "false"
-        node = histPerfDataList.find('period-end-time')
-        timestamp = timeNow - datetime.timedelta(days=1*index)
-        node.text = timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
-
-        parentNode.append(histPerfDataList)
+        addHistoricalPerformancesRecords(parentNode, self.emEnv.xmlTimestamp)
 
     def buildXmlFiles(self):
         self.buildCoreModelConfigXml()
@@ -971,6 +854,8 @@ class ElectricalEtyInterface:
         self.physicalPortRef = physicalPortRef
         self.clientLtpNode = None
         self.serverLtpsList = []
+        # leased by the NE, the address of the veth end or of the dummy interface
+        self.macAddress = None
 
         logger.debug("ElectricalEtyInterface object having name=%s was created",
                      self.interfaceName)
@@ -982,6 +867,9 @@ class ElectricalEtyInterface:
     def getInterfaceName(self):
         return self.interfaceName
 
+    def getMacAddress(self):
+        return self.macAddress
+
     def getNeName(self):
         return self.neObj.dockerName
 
@@ -1164,11 +1052,9 @@ class EthCtpInterface:
         return self.neObj.dockerName
 
     def findVlanId(self):
-        for link in self.emEnv.topoJson['topologies']['ety']['links']:
-            if self.neObj.getNeUuid() == link[0]['uuid'] and self.uuid == link[0]['ltp']:
-                return link[0]['vlan-id']
-            elif self.neObj.getNeUuid() == link[1]['uuid'] and self.uuid == link[1]['ltp']:
-                return link[1]['vlan-id']
+        linkEnd = self.emEnv.getLinkEnd('ety', self.neObj.getNeUuid(), self.uuid)
+        if linkEnd is not None:
+            return linkEnd['vlan-id']
         for xconn in self.neObj.eth_x_connect:
             if xconn['fcPorts'][0]['ltp'] == self.uuid:
                 return xconn['fcPorts'][0]['vlan-id']
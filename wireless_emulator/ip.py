@@ -1,64 +1,301 @@
+import collections
+import hashlib
 import ipaddress
 import logging
+import threading
+
+from wireless_emulator.leases import LeaseStore, getLeaseKey, MANAGEMENT_IP_LEASE, HOST_IP_LEASE, MAC_ADDRESS_LEASE
 
 logger = logging.getLogger(__name__)
 
+class AddressAllocator:
+    """Hands out the integers first, first + step, ... (count values) in order, computed from a cursor.
+
+    Released values are handed out again in the order in which they were released, once all the other values were
+    used, which is the order of the former pop(0)/append() lists. Reserved values, e.g. leased to another NE, are
+    skipped.
+    """
+
+    def __init__(self, first, count, step=1):
+        self.first = first
+        self.count = count
+        self.step = step
+        self.cursor = 0
+        self.released = collections.deque()
+        self.reserved = set()
+
+    def contains(self, value):
+        offset = value - self.first
+        return 0 <= offset < self.count * self.step and offset % self.step == 0
+
+    def reserve(self, value):
+        if self.contains(value):
+            self.reserved.add(value)
+
+    def allocate(self):
+        while self.cursor < self.count:
+            value = self.first + self.cursor * self.step
+            self.cursor += 1
+            if value not in self.reserved:
+                return value
+        if self.released:
+            return self.released.popleft()
+        return None
+
+    def release(self, value):
+        self.released.append(value)
+
+    def getNumberOfFreeValues(self):
+        return self.count - self.cursor + len(self.released)
+
+def reserveLeasedValues(allocator, leaseStore, leaseType, parse):
+    for value in leaseStore.getLeasedValues(leaseType):
+        try:
+            allocator.reserve(parse(value))
+        except ValueError:
+            logger.warning("Ignoring invalid %s lease %s", leaseType, value)
+
+def getLeasedValue(allocator, leaseStore, leaseType, key, parse, claimedValues):
+    # the value leased to key, if it is still part of the network and was not already given to another key
+    value = leaseStore.getLease(leaseType, key)
+    if value is None:
+        return None
+    try:
+        value = parse(value)
+    except ValueError:
+        return None
+    if not allocator.contains(value) or value in claimedValues:
+        return None
+    return value
+
 class ManagementNetworkIPFactory:
 
-    def __init__(self, preferedNetwork):
-        self.freeNetworkIpList = list(ipaddress.ip_network(preferedNetwork).subnets(new_prefix=30))
+    def __init__(self, preferedNetwork, leaseStore=None):
+        network = ipaddress.ip_network(preferedNetwork)
+        if network.prefixlen > 30:
+            raise ValueError("Management network %s is too small for /30 subnets" % preferedNetwork)
+        self.networkClass = type(network)
+        self.freeNetworkIps = AddressAllocator(int(network.network_address), 2 ** (30 - network.prefixlen), 4)
+
+        self.leaseStore = leaseStore if leaseStore is not None else LeaseStore()
+        self.claimedLeases = set()
+        reserveLeasedValues(self.freeNetworkIps, self.leaseStore, MANAGEMENT_IP_LEASE, self.parseNetwork)
 
         logger.debug("ManagementNetworkIPFactory was initialized with Network IP %s "
-                     "and has %d free management IP addresses", preferedNetwork, len(self.freeNetworkIpList))
+                     "and has %d free management IP addresses", preferedNetwork,
+                     self.freeNetworkIps.getNumberOfFreeValues())
+
+    def parseNetwork(self, value):
+        return int(self.networkClass(value).network_address)
 
-    def getFreeManagementNetworkIP(self):
-        if len(self.freeNetworkIpList) > 0:
-            return self.freeNetworkIpList.pop(0)
+    def getFreeManagementNetworkIP(self, key=None):
+        address = None
+        if key is not None:
+            address = getLeasedValue(self.freeNetworkIps, self.leaseStore, MANAGEMENT_IP_LEASE, key,
+                                     self.parseNetwork, self.claimedLeases)
+            if address is not None:
+                self.claimedLeases.add(address)
+        if address is None:
+            address = self.freeNetworkIps.allocate()
+        if address is not None:
+            ipNetwork = self.networkClass((address, 30))
+            if key is not None:
+                self.leaseStore.saveLease(MANAGEMENT_IP_LEASE, key, str(ipNetwork))
+            return ipNetwork
         else:
             logger.critical("No more free Network IP addresses left!")
             return None
 
+    def returnBackUnusedNetworkIp(self, ipNetwork):
+        self.freeNetworkIps.release(int(ipNetwork.network_address))
+
+    def releaseLeasedNetworkIp(self, ipNetwork):
+        # the network stays leased, it is given again to the NE it is leased to
+        self.claimedLeases.discard(int(ipNetwork.network_address))
+
+    def claimLeasedNetworkIp(self, ipNetwork):
+        # given back to the NE it was released from
+        self.claimedLeases.add(int(ipNetwork.network_address))
+
 class InterfaceIPFactory:
 
-    def __init__(self, preferedNetwork):
-        self.freeInterfaceIpList = list(ipaddress.ip_network(preferedNetwork).hosts())
-        self.netmask = ipaddress.ip_network(preferedNetwork).netmask
+    def __init__(self, preferedNetwork, leaseStore=None):
+        network = ipaddress.ip_network(preferedNetwork)
+        if network.num_addresses > 2:
+            # all the addresses, except the network and the broadcast ones
+            self.freeInterfaceIps = AddressAllocator(int(network.network_address) + 1, network.num_addresses - 2)
+        else:
+            hosts = [int(host) for host in network.hosts()]
+            self.freeInterfaceIps = AddressAllocator(hosts[0] if hosts else 0, len(hosts))
+        self.addressClass = type(network.network_address)
+        self.netmask = network.netmask
+
+        self.leaseStore = leaseStore if leaseStore is not None else LeaseStore()
+        self.claimedLeases = set()
+        reserveLeasedValues(self.freeInterfaceIps, self.leaseStore, HOST_IP_LEASE, self.parseAddress)
+
         logger.debug("InterfaceIPFactory was initialized with Network IP %s "
-                     "and has %d free management IP addresses", preferedNetwork, len(self.freeInterfaceIpList))
+                     "and has %d free management IP addresses", preferedNetwork,
+                     self.freeInterfaceIps.getNumberOfFreeValues())
 
-    def getFreeInterfaceIp(self):
-        if len(self.freeInterfaceIpList) > 0:
-            return self.freeInterfaceIpList.pop(0)
+    def parseAddress(self, value):
+        return int(self.addressClass(value))
+
+    def getFreeInterfaceIp(self, key=None):
+        address = None
+        if key is not None:
+            address = getLeasedValue(self.freeInterfaceIps, self.leaseStore, HOST_IP_LEASE, key,
+                                     self.parseAddress, self.claimedLeases)
+            if address is not None:
+                self.claimedLeases.add(address)
+        if address is None:
+            address = self.freeInterfaceIps.allocate()
+        if address is not None:
+            ipAddress = self.addressClass(address)
+            if key is not None:
+                self.leaseStore.saveLease(HOST_IP_LEASE, key, str(ipAddress))
+            return ipAddress
         else:
             logger.critical("No more free Interface IP addresses left!")
             return None
 
     def returnBackUnusedIp(self, ipNetworkAddress):
-        self.freeInterfaceIpList.append(ipNetworkAddress)
+        self.freeInterfaceIps.release(int(ipNetworkAddress))
+
+    def releaseLeasedIp(self, ipAddress):
+        self.claimedLeases.discard(int(ipAddress))
+
+    def claimLeasedIp(self, ipAddress):
+        self.claimedLeases.add(int(ipAddress))
 
     def getNumberOfFreeInterfaceIpAddresses(self):
-        return len(self.freeInterfaceIpList)
+        return self.freeInterfaceIps.getNumberOfFreeValues()
+
+
+class PortFactory:
+    """Gives the port portBase + neId to each NE, unless another port is leased to it.
+
+    When portBase + neId is leased to another NE, the first port above all the leased ones that is still free is
+    given instead. The ports can also be taken by the warm containers, from another thread.
+    """
+
+    def __init__(self, portBase, leaseType, leaseStore=None):
+        self.portBase = portBase
+        self.leaseType = leaseType
+        self.leaseStore = leaseStore if leaseStore is not None else LeaseStore()
+
+        self.leasedPorts = set()
+        for port in self.leaseStore.getLeasedValues(leaseType):
+            if isinstance(port, int):
+                self.leasedPorts.add(port)
+        self.usedPorts = set()
+        self.nextFreePort = max(self.leasedPorts | {portBase}) + 1
+        self.lock = threading.Lock()
+
+    def getPort(self, neId, key):
+        with self.lock:
+            port = self.leaseStore.getLease(self.leaseType, key)
+            if not isinstance(port, int) or port in self.usedPorts:
+                port = self.portBase + neId
+                if port in self.leasedPorts or port in self.usedPorts:
+                    port = self.getNextFreePort()
+                    logger.info("Port %d is leased to another NE, giving port %d to NE=%s",
+                                self.portBase + neId, port, key)
+            self.usedPorts.add(port)
+        self.leaseStore.saveLease(self.leaseType, key, port)
+        return port
+
+    def getNextFreePort(self):
+        while self.nextFreePort in self.leasedPorts or self.nextFreePort in self.usedPorts:
+            self.nextFreePort += 1
+        return self.nextFreePort
+
+    def getFreePort(self):
+        # a port which is given to no NE, for a warm container; it is leased by leasePort to the NE taking it
+        with self.lock:
+            port = self.getNextFreePort()
+            self.usedPorts.add(port)
+        return port
+
+    def leasePort(self, key, port):
+        self.leaseStore.saveLease(self.leaseType, key, port)
 
+    def releasePort(self, port):
+        with self.lock:
+            self.usedPorts.discard(port)
+
+    def claimPort(self, port):
+        with self.lock:
+            self.usedPorts.add(port)
 
 class MacAddressFactory:
+    """Gives every interface the MAC address derived from the id of its NE and its port id, unless another one is
+    leased to it.
+
+    When the derived address is already taken, e.g. leased to another interface, or when the ids do not fit in the
+    address, a locally administered address is derived from the lease key instead.
+    """
+
+    def __init__(self, leaseStore=None):
+        self.generatedAddresses = set()
+        self.leaseStore = leaseStore if leaseStore is not None else LeaseStore()
+        self.leasedAddresses = set(self.leaseStore.getLeasedValues(MAC_ADDRESS_LEASE))
+        self.lock = threading.Lock()
+
+    def generateMacAddress(self, neId, portId, key=None):
+        with self.lock:
+            macAddress = None
+            if key is not None:
+                macAddress = self.leaseStore.getLease(MAC_ADDRESS_LEASE, key)
+                if macAddress in self.generatedAddresses:
+                    macAddress = None
+            if macAddress is None:
+                macAddress = self.deriveMacAddress(neId, portId, key)
+            self.generatedAddresses.add(macAddress)
+            if key is not None:
+                self.leasedAddresses.add(macAddress)
+        if key is not None:
+            self.leaseStore.saveLease(MAC_ADDRESS_LEASE, key, macAddress)
+        return macAddress
+
+    def deriveMacAddress(self, neId, portId, key):
+        if 0 <= neId < 2 ** 40 and 0 <= portId < 2 ** 8:
+            logger.debug("Generating MAC address for neId=%d and portId=%d", neId, portId)
+            #generate 5 bytes of MAC address from neID
+            s = hex(neId).lstrip('0x').zfill(10)
+            neMacStr = ':'.join([s[i:i+2] for i in range(0, len(s), 2)])
+            #generate 1 byte of MAC address from portId
+            portMacStr = hex(portId).lstrip('0x').zfill(2)
+            #concatenate for full MAC address
+            macAddress = neMacStr + ":" + portMacStr
+            logger.debug("Generated MAC address: %s", macAddress)
+            if self.isMacAddressTaken(macAddress, key) is False:
+                return macAddress
+            logger.warning("Generated MAC address %s for neId=%d and portId=%d already exists, deriving another one",
+                           macAddress, neId, portId)
 
-    def __init__(self):
-        self.generatedAddresses = []
-
-    def generateMacAddress(self, neId, portId):
-        logger.debug("Generating MAC address for neId=%d and portId=%d", neId, portId)
-        #generate 5 bytes of MAC address from neID
-        s = hex(neId).lstrip('0x').zfill(10)
-        neMacStr = ':'.join([s[i:i+2] for i in range(0, len(s), 2)])
-        #generate 1 byte of MAC address from portId
-        portMacStr = hex(portId).lstrip('0x').zfill(2)
-        #concatenate for full MAC address
-        macAddress = neMacStr + ":" + portMacStr
-        logger.debug("Generated MAC address: %s", macAddress)
+        seed = key if key is not None else getLeaseKey(neId, portId)
+        attempt = 0
+        while True:
+            digest = hashlib.sha1(("%s/%d" % (seed, attempt)).encode('utf-8')).digest()
+            # locally administered and unicast
+            macAddress = ':'.join('%02x' % byte for byte in bytes([0x02]) + digest[:5])
+            if self.isMacAddressTaken(macAddress, key) is False:
+                logger.debug("Derived MAC address %s for neId=%d and portId=%d", macAddress, neId, portId)
+                return macAddress
+            attempt += 1
+
+    def isMacAddressTaken(self, macAddress, key):
         if macAddress in self.generatedAddresses:
-            logger.error("Generated MAC address %s for neId=%d and portId=%d already exists!",
-                         macAddress, neId, portId)
-            return None
-        else:
-            self.generatedAddresses.append(macAddress)
-            return macAddress
+            return True
+        return macAddress in self.leasedAddresses and \
+            (key is None or self.leaseStore.getLease(MAC_ADDRESS_LEASE, key) != macAddress)
+
+    def releaseMacAddress(self, macAddress):
+        # the address stays leased, it is given again to the interface it is leased to
+        with self.lock:
+            self.generatedAddresses.discard(macAddress)
+
+    def claimMacAddress(self, macAddress):
+        with self.lock:
+            self.generatedAddresses.add(macAddress)
@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_FILE = 'journal.jsonl'
+
+# host resources, recorded just before they are created, so that a crash never leaves one unrecorded
+CONTAINER = 'container'
+NETWORK = 'network'
+VETH = 'veth'
+BRIDGE = 'bridge'
+ODL_MOUNT = 'odl-mount'
+LEASE = 'lease'
+# bring-up steps, recorded once completed, for resuming an interrupted start
+STEP = 'step'
+
+NETWORK_ELEMENT_STEP = 'network-element'
+LINK_STEP = 'link'
+INTERFACE_SCRIPT_STEP = 'interface-script'
+
+def getJournalFileName(configJson):
+    if configJson is not None and 'journalFile' in configJson:
+        return configJson['journalFile'] or None
+    return DEFAULT_JOURNAL_FILE
+
+def getRecordKey(record):
+    # the records of the same resource have the same key, e.g. a container recorded again when a run is resumed
+    return (record['resource'], record['name'], record.get('controller'), record.get('port'))
+
+class CreationJournal:
+    """Append-only file of JSON lines, recording the host resources created by the runs of the emulator.
+
+    Every line is flushed before the resource is created, so the journal survives a crash of the emulator. Without
+    a file name, nothing is recorded.
+    """
+
+    def __init__(self, fileName=None, runId=None):
+        self.fileName = fileName
+        self.runId = runId
+        self.lock = threading.Lock()
+
+    def loadRecords(self):
+        records = []
+        if self.fileName is None or not os.path.isfile(self.fileName):
+            return records
+        try:
+            with open(self.fileName) as f:
+                data = f.read()
+        except IOError as err:
+            logger.error("Could not read journal %s: %s", self.fileName, err.strerror)
+            return records
+
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if 'resource' in record and 'name' in record:
+                    records.append(record)
+            except ValueError:
+                # e.g. the last line, if the emulator was killed while writing it
+                logger.warning("Ignoring invalid line in journal %s: %s", self.fileName, line)
+        return records
+
+    def getRecords(self, runId=None, resource=None):
+        return [record for record in self.loadRecords()
+                if (runId is None or record.get('runId') == runId) and
+                   (resource is None or record['resource'] == resource)]
+
+    def getLastRunId(self):
+        records = self.loadRecords()
+        if not records:
+            return None
+        return records[-1].get('runId')
+
+    def getCompletedSteps(self, step):
+        return set(record['name'] for record in self.getRecords(self.runId, STEP) if record.get('step') == step)
+
+    def record(self, resource, name, **details):
+        if self.fileName is None:
+            return
+        record = {'runId': self.runId, 'resource': resource, 'name': name}
+        record.update(details)
+        line = json.dumps(record)
+        with self.lock:
+            with open(self.fileName, 'ab+') as f:
+                # a partial last line, from a crash, must not be merged with this record
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+                f.write(line.encode('utf-8') + b'\n')
+                f.flush()
+
+    def recordStep(self, step, name):
+        self.record(STEP, name, step=step)
+
+    def removeRuns(self, runId=None, keptRecords=()):
+        # forgets the records of runId, or of all the runs, once their resources were removed, except keptRecords
+        if self.fileName is None or not os.path.isfile(self.fileName):
+            return
+        with self.lock:
+            remaining = []
+            if runId is not None:
+                remaining = [record for record in self.loadRecords() if record.get('runId') != runId]
+            remaining.extend(keptRecords)
+            if not remaining:
+                os.remove(self.fileName)
+                return
+            with open(self.fileName, 'w') as f:
+                for record in remaining:
+                    f.write(json.dumps(record) + '\n')
@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import threading
+
+from wireless_emulator.journal import LEASE
+
+logger = logging.getLogger(__name__)
+
+# lease types, the keys are the NE uuid, or the NE uuid and the LTP uuids for interface resources
+MANAGEMENT_IP_LEASE = 'management-ip'
+HOST_IP_LEASE = 'host-ip'
+NETCONF_PORT_LEASE = 'netconf-port'
+SSH_PORT_LEASE = 'ssh-port'
+MAC_ADDRESS_LEASE = 'mac-address'
+
+def getLeaseKey(*names):
+    return '/'.join(str(name) for name in names)
+
+class LeaseStore:
+    """Addresses and ports given to the NEs, kept across restarts in an append-only file of JSON lines.
+
+    A line is written only for a new or changed lease, the last line of a key wins when the file is loaded. Without a
+    file name, or when the file is read only, the new leases are only kept in memory.
+    """
+
+    def __init__(self, fileName=None, journal=None, readOnly=False):
+        self.fileName = fileName
+        self.journal = journal
+        self.readOnly = readOnly
+        self.leases = {}
+        self.lock = threading.Lock()
+        self.needsNewLine = False
+
+        if fileName is not None and os.path.isfile(fileName):
+            self.loadLeases()
+
+    def loadLeases(self):
+        try:
+            with open(self.fileName) as f:
+                data = f.read()
+        except IOError as err:
+            logger.error("Could not read lease file %s: %s", self.fileName, err.strerror)
+            return
+
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                lease = json.loads(line)
+                self.leases[(lease['type'], lease['key'])] = lease['value']
+            except (ValueError, KeyError, TypeError):
+                # e.g. the last line, if the emulator was stopped while writing it
+                logger.warning("Ignoring invalid line in lease file %s: %s", self.fileName, line)
+        # a partial last line must not be merged with the next lease
+        self.needsNewLine = len(data) > 0 and not data.endswith('\n')
+
+        logger.debug("Loaded %d leases from %s", len(self.leases), self.fileName)
+
+    def getLease(self, leaseType, key):
+        with self.lock:
+            return self.leases.get((leaseType, key))
+
+    def getLeasedValues(self, leaseType):
+        with self.lock:
+            return [value for (currentType, key), value in self.leases.items() if currentType == leaseType]
+
+    def getLeases(self):
+        # (type, key, value) of every lease
+        with self.lock:
+            return [(leaseType, key, value) for (leaseType, key), value in self.leases.items()]
+
+    def saveLease(self, leaseType, key, value):
+        with self.lock:
+            if self.leases.get((leaseType, key)) == value:
+                return
+            self.leases[(leaseType, key)] = value
+            if self.fileName is not None and self.readOnly is False:
+                self.writeLease(leaseType, key, value)
+        if self.journal is not None:
+            self.journal.record(LEASE, key, leaseType=leaseType, value=value)
+
+    def writeLease(self, leaseType, key, value):
+        line = json.dumps({'type': leaseType, 'key': key, 'value': value})
+        try:
+            with open(self.fileName, 'a') as f:
+                if self.needsNewLine:
+                    f.write('\n')
+                    self.needsNewLine = False
+                f.write(line + '\n')
+        except IOError as err:
+            logger.error("Could not write lease %s to %s: %s", line, self.fileName, err.strerror)
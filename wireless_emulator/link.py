@@ -2,6 +2,9 @@ import logging
 import subprocess
 
 import wireless_emulator.emulator
+from wireless_emulator.netlink import createVethPair, deleteLink, getTemporaryVethName
+from wireless_emulator.dockerapi import getDockerClient
+from wireless_emulator.journal import VETH, BRIDGE, LINK_STEP
 
 logger = logging.getLogger(__name__)
 
@@ -23,33 +26,58 @@ class Link:
             logger.critical("Interfaces defining link not valid: ", linkEnds[0], linkEnds[1])
             raise ValueError("Interfaces defining link not valid: ", linkEnds[0], linkEnds[1])
 
+        self.linkId = Link.linkNumber
+        Link.linkNumber += 1
+
         logger.debug("Link object was created")
 
     def validateLinkEnds(self):
 
-        for ne in self.emEnv.networkElementList:
-            neUuid = ne.getNeUuid()
-            logger.debug("Validating for NE=%s", neUuid)
-            if neUuid == self.linkEnds[0]['uuid']:
-                logger.debug("Gettinf interface for NE=%s", neUuid)
-                intfObj = ne.getInterfaceFromInterfaceUuid(self.linkEnds[0]['ltp'])
-                if intfObj is not None:
-                    self.interfacesObj.append(intfObj)
-                else:
-                    logger.debug("Interface=%s not found in NE=%s", self.linkEnds[0]['ltp'], neUuid)
-            elif neUuid == self.linkEnds[1]['uuid']:
-                logger.debug("Gettinf interface for NE=%s", neUuid)
-                intfObj = ne.getInterfaceFromInterfaceUuid(self.linkEnds[1]['ltp'])
-                if intfObj is not None:
-                    self.interfacesObj.append(intfObj)
-                else:
-                    logger.debug("Interface=%s not found in NE=%s", self.linkEnds[1]['ltp'], neUuid)
+        for linkEnd in self.linkEnds:
+            ne = self.emEnv.getNeByName(linkEnd['uuid'])
+            if ne is None:
+                logger.debug("NE=%s not found", linkEnd['uuid'])
+                continue
+            logger.debug("Getting interface for NE=%s", linkEnd['uuid'])
+            intfObj = ne.getInterfaceFromInterfaceUuid(linkEnd['ltp'])
+            if intfObj is not None:
+                self.interfacesObj.append(intfObj)
+            else:
+                logger.debug("Interface=%s not found in NE=%s", linkEnd['ltp'], linkEnd['uuid'])
 
         if len(self.interfacesObj) != 2:
             return False
 
         return True
 
+    def getJournalName(self):
+        # the same for the same link ends, whatever the order of the links in the JSON topology
+        return "%s/%s-%s/%s" % (self.interfacesObj[0].getNeName(), self.interfacesObj[0].getInterfaceUuid(),
+                                self.interfacesObj[1].getNeName(), self.interfacesObj[1].getInterfaceUuid())
+
+    def removeLeftoverVethPair(self, temporaryName):
+        # the pair of an interrupted start is either still in the host namespace, under its temporary name, or
+        # already in the containers; deleting one end deletes the pair
+        if deleteLink(temporaryName):
+            return
+        try:
+            getDockerClient().execInContainer(self.interfacesObj[0].neObj.dockerName,
+                                              ['ip', 'link', 'del', self.interfacesObj[0].getInterfaceName()])
+        except (RuntimeError, OSError) as err:
+            logger.debug("Could not delete leftover interface %s in NE=%s: %s",
+                         self.interfacesObj[0].getInterfaceName(), self.interfacesObj[0].getNeName(), err)
+
+    def removeLink(self):
+        # the link of two running NEs which is not part of the reloaded topology, deleting one end deletes the pair
+        print("Removing link between NE %s interface %s and NE %s interface %s..." %
+              (self.interfacesObj[0].getNeName(), self.interfacesObj[0].getInterfaceUuid(),
+               self.interfacesObj[1].getNeName(), self.interfacesObj[1].getInterfaceUuid()))
+        exitCode, stdout, stderr = getDockerClient().execInContainer(
+            self.interfacesObj[0].neObj.dockerName, ['ip', 'link', 'del', self.interfacesObj[0].getInterfaceName()])
+        if exitCode != 0:
+            logger.critical("Could not remove link %s: %s", self.getJournalName(), stderr.decode('utf-8').strip())
+            raise RuntimeError("Could not remove link %s" % self.getJournalName())
+
     def isIntfPartOfLink(self, intfObj):
         logger.debug("checking if intf=%s is part of a link", intfObj.uuid)
         is_in_link = intfObj in self.interfacesObj
@@ -63,36 +91,18 @@ class Link:
         logger.debug("Adding link between interfaces %s and %s",
                      self.interfacesObj[0].getInterfaceUuid(), self.interfacesObj[1].getInterfaceUuid())
 
-        self.linkId = Link.linkNumber
-        Link.linkNumber += 1
-
-        stringCmd = "ip link add test_port_1 type veth peer name test_port_2"
-        self.emEnv.executeCommandInOS(stringCmd)
-        logger.debug("Added veth pair for link.")
-
-        stringCmd = "ip link set test_port_1 netns %s" % self.interfacesObj[0].neObj.networkNamespace
-        self.emEnv.executeCommandInOS(stringCmd)
+        # the veth ends are created directly in the network namespaces of the containers, with the interface names
+        temporaryName = getTemporaryVethName()
+        self.emEnv.journal.record(VETH, temporaryName, link=self.getJournalName())
+        with self.emEnv.profiler.phase('build-topologies', 'link-%d' % self.linkId, 'link-add'):
+            createVethPair(self.interfacesObj[0].getInterfaceName(), self.interfacesObj[0].neObj.networkNamespace,
+                           self.interfacesObj[1].getInterfaceName(), self.interfacesObj[1].neObj.networkNamespace,
+                           temporaryName, self.interfacesObj[0].getMacAddress(), self.interfacesObj[1].getMacAddress())
 
-        stringCmd = "ip link set test_port_2 netns %s" % self.interfacesObj[1].neObj.networkNamespace
-        self.emEnv.executeCommandInOS(stringCmd)
-
-        command = "ip link set dev test_port_1 name %s" % self.interfacesObj[0].getInterfaceName()
-        self.interfacesObj[0].neObj.executeCommandInContainer(command)
-
-        command = "ip link set %s up" % self.interfacesObj[0].getInterfaceName()
-        self.interfacesObj[0].neObj.executeCommandInContainer(command)
-
-        logger.debug("Added veth pair port for interface %s from NE=%s",
-                     self.interfacesObj[0].getInterfaceName(), self.interfacesObj[0].getNeName())
-
-        command = "ip link set dev test_port_2 name %s" % self.interfacesObj[1].getInterfaceName()
-        self.interfacesObj[1].neObj.executeCommandInContainer(command)
-
-        command = "ip link set %s up" % self.interfacesObj[1].getInterfaceName()
-        self.interfacesObj[1].neObj.executeCommandInContainer(command)
-
-        logger.debug("Added veth pair port for interface %s from NE=%s",
+        logger.debug("Added veth pair for interface %s from NE=%s and interface %s from NE=%s",
+                     self.interfacesObj[0].getInterfaceName(), self.interfacesObj[0].getNeName(),
                      self.interfacesObj[1].getInterfaceName(), self.interfacesObj[1].getNeName())
+        self.emEnv.journal.recordStep(LINK_STEP, self.getJournalName())
 
     def addLinkWithIp(self):
         print("Adding link between NE %s interface %s and NE %s interface %s..." %
@@ -109,8 +119,9 @@ class Link:
         self.interfacesObj[0].setIpAddress(firstIpOfLink)
         self.interfacesObj[1].setIpAddress(secondIpOfLink)
 
-        self.bridgeName = "oywe-br-" + str(Link.linkNumber)
+        self.bridgeName = "oywe-br-" + str(self.linkId)
 
+        self.emEnv.journal.record(BRIDGE, self.bridgeName)
         stringCmd = "ovs-vsctl add-br %s" % (self.bridgeName)
         cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
@@ -120,9 +131,6 @@ class Link:
             raise RuntimeError
         logger.debug("Added bridge %s for link.", self.bridgeName)
 
-        self.linkId = Link.linkNumber
-        Link.linkNumber += 1
-
         # stringCmd = "ovs-docker add-port %s %s %s --ipaddress=%s/30 --macaddress=%s" % \
         #             (self.bridgeName, self.interfacesObj[0].getInterfaceName(), self.interfacesObj[0].getNeName(),
         #              firstIpOfLink, self.interfacesObj[0].getMacAddress())
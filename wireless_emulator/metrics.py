@@ -0,0 +1,159 @@
+import logging
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from wireless_emulator.resources import isInterfaceUp
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = '/metrics'
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# in the order of the averages given by ResourceSampler.getUsage
+NE_RESOURCE_METRICS = [('wte_ne_cpu_percent', 'CPU usage of the NE container, in percent of one CPU'),
+                       ('wte_ne_memory_bytes', 'Memory used by the NE container'),
+                       ('wte_ne_memory_percent', 'Memory used by the NE container, in percent of its limit')]
+
+# from ControllerBalancer.getStatistics
+ODL_CONTROLLER_METRICS = [('wte_odl_mount_requests_total', 'requests', 'Mount requests sent to the ODL controller'),
+                          ('wte_odl_mount_failures_total', 'failures', 'Mount requests which failed'),
+                          ('wte_odl_mount_seconds_total', 'seconds', 'Time spent in the mount requests')]
+
+INTERFACE_COUNTERS = ['receive_bytes', 'receive_packets', 'receive_errors', 'receive_dropped',
+                      'transmit_bytes', 'transmit_packets', 'transmit_errors', 'transmit_dropped']
+
+def escapeLabelValue(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def formatSample(name, labels, value):
+    if labels:
+        labelText = ','.join('%s="%s"' % (key, escapeLabelValue(labelValue)) for key, labelValue in labels)
+        return '%s{%s} %s' % (name, labelText, repr(float(value)))
+    return '%s %s' % (name, repr(float(value)))
+
+class MetricsText:
+    """Metric families in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.lines = []
+
+    def addFamily(self, name, metricType, helpText, samples):
+        # samples is a list of (labels, value), the labels a list of (name, value)
+        self.lines.append('# HELP %s %s' % (name, helpText))
+        self.lines.append('# TYPE %s %s' % (name, metricType))
+        for labels, value in samples:
+            self.lines.append(formatSample(name, labels, value))
+
+    def addHistogram(self, name, helpText, buckets, count, total):
+        # buckets is a list of (upper bound, cumulative count)
+        self.lines.append('# HELP %s %s' % (name, helpText))
+        self.lines.append('# TYPE %s histogram' % name)
+        for upperBound, bucketCount in buckets:
+            self.lines.append(formatSample(name + '_bucket', [('le', upperBound)], bucketCount))
+        self.lines.append(formatSample(name + '_sum', None, total))
+        self.lines.append(formatSample(name + '_count', None, count))
+
+    def getText(self):
+        return '\n'.join(self.lines) + '\n'
+
+def collectMetrics(emulator):
+    """The metrics of the running emulation, only from what the emulator already keeps in memory: the samples of
+    the resource sampler, the startup profile and the state of the ODL mounts. No docker or shell call is made.
+
+    A link is up when the interfaces of both its ends are up and running, as sampled in the network namespaces of
+    their containers.
+    """
+    metrics = MetricsText()
+    neUuids = [neObj.uuid for neObj in emulator.networkElementList]
+    metrics.addFamily('wte_network_elements', 'gauge', 'Number of emulated network elements',
+                      [(None, len(neUuids))])
+
+    perNe, total = emulator.resourceSampler.getUsage(1)
+    for index, (name, helpText) in enumerate(NE_RESOURCE_METRICS):
+        metrics.addFamily(name, 'gauge', helpText,
+                          [([('ne', neUuid)], perNe[neUuid][index]) for neUuid in neUuids if neUuid in perNe])
+
+    interfaceCounters = emulator.resourceSampler.getInterfaceCounters()
+    for index, counter in enumerate(INTERFACE_COUNTERS):
+        samples = []
+        for neUuid in neUuids:
+            for interfaceName, values in sorted(interfaceCounters.get(neUuid, {}).items()):
+                samples.append(([('ne', neUuid), ('interface', interfaceName)], values[index]))
+        metrics.addFamily('wte_ne_interface_%s_total' % counter, 'counter',
+                          'Counter %s of the interface, in the network namespace of the NE container' % counter,
+                          samples)
+
+    interfaceFlags = emulator.resourceSampler.getInterfaceFlags()
+    samples = []
+    for topo in emulator.topologies:
+        for linkObj in topo.linkList:
+            ends = linkObj.interfacesObj
+            up = all(isInterfaceUp(interfaceFlags.get(intf.neObj.uuid, {}).get(intf.getInterfaceName()))
+                     for intf in ends)
+            samples.append(([('layer', topo.topologyLayer), ('link', linkObj.getJournalName())], 1 if up else 0))
+    metrics.addFamily('wte_link_up', 'gauge', 'Whether the interfaces of both ends of the link are up and running',
+                      samples)
+
+    profile = emulator.profiler.buildTree()
+    metrics.addFamily('wte_startup_phase_seconds', 'gauge', 'Duration of the startup phases',
+                      [([('phase', phase['name'])], phase['seconds']) for phase in profile['children']])
+    metrics.addFamily('wte_ne_startup_seconds', 'gauge', 'Time taken to provision the NE',
+                      [([('ne', neUuid)], emulator.neBringUpTimes[neUuid]) for neUuid in neUuids
+                       if neUuid in emulator.neBringUpTimes])
+
+    readiness = emulator.readinessProber.getStatistics()
+    metrics.addHistogram('wte_netconf_ready_seconds', 'Time from the start of the NE container to its NETCONF banner',
+                         [(bucket['le'], bucket['count']) for bucket in readiness['histogram']],
+                         readiness['ready'], readiness['sumSeconds'])
+
+    mounts = emulator.controllerBalancer.getMounts()
+    metrics.addFamily('wte_ne_odl_mounted', 'gauge', 'Whether the NE is mounted on the ODL controller',
+                      [([('ne', neUuid), ('controller', mounts[neUuid])], 1) for neUuid in neUuids
+                       if neUuid in mounts])
+    statistics = emulator.controllerBalancer.getStatistics()
+    for name, key, helpText in ODL_CONTROLLER_METRICS:
+        metrics.addFamily(name, 'counter', helpText,
+                          [([('controller', controller['controller'])], controller[key]) for controller in statistics])
+    return metrics.getText()
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != METRICS_PATH:
+            self.send_error(404)
+            return
+        try:
+            body = collectMetrics(self.server.emulator).encode('utf-8')
+        except Exception as err:
+            logger.error("Could not collect the metrics: %s", err)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("Metrics request from %s: %s", self.address_string(), format % args)
+
+class MetricsServer(socketserver.ThreadingMixIn, HTTPServer):
+    """Serves the metrics of the emulator on METRICS_PATH, in a background thread."""
+    daemon_threads = True
+
+    def __init__(self, address, port, emulator):
+        super().__init__((address, port), MetricsHandler)
+        self.emulator = emulator
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='metrics-server', daemon=True)
+        self.thread.start()
+        logger.info("Serving the metrics on http://%s:%d%s", self.server_address[0], self.server_address[1],
+                    METRICS_PATH)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
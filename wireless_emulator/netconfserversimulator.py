@@ -1,14 +1,16 @@
 import logging
-import subprocess
 import xml.etree.ElementTree as ET
 import copy
 import os
 
 import wireless_emulator.emulator
-from wireless_emulator.utils import addCoreDefaultValuesToNode, printErrorAndExit, addCoreDefaultStatusValuesToNode
+from wireless_emulator.utils import addCoreDefaultValuesToNode, addCoreDefaultStatusValuesToNode
 from wireless_emulator.interface import *
-from wireless_emulator.odlregistration import registerNeToOdl, registerNeToOdlNewVersion
+from wireless_emulator.odlregistration import registerNeToOdl
+from wireless_emulator.dockerapi import getDockerClient
+from wireless_emulator.xmltemplates import serializeXmlTree, writeXmlDebugFile
 import wireless_emulator.ethCrossConnect as EthXConn
+from wireless_emulator.journal import CONTAINER, NETWORK
 
 logger = logging.getLogger(__name__)
 
@@ -25,23 +27,22 @@ class NetconfServerSimulator:
         else:
             self.xmlFile = neParamObject.get('xmlFile')
 
+        # parsed before any address or port is leased to the NE
+        try:
+            self.xmlTree = ET.parse("NetconfServerSimulator/"+self.xmlFile)
+        except (IOError, ET.ParseError) as err:
+            logger.critical("Could not parse XML default values configuration file!")
+            raise ValueError("Could not parse the XML default values file of NE=%s: %s" % (self.uuid, err))
+
         self.emEnv = wireless_emulator.emulator.Emulator()
 
-        self.networkIPAddress = self.emEnv.mgmtIpFactory.getFreeManagementNetworkIP()
+        self.networkIPAddress = self.emEnv.mgmtIpFactory.getFreeManagementNetworkIP(self.uuid)
         if self.networkIPAddress is None:
             logger.critical("Could not retrieve a free Management Network IP address for NE=%s", self.uuid)
             raise ValueError("Invalid Network IP address")
-        self.managementIPAddressString = str(self.networkIPAddress[1])
-
-        self.netconfPortNumber = None
-        self.sshPortNumber = None
-        if self.emEnv.portBasedEmulation is True:
-            self.netconfPortNumber = self.emEnv.netconfPortBase + self.id
-            self.sshPortNumber = self.emEnv.sshPortBase + self.id
-            self.managementIPAddressString = self.emEnv.emulatorIp
-        else:
-            self.netconfPortNumber = 8300
-            self.sshPortNumber = 2200
+        # its container gets its configuration in its environment, it is never a warm one
+        self.managementIPAddressString, self.netconfPortNumber, self.sshPortNumber = \
+            self.emEnv.getManagementAddress(self)
 
         self.interfaces = None
         self.interfaceList = []
@@ -49,13 +50,6 @@ class NetconfServerSimulator:
         # docker network name
         self.networkName = "wte_net_" + str(self.id)
 
-        tree = ET.parse("NetconfServerSimulator/"+self.xmlFile)
-        if tree is None:
-            logger.critical("Could not parse XML default values configuration file!")
-            printErrorAndExit()
-        else:
-            self.xmlTree = tree
-
         logger.info("Created NetworkElement object with uuid=%s and id=%s and IP=%s",
                     self.uuid, self.id, self.managementIPAddressString)
 
@@ -82,25 +76,32 @@ class NetconfServerSimulator:
         return None
 
 
-    # TODO add support for new docker container
     def createDockerContainer(self):
         print("Creating docker container %s..." % (self.dockerName))
 
-        if self.emEnv.portBasedEmulation is True:
-            network=''
-        else:
+        network = None
+        if self.emEnv.portBasedEmulation is not True:
             self.createDockerNetwork()
-            network='--network=%s' % self.networkName
+            network = self.networkName
+
+        env = ["UUID=%s" % self.uuid, "XMLFILE=%s" % self.xmlFile]
+
+        self.emEnv.journal.record(CONTAINER, self.dockerName)
+        getDockerClient().createContainer(self.dockerName, 'netconfserversimulator',
+                                          portBindings=self.emEnv.getManagementPortBindings(self),
+                                          network=network, env=env, labels=self.emEnv.getDockerLabels())
+        logger.debug("Created docker container %s having IP=%s", self.dockerName, self.managementIPAddressString)
 
-        stringCmd = 'docker create -it --privileged -p %s:%s:830 -p %s:%s:22 --name=%s %s -e "UUID=%s" -e "XMLFILE=%s" netconfserversimulator' % \
-                          (self.managementIPAddressString, self.netconfPortNumber,
-                           self.managementIPAddressString, self.sshPortNumber,
-                           self.dockerName, network,
-                           self.uuid, self.xmlFile)
+    def createDockerNetwork(self):
 
-        if stringCmd is not None:
-            self.emEnv.executeCommandInOS(stringCmd)
-            logger.debug("Created docker container %s having IP=%s", self.dockerName, self.managementIPAddressString)
+        netAddressString = str(self.networkIPAddress.with_prefixlen)
+        print("Creating docker network %s..." % (netAddressString))
+
+        self.emEnv.journal.record(NETWORK, self.networkName)
+        getDockerClient().createNetwork(self.networkName, netAddressString, ipRange=netAddressString,
+                                        labels=self.emEnv.getDockerLabels())
+
+        logger.debug("Created docker network %s having address %s", self.networkName, netAddressString)
 
     # TODO add support for new docker container
     def copyXmlConfigFileToDockerContainer(self):
@@ -116,52 +117,59 @@ class NetconfServerSimulator:
         self.emEnv.executeCommandInOS(stringCmd)
 
     def startDockerContainer(self):
-        stringCmd = "docker start %s" % (self.dockerName)
-        self.emEnv.executeCommandInOS(stringCmd)
+        getDockerClient().startContainer(self.dockerName)
 
     def saveNetworkNamespace(self):
-        stringCmd = "docker inspect -f '{{.State.Pid}}' \"%s\"" % (self.dockerName)
-        returnValue = self.emEnv.executeCommandAndGetResultInOS(stringCmd)
-        for line in returnValue:
-            self.networkNamespace = line.decode("utf-8").rstrip('\n')
+        self.networkNamespace = str(getDockerClient().getContainerPid(self.dockerName))
 
     def addNetworkElement(self):
+        self.buildNetworkElementXml()
+        self.provisionNetworkElement()
+
+    def buildNetworkElementXml(self):
+        # the XML model is provided by the xmlFile from the NE definition, nothing to build
         print("Adding Network element %s..." % (self.uuid))
 
-        self.createDockerContainer()
+    def buildNetworkElementObjects(self):
+        self.buildNetworkElementXml()
+
+    def provisionNetworkElement(self):
+        profiler = self.emEnv.profiler
+        phase = 'provision-network-elements'
+
+        with profiler.phase(phase, self.uuid, 'container-create'):
+            self.createDockerContainer()
 
         #self.copyXmlConfigFileToDockerContainer()
 
-        self.startDockerContainer()
+        with profiler.phase(phase, self.uuid, 'container-start'):
+            self.startDockerContainer()
         if self.emEnv.registerToOdl == True:
            # registerNeToOdl(self.emEnv.controllerInfo, self.uuid, self.managementIPAddressString)
-           for controller in self.emEnv.controllerList:
-               try:
-                    registerNeToOdlNewVersion(controller, self.uuid, self.managementIPAddressString,
-                                         self.netconfPortNumber)
-                    break
-               except RuntimeError:
-                    print("Failed to register NE=%s having IP=%s and port=%s to the ODL controller having IP=%s" %
-                         (self.uuid, self.managementIPAddressString, self.netconfPortNumber, controller['ip-address']))
-                    continue
+           self.emEnv.registerNetworkElementWhenReady(self)
 
-        self.saveNetworkNamespace()
+        with profiler.phase(phase, self.uuid, 'namespace-lookup'):
+            self.saveNetworkNamespace()
 
-        #debug
-        self.xmlTree.write('output-netconfserversimulator-' + self.dockerName + '.xml')
+        if self.emEnv.writeDebugXmlFiles is True:
+            writeXmlDebugFile('output-netconfserversimulator-' + self.dockerName + '.xml', serializeXmlTree(self.xmlTree))
 
     def addInterfacesInDockerContainer(self):
         return
 
+    def addInterfacesInDockerContainerToScript(self):
+        return
+
+    def runInterfaceScriptInDockerContainer(self):
+        return
+
     def executeCommandInContainer(self, command):
         if command == '' or command is None:
             return
-        stringCmd = "docker exec -it %s %s" % (self.dockerName, command)
-        cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        exitCode, stdout, stderr = getDockerClient().execInContainer(self.dockerName, ['/bin/sh', '-c', command])
 
-        for line in cmd.stderr:
-            strLine = line.decode("utf-8").rstrip('\n')
-            logger.critical("Stderr: %s", strLine)
+        for line in stderr.decode("utf-8").splitlines():
+            logger.critical("Stderr: %s", line)
             raise RuntimeError
-        for line in cmd.stdout:
-            print(line.decode("utf-8").rstrip('\n'))
+        for line in stdout.decode("utf-8").splitlines():
+            print(line)
@@ -0,0 +1,140 @@
+import errno
+import logging
+import os
+import socket
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+# rtnetlink constants, from linux/netlink.h, linux/rtnetlink.h, linux/if_link.h and linux/veth.h
+NETLINK_ROUTE = 0
+NLMSG_ERROR = 2
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_LINKINFO = 18
+IFLA_NET_NS_PID = 19
+IFLA_INFO_KIND = 1
+IFLA_INFO_DATA = 2
+VETH_INFO_PEER = 1
+
+IFF_UP = 0x1
+
+NLMSG_HEADER = struct.Struct('=IHHII')
+NLMSG_ERROR_CODE = struct.Struct('=i')
+IFINFOMSG = struct.Struct('=BxHiII')
+RTATTR_HEADER = struct.Struct('=HH')
+
+_sequence = 0
+_sequenceLock = threading.Lock()
+
+def getSequenceNumber():
+    global _sequence
+    with _sequenceLock:
+        _sequence += 1
+        return _sequence
+
+def packAttribute(attrType, data):
+    attribute = RTATTR_HEADER.pack(RTATTR_HEADER.size + len(data), attrType) + data
+    padding = (4 - len(attribute) % 4) % 4
+    return attribute + b'\0' * padding
+
+def packInterfaceInfo(flags=0, change=0):
+    return IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, flags, change)
+
+def packInterface(name, pid, index=0, macAddress=None):
+    # ifinfomsg asking for the interface to be up, followed by its name, the namespace where it must be and its MAC
+    # address, if it is given
+    payload = IFINFOMSG.pack(socket.AF_UNSPEC, 0, index, IFF_UP, IFF_UP) + \
+              packAttribute(IFLA_IFNAME, name.encode('utf-8') + b'\0') + \
+              packAttribute(IFLA_NET_NS_PID, struct.pack('=I', int(pid)))
+    if macAddress is not None:
+        payload += packAttribute(IFLA_ADDRESS, bytes.fromhex(macAddress.replace(':', '')))
+    return payload
+
+def sendRequest(messageType, flags, payload):
+    """Sends one rtnetlink request and waits for its acknowledgement, raising OSError on failure.
+
+    Every request uses its own socket, so requests can be sent in parallel from several threads.
+    """
+    sequence = getSequenceNumber()
+    message = NLMSG_HEADER.pack(NLMSG_HEADER.size + len(payload), messageType,
+                                flags | NLM_F_REQUEST | NLM_F_ACK, sequence, 0) + payload
+
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE) as sock:
+        sock.bind((0, 0))
+        sock.sendto(message, (0, 0))
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + NLMSG_HEADER.size <= len(data):
+                length, responseType, responseFlags, responseSequence, pid = \
+                    NLMSG_HEADER.unpack_from(data, offset)
+                if responseSequence == sequence and responseType == NLMSG_ERROR:
+                    error = -NLMSG_ERROR_CODE.unpack_from(data, offset + NLMSG_HEADER.size)[0]
+                    if error != 0:
+                        raise OSError(error, os.strerror(error))
+                    return
+                if length < NLMSG_HEADER.size:
+                    break
+                offset += (length + 3) & ~3
+
+def getTemporaryVethName():
+    # unique on the host, also between runs, and shorter than IFNAMSIZ
+    return "wtt%x-%x" % (os.getpid(), getSequenceNumber())
+
+def deleteLink(name):
+    """Deletes the interface called name from the host namespace, returns False if it does not exist."""
+    try:
+        sendRequest(RTM_DELLINK, 0, packInterfaceInfo() + packAttribute(IFLA_IFNAME, name.encode('utf-8') + b'\0'))
+    except OSError as err:
+        if err.errno == errno.ENODEV:
+            return False
+        logger.error("Could not delete interface %s: %s", name, err.strerror)
+        raise RuntimeError("Could not delete interface %s: %s" % (name, err.strerror))
+    return True
+
+def createVethPair(name, pid, peerName, peerPid, temporaryName=None, macAddress=None, peerMacAddress=None):
+    """Creates a veth pair having the ends, up and with their final names and MAC addresses, in the namespaces of
+    pid and peerPid.
+
+    The kernel cannot bring the peer up while the pair is created, so the peer is created in the host namespace
+    with a unique temporary name and then moved, renamed and set up with a second request. This is the
+    equivalent of:
+    ip link add name <name> netns <pid> address <macAddress> up type veth peer name <tmp>
+    ip link set dev <tmp> netns <peerPid> name <peerName> address <peerMacAddress> up
+    """
+    if temporaryName is None:
+        temporaryName = getTemporaryVethName()
+    peer = packAttribute(VETH_INFO_PEER, packInterfaceInfo() +
+                         packAttribute(IFLA_IFNAME, temporaryName.encode('utf-8') + b'\0'))
+    linkInfo = packAttribute(IFLA_INFO_KIND, b'veth\0') + packAttribute(IFLA_INFO_DATA, peer)
+
+    try:
+        sendRequest(RTM_NEWLINK, NLM_F_CREATE | NLM_F_EXCL, packInterface(name, pid, macAddress=macAddress) +
+                    packAttribute(IFLA_LINKINFO, linkInfo))
+        peerIndex = socket.if_nametoindex(temporaryName)
+        try:
+            sendRequest(RTM_NEWLINK, 0, packInterface(peerName, peerPid, peerIndex, peerMacAddress))
+        except OSError:
+            # deleting the temporary end also deletes the one already in the namespace of pid; if the end was
+            # already moved, the pair is deleted together with the namespace when the containers are removed
+            try:
+                sendRequest(RTM_DELLINK, 0, IFINFOMSG.pack(socket.AF_UNSPEC, 0, peerIndex, 0, 0))
+            except OSError:
+                pass
+            raise
+    except OSError as err:
+        logger.critical("Could not create veth pair %s (pid %s) - %s (pid %s): %s",
+                        name, pid, peerName, peerPid, err.strerror)
+        raise RuntimeError("Could not create veth pair %s - %s: %s" % (name, peerName, err.strerror))
+
+    logger.debug("Created veth pair %s (pid %s) - %s (pid %s)", name, pid, peerName, peerPid)
@@ -1,5 +1,4 @@
 import logging
-import subprocess
 import xml.etree.ElementTree as ET
 import copy
 import os
@@ -8,8 +7,13 @@ from io import StringIO
 import wireless_emulator.emulator
 from wireless_emulator.utils import addCoreDefaultValuesToNode, printErrorAndExit, addCoreDefaultStatusValuesToNode
 from wireless_emulator.interface import *
-from wireless_emulator.odlregistration import registerNeToOdl, registerNeToOdlNewVersion
+from wireless_emulator.odlregistration import registerNeToOdl
+from wireless_emulator.dockerapi import getDockerClient
+from wireless_emulator.artifacts import OPENYUMA_PATH, buildTarMembers, buildTarArchive
+from wireless_emulator.xmltemplates import XML_NAMESPACES, serializeXmlTree, writeXmlDebugFile
 import wireless_emulator.ethCrossConnect as EthXConn
+from wireless_emulator.journal import CONTAINER, NETWORK
+from wireless_emulator.leases import getLeaseKey
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +24,9 @@ class NetworkElement:
         self.id = neId
         self.dockerName = self.uuid.replace(" ", "")
         self.dockerType = dockerType
+        self.dockerImage = 'openyuma'
+        if self.dockerType == 'JavaNetconfServer':
+            self.dockerImage = 'javasimulator'
         self.ptpEnabled = False
         if ptpClock is not None:
             self.ptpClockInstance = str(ptpClock[0])
@@ -62,51 +69,36 @@ class NetworkElement:
         self.ptpPortDsListStatusXmlNode = None
         self.equipmentStatusXmlNode = None
 
+        # serialized XML documents, rendered once after the XML model is built
+        self.xmlConfigurationBytes = None
+        self.xmlStatusBytes = None
+        # where the rendered documents are stored in the XML cache of the emulator, None when it is disabled
+        self.xmlCacheKey = None
+
         # namespace from host, used when adding a veth pair from the host inside a container, for emulating a physical connection
         self.networkNamespace = None
 
-        self.networkIPAddress = self.emEnv.mgmtIpFactory.getFreeManagementNetworkIP()
+        self.networkIPAddress = self.emEnv.mgmtIpFactory.getFreeManagementNetworkIP(self.uuid)
         if self.networkIPAddress is None:
             logger.critical("Could not retrieve a free Management Network IP address for NE=%s", self.uuid)
             raise ValueError("Invalid Network IP address")
-        self.managementIPAddressString = str(self.networkIPAddress[1])
-
-        self.netconfPortNumber = None
-        self.sshPortNumber = None
-        if self.emEnv.portBasedEmulation is True:
-            self.netconfPortNumber = self.emEnv.netconfPortBase + self.id
-            self.sshPortNumber = self.emEnv.sshPortBase + self.id
-            self.managementIPAddressString = self.emEnv.emulatorIp
-        else:
-            self.netconfPortNumber = 8300
-            self.sshPortNumber = 2200
+        self.managementIPAddressString, self.netconfPortNumber, self.sshPortNumber = \
+            self.emEnv.getManagementAddress(self, self.dockerImage)
 
         self.interfaces = interfaces
         self.interfaceList = []
+        # indexes of interfaceList, by interface uuid and by interface name
+        self.interfacesByUuid = {}
+        self.interfacesByName = {}
 
         # docker network name
         self.networkName = "wte_net_" + str(self.id)
 
-        tree = ET.parse(self.emEnv.xmlConfigFile)
-        if tree is None:
-            logger.critical("Could not parse XML default values configuration file!")
-            printErrorAndExit()
-        else:
-            self.xmlConfigurationTree = tree
+        templates = self.emEnv.getXmlTemplates()
+        self.xmlConfigurationTree = templates.newConfigTree()
+        self.xmlStatusTree = templates.newStatusTree()
 
-        tree = ET.parse(self.emEnv.xmlStatusFile)
-        if tree is None:
-            logger.critical("Could not parse XML default values status file!")
-            printErrorAndExit()
-        else:
-            self.xmlStatusTree = tree
-
-        # XML namespaces needed when searching the config XML
-        self.namespaces = {'microwave-model' : 'urn:onf:params:xml:ns:yang:microwave-model',
-                           'core-model' : 'urn:onf:params:xml:ns:yang:core-model',
-                           'onf-ethernet-conditional-packages' : 'urn:onf:params:xml:ns:yang:onf-ethernet-conditional-packages',
-                           'ptp' : 'urn:ietf:params:xml:ns:yang:ietf-ptp-dataset',
-                           'ptp-ex': 'urn:onf:params:xml:ns:yang:onf-ptp-dataset'}
+        self.namespaces = XML_NAMESPACES
         self.saveXmlTemplates()
 
         logger.info("Created NetworkElement object with uuid=%s and id=%s and IP=%s",
@@ -121,170 +113,66 @@ class NetworkElement:
     def getNeUuid(self):
         return self.uuid
 
+    def addInterface(self, intfObj):
+        self.interfaceList.append(intfObj)
+        # the first interface having a uuid or name is the one returned, as when searching interfaceList
+        self.interfacesByUuid.setdefault(intfObj.getInterfaceUuid(), intfObj)
+        self.interfacesByName.setdefault(intfObj.getInterfaceName(), intfObj)
+
     def getInterfaceFromInterfaceUuid(self, reqIntfId):
-        for intf in self.interfaceList:
-            intfId = intf.getInterfaceUuid()
-            if intfId == reqIntfId:
-                return intf
-        logger.debug("Could not find interface having uuid=%s in ne=%s", reqIntfId, self.uuid)
-        return None
+        intf = self.interfacesByUuid.get(reqIntfId)
+        if intf is None:
+            logger.debug("Could not find interface having uuid=%s in ne=%s", reqIntfId, self.uuid)
+        return intf
 
     def getInterfaceFromInterfaceName(self, reqIntfName):
-        for intf in self.interfaceList:
-            intfId = intf.getInterfaceName()
-            if intfId == reqIntfName:
-                return intf
-        logger.debug("Could not find interface having name=%s in ne=%s", reqIntfName, self.uuid)
-        return None
+        intf = self.interfacesByName.get(reqIntfName)
+        if intf is None:
+            logger.debug("Could not find interface having name=%s in ne=%s", reqIntfName, self.uuid)
+        return intf
 
     def saveXmlTemplates(self):
         self.saveConfigXmlTemplates()
         self.saveStatusXmlTemplates()
 
     def saveConfigXmlTemplates(self):
+        templates = self.emEnv.getXmlTemplates()
 
         self.configRootXmlNode = self.xmlConfigurationTree.getroot()
-
-        airInterface = self.configRootXmlNode.find('microwave-model:mw-air-interface-pac', self.namespaces)
-        self.airInterfacePacConfigXmlNode = copy.deepcopy(airInterface)
-        self.configRootXmlNode.remove(airInterface)
-
         self.networkElementConfigXmlNode = self.configRootXmlNode.find('core-model:network-element', self.namespaces)
 
-        forwardingDomain = self.networkElementConfigXmlNode.find('core-model:fd', self.namespaces)
-        fd_fc_xmlNode = forwardingDomain.find('core-model:fc', self.namespaces)
-        self.forwardingDomainForwardingConstructXmlNode = copy.deepcopy(fd_fc_xmlNode)
-        forwardingDomain.remove(fd_fc_xmlNode)
-
-        fdLtp = forwardingDomain.find('core-model:ltp', self.namespaces)
-        self.fdLtpXmlNode = copy.deepcopy(fdLtp)
-        forwardingDomain.remove(fdLtp)
-
-        ltp = self.networkElementConfigXmlNode.find('core-model:ltp', self.namespaces)
-        self.ltpConfigXmlNode = copy.deepcopy(ltp)
-        self.networkElementConfigXmlNode.remove(ltp)
-
-        pureEthernet = self.configRootXmlNode.find('microwave-model:mw-pure-ethernet-structure-pac', self.namespaces)
-        self.pureEthernetPacConfigXmlNode = copy.deepcopy(pureEthernet)
-        self.configRootXmlNode.remove(pureEthernet)
-
-        ethernetContainer = self.configRootXmlNode.find('microwave-model:mw-ethernet-container-pac', self.namespaces)
-        self.ethernetContainerPacConfigXmlNode = copy.deepcopy(ethernetContainer)
-        self.configRootXmlNode.remove(ethernetContainer)
-
-        forwardingConstruct = self.configRootXmlNode.find('core-model:forwarding-construct', self.namespaces)
-        self.forwardingConstructConfigXmlNode = copy.deepcopy(forwardingConstruct)
-        self.configRootXmlNode.remove(forwardingConstruct)
-
-        ethernetPac = self.configRootXmlNode.find('onf-ethernet-conditional-packages:ethernet-pac', self.namespaces)
-        self.ethernetPacConfigXmlNode = copy.deepcopy(ethernetPac)
-        self.configRootXmlNode.remove(ethernetPac)
-
-        ptpInstanceList = self.configRootXmlNode.find('ptp:instance-list', self.namespaces)
-        self.ptpInstanceListConfigXmlNode = copy.deepcopy(ptpInstanceList)
-        ptpPortDsList = self.ptpInstanceListConfigXmlNode.find('ptp:port-ds-list', self.namespaces)
-        self.ptpPortDsListConfigXmlNode = copy.deepcopy(ptpPortDsList)
-        self.ptpInstanceListConfigXmlNode.remove(ptpPortDsList)
-        self.configRootXmlNode.remove(ptpInstanceList)
-
-        equipmentNode = self.configRootXmlNode.find('core-model:equipment', self.namespaces)
-        self.equipmentConfigXmlNode = copy.deepcopy(equipmentNode)
-        self.configRootXmlNode.remove(equipmentNode)
-
-        uselessNode = self.configRootXmlNode.find('microwave-model:co-channel-group', self.namespaces)
-        self.configRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.configRootXmlNode.find('microwave-model:mw-air-interface-hsb-end-point-pac', self.namespaces)
-        self.configRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.configRootXmlNode.find('microwave-model:mw-air-interface-hsb-fc-switch-pac', self.namespaces)
-        self.configRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.configRootXmlNode.find('microwave-model:mw-air-interface-diversity-pac', self.namespaces)
-        self.configRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.configRootXmlNode.find('microwave-model:mw-hybrid-mw-structure-pac', self.namespaces)
-        self.configRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.configRootXmlNode.find('microwave-model:mw-tdm-container-pac', self.namespaces)
-        self.configRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.configRootXmlNode.find('core-model:operation-envelope', self.namespaces)
-        self.configRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.configRootXmlNode.find('ptp:transparent-clock-default-ds', self.namespaces)
-        self.configRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.configRootXmlNode.find('ptp:transparent-clock-port-ds-list', self.namespaces)
-        self.configRootXmlNode.remove(uselessNode)
+        self.airInterfacePacConfigXmlNode = templates.airInterfacePacConfigXmlNode
+        self.forwardingDomainForwardingConstructXmlNode = templates.forwardingDomainForwardingConstructXmlNode
+        self.fdLtpXmlNode = templates.fdLtpXmlNode
+        self.ltpConfigXmlNode = templates.ltpConfigXmlNode
+        self.pureEthernetPacConfigXmlNode = templates.pureEthernetPacConfigXmlNode
+        self.ethernetContainerPacConfigXmlNode = templates.ethernetContainerPacConfigXmlNode
+        self.forwardingConstructConfigXmlNode = templates.forwardingConstructConfigXmlNode
+        self.ethernetPacConfigXmlNode = templates.ethernetPacConfigXmlNode
+        self.ptpPortDsListConfigXmlNode = templates.ptpPortDsListConfigXmlNode
+        self.equipmentConfigXmlNode = templates.equipmentConfigXmlNode
+
+        # the PTP instance list is filled in place, so it is the only template that needs a copy per NE
+        if self.ptpEnabled is True:
+            self.ptpInstanceListConfigXmlNode = copy.deepcopy(templates.ptpInstanceListConfigXmlNode)
 
     def saveStatusXmlTemplates(self):
+        templates = self.emEnv.getXmlTemplates()
 
         self.statusRootXmlNode = self.xmlStatusTree.getroot()
-
-        airInterface = self.statusRootXmlNode.find('mw-air-interface-pac')
-        self.airInterfaceStatusXmlNode = copy.deepcopy(airInterface)
-        self.statusRootXmlNode.remove(airInterface)
-
         self.networkElementStatusXmlNode = self.statusRootXmlNode.find('network-element')
 
-        ltp = self.networkElementStatusXmlNode.find('ltp')
-        self.ltpStatusXmlNode = copy.deepcopy(ltp)
-        self.networkElementStatusXmlNode.remove(ltp)
-
-        pureEthernetStructure = self.statusRootXmlNode.find('mw-pure-ethernet-structure-pac')
-        self.pureEthernetStatusXmlNode = copy.deepcopy(pureEthernetStructure)
-        self.statusRootXmlNode.remove(pureEthernetStructure)
-
-        ethernetContainer = self.statusRootXmlNode.find('mw-ethernet-container-pac')
-        self.ethernetContainerStatusXmlNode = copy.deepcopy(ethernetContainer)
-        self.statusRootXmlNode.remove(ethernetContainer)
-
-        forwardingConstruct = self.statusRootXmlNode.find('forwarding-construct')
-        self.forwardingConstructStatusXmlNode = copy.deepcopy(forwardingConstruct)
-        self.statusRootXmlNode.remove(forwardingConstruct)
-
-        ethernetPac = self.statusRootXmlNode.find('ethernet-pac')
-        self.ethernetPacStatusXmlNode = copy.deepcopy(ethernetPac)
-        self.statusRootXmlNode.remove(ethernetPac)
-
-        ptpInstanceList = self.statusRootXmlNode.find('instance-list')
-        self.ptpInstanceListStatusXmlNode = copy.deepcopy(ptpInstanceList)
-        ptpPortDsList = self.ptpInstanceListStatusXmlNode.find('port-ds-list', self.namespaces)
-        self.ptpPortDsListStatusXmlNode = copy.deepcopy(ptpPortDsList)
-        self.ptpInstanceListStatusXmlNode.remove(ptpPortDsList)
-        self.statusRootXmlNode.remove(ptpInstanceList)
-
-        equipmentNode = self.statusRootXmlNode.find('equipment')
-        self.equipmentStatusXmlNode = copy.deepcopy(equipmentNode)
-        self.statusRootXmlNode.remove(equipmentNode)
+        self.airInterfaceStatusXmlNode = templates.airInterfaceStatusXmlNode
+        self.ltpStatusXmlNode = templates.ltpStatusXmlNode
+        self.pureEthernetStatusXmlNode = templates.pureEthernetStatusXmlNode
+        self.ethernetContainerStatusXmlNode = templates.ethernetContainerStatusXmlNode
+        self.forwardingConstructStatusXmlNode = templates.forwardingConstructStatusXmlNode
+        self.ethernetPacStatusXmlNode = templates.ethernetPacStatusXmlNode
+        self.ptpPortDsListStatusXmlNode = templates.ptpPortDsListStatusXmlNode
+        self.equipmentStatusXmlNode = templates.equipmentStatusXmlNode
 
-        uselessNode = self.statusRootXmlNode.find('co-channel-group')
-        self.statusRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.statusRootXmlNode.find('mw-air-interface-hsb-end-point-pac')
-        self.statusRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.statusRootXmlNode.find('mw-air-interface-hsb-fc-switch-pac')
-        self.statusRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.statusRootXmlNode.find('mw-air-interface-diversity-pac')
-        self.statusRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.statusRootXmlNode.find('mw-hybrid-mw-structure-pac')
-        self.statusRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.statusRootXmlNode.find('mw-tdm-container-pac')
-        self.statusRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.statusRootXmlNode.find('operation-envelope')
-        self.statusRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.statusRootXmlNode.find('transparent-clock-default-ds')
-        self.statusRootXmlNode.remove(uselessNode)
-
-        uselessNode = self.statusRootXmlNode.find('transparent-clock-port-ds-list')
-        self.statusRootXmlNode.remove(uselessNode)
+        if self.ptpEnabled is True:
+            self.ptpInstanceListStatusXmlNode = copy.deepcopy(templates.ptpInstanceListStatusXmlNode)
 
     def buildCoreModelXml(self):
         #network-element part here
@@ -443,7 +331,7 @@ class NetworkElement:
         timeout = ET.SubElement(notif, "timeout")
         timeout.text = str(self.emEnv.configJson['notificationPeriod'])
 
-    def createInterfaces(self):
+    def createInterfaces(self, buildXml=True):
         portNumId = 1
         for intf in self.interfaces:
             intfObj = None
@@ -453,8 +341,9 @@ class NetworkElement:
                     intfObj = MwpsInterface(port['id'], portNumId, self, port['supportedAlarms'],
                                             port['physical-port-reference'], port['conditional-package'])
                     portNumId += 1
-                    intfObj.buildXmlFiles()
-                    self.interfaceList.append(intfObj)
+                    if buildXml is True:
+                        intfObj.buildXmlFiles()
+                    self.addInterface(intfObj)
 
             elif intf['layer'] == "MWS":
 
@@ -462,8 +351,9 @@ class NetworkElement:
                     intfObj = MwsInterface(port['id'], portNumId, self, port['supportedAlarms'], port['serverLTPs'],
                                            port['conditional-package'])
                     portNumId += 1
-                    intfObj.buildXmlFiles()
-                    self.interfaceList.append(intfObj)
+                    if buildXml is True:
+                        intfObj.buildXmlFiles()
+                    self.addInterface(intfObj)
 
             elif intf['layer'] == "ETC":
 
@@ -472,8 +362,9 @@ class NetworkElement:
                         intfObj = MwEthContainerInterface(port['id'], portNumId, self, port['supportedAlarms'],
                                                           port['serverLTPs'], port['conditional-package'])
                     portNumId += 1
-                    intfObj.buildXmlFiles()
-                    self.interfaceList.append(intfObj)
+                    if buildXml is True:
+                        intfObj.buildXmlFiles()
+                    self.addInterface(intfObj)
 
             elif intf['layer'] == "ETY":
 
@@ -481,8 +372,9 @@ class NetworkElement:
                     intfObj = ElectricalEtyInterface(port['id'], portNumId, self, port['physical-port-reference'])
 
                     portNumId += 1
-                    intfObj.buildXmlFiles()
-                    self.interfaceList.append(intfObj)
+                    if buildXml is True:
+                        intfObj.buildXmlFiles()
+                    self.addInterface(intfObj)
 
             elif intf['layer'] == "ETH":
 
@@ -490,152 +382,150 @@ class NetworkElement:
                     intfObj = EthCtpInterface(port['id'], portNumId, self, port['serverLTPs'],
                                               port['conditional-package'])
                     portNumId += 1
-                    intfObj.buildXmlFiles()
-                    self.interfaceList.append(intfObj)
+                    if buildXml is True:
+                        intfObj.buildXmlFiles()
+                    self.addInterface(intfObj)
 
             else:
                 logger.critical("Illegal layer value %s found in JSON configuration file for NE=%s",
                                 intf['layer'], self.uuid)
                 raise ValueError("Illegal layer value")
 
-    def addEthCrossConnections(self):
+    def addEthCrossConnections(self, buildXml=True):
         if self.eth_x_connect is not None:
             id = 1
             for xconn in self.eth_x_connect:
                 xconnObj = EthXConn.EthCrossConnect(id, self, xconn)
                 if xconnObj is not None:
                     self.ethCrossConnectList.append(xconnObj)
-                    xconnObj.buildXmlFiles()
+                    if buildXml is True:
+                        xconnObj.buildXmlFiles()
                     id += 1
 
-    # TODO add support for new docker container
     def createDockerContainer(self):
         print("Creating docker container %s..." % (self.dockerName))
 
-        if self.emEnv.portBasedEmulation is True:
-            stringCmd = None
-            if self.dockerType == 'JavaNetconfServer':
-                stringCmd = "docker create -it --privileged -p %s:%s:830 -p %s:%s:22 --name=%s javasimulator" % \
-                            (self.managementIPAddressString, self.netconfPortNumber,
-                             self.managementIPAddressString, self.sshPortNumber, self.dockerName)
-            else:
-                stringCmd = "docker create -it --privileged -p %s:%s:830 -p %s:%s:22 --name=%s openyuma" % \
-                            (self.managementIPAddressString, self.netconfPortNumber,
-                             self.managementIPAddressString, self.sshPortNumber, self.dockerName)
-        else:
+        network = None
+        if self.emEnv.portBasedEmulation is not True:
             self.createDockerNetwork()
-            stringCmd = None
-            if self.dockerType == 'JavaNetconfServer':
-                stringCmd = "docker create -it --privileged -p %s:%s:830 -p %s:%s:22 --name=%s --network=%s javasimulator" % \
-                            (self.managementIPAddressString, self.netconfPortNumber,
-                             self.managementIPAddressString, self.sshPortNumber,
-                             self.dockerName, self.networkName)
-            else:
-                stringCmd = "docker create -it --privileged -p %s:%s:830 -p %s:%s:22 --name=%s --network=%s openyuma" % \
-                            (self.managementIPAddressString, self.netconfPortNumber,
-                             self.managementIPAddressString, self.sshPortNumber,
-                             self.dockerName, self.networkName)
-
-
-        if stringCmd is not None:
-            self.emEnv.executeCommandInOS(stringCmd)
-            logger.debug("Created docker container %s having IP=%s", self.dockerName, self.managementIPAddressString)
+            network = self.networkName
+
+        self.emEnv.journal.record(CONTAINER, self.dockerName)
+        warmContainerPool = self.emEnv.warmContainerPool
+        if warmContainerPool is not None and \
+                warmContainerPool.claimContainer(self.dockerImage, self.dockerName, network) is True:
+            logger.debug("Took a warm docker container for %s having IP=%s", self.dockerName,
+                         self.managementIPAddressString)
+            return
+        getDockerClient().createContainer(self.dockerName, self.dockerImage,
+                                          portBindings=self.emEnv.getManagementPortBindings(self), network=network,
+                                          labels=self.emEnv.getDockerLabels())
+        logger.debug("Created docker container %s having IP=%s", self.dockerName, self.managementIPAddressString)
 
     def createDockerNetwork(self):
 
         netAddressString = str(self.networkIPAddress.with_prefixlen)
         print("Creating docker network %s..." % (netAddressString))
 
-        stringCmd = "docker network create -d bridge --subnet=%s --ip-range=%s %s" % \
-                    (netAddressString, netAddressString, self.networkName)
-        self.emEnv.executeCommandInOS(stringCmd)
+        self.emEnv.journal.record(NETWORK, self.networkName)
+        getDockerClient().createNetwork(self.networkName, netAddressString, ipRange=netAddressString,
+                                        labels=self.emEnv.getDockerLabels())
 
         logger.debug("Created docker network %s having address %s", self.networkName, netAddressString)
 
-    # TODO add support for new docker container
-    def copyXmlConfigFileToDockerContainer(self):
-        outFileName = "startup-cfg.xml"
-        self.xmlConfigurationTree.write(outFileName)
-        targetPath = "/usr/src/OpenYuma"
-
-        stringCmd = "docker cp %s %s:%s" % \
-                    (outFileName, self.dockerName, targetPath)
-        self.emEnv.executeCommandInOS(stringCmd)
+    def buildContainerArchive(self):
+        files = [(OPENYUMA_PATH + '/startup-cfg.xml', self.xmlConfigurationBytes, 0o644),
+                 (OPENYUMA_PATH + '/microwave-model-status.xml', self.xmlStatusBytes, 0o644),
+                 (OPENYUMA_PATH + '/buildIntf.sh', self.scriptIntf.getvalue().encode('utf-8'), 0o755)]
 
-        stringCmd = "rm -f %s" % (outFileName)
-        self.emEnv.executeCommandInOS(stringCmd)
+        # the YANG modules are the same for all the NEs, they are packed only once by the emulator
+        return buildTarArchive(buildTarMembers(files), self.emEnv.yangArchiveMembers)
 
-#TODO add support for new docker container
-    def copyXmlStatusFileToDockerContainer(self):
-        outFileName = "microwave-model-status.xml"
-        self.xmlStatusTree.write(outFileName)
-        targetPath = "/usr/src/OpenYuma"
+    def renderXmlDocuments(self):
+        self.xmlConfigurationBytes = serializeXmlTree(self.xmlConfigurationTree)
+        self.xmlStatusBytes = serializeXmlTree(self.xmlStatusTree)
+        if self.xmlCacheKey is not None:
+            self.emEnv.xmlCache.store(self.xmlCacheKey, self.emEnv.xmlTimestamp, self.xmlConfigurationBytes,
+                                      self.xmlStatusBytes)
 
-        stringCmd = "docker cp %s %s:%s" % \
-                    (outFileName, self.dockerName, targetPath)
-        self.emEnv.executeCommandInOS(stringCmd)
+    def writeXmlDebugFiles(self):
+        writeXmlDebugFile('output-config-' + self.dockerName + '.xml', self.xmlConfigurationBytes)
+        writeXmlDebugFile('output-status-' + self.dockerName + '.xml', self.xmlStatusBytes)
 
-        stringCmd = "rm -f %s" % (outFileName)
-        self.emEnv.executeCommandInOS(stringCmd)
+    def copyFilesToDockerContainer(self):
+        getDockerClient().putArchive(self.dockerName, '/', self.buildContainerArchive())
+        logger.debug("Copied configuration, status, interface script and YANG files to docker container %s",
+                     self.dockerName)
 
     def startDockerContainer(self):
-        stringCmd = "docker start %s" % (self.dockerName)
-        self.emEnv.executeCommandInOS(stringCmd)
-
-#TODO add support for new docker container
-    def copyYangFilesToDockerContainer(self):
-
-        directory = 'yang'
-        for filename in os.listdir(directory):
-            if filename.endswith(".yang"):
-                stringCmd = "docker cp %s %s:%s" % \
-                            (os.path.join(directory, filename), self.dockerName, "/usr/share/yuma/modules")
-                self.emEnv.executeCommandInOS(stringCmd)
+        getDockerClient().startContainer(self.dockerName)
 
     def saveNetworkNamespace(self):
-        stringCmd = "docker inspect -f '{{.State.Pid}}' \"%s\"" % (self.dockerName)
-        returnValue = self.emEnv.executeCommandAndGetResultInOS(stringCmd)
-        for line in returnValue:
-            self.networkNamespace = line.decode("utf-8").rstrip('\n')
+        self.networkNamespace = str(getDockerClient().getContainerPid(self.dockerName))
 
     def addNetworkElement(self):
+        self.buildNetworkElementXml()
+        self.provisionNetworkElement()
+
+    def buildNetworkElementXml(self):
         print("Adding Network element %s..." % (self.uuid))
-        self.buildCoreModelXml()
-        self.buildCoreModelStatusXml()
+        self.buildNetworkElementModel(True)
+        self.leaseMacAddresses()
 
-        if self.ptpEnabled is True:
-            self.buildPtpModelConfigXml()
-            self.buildPtpModelStatusXml()
+    def buildNetworkElementObjects(self):
+        # only the interfaces and the cross connections, the XML documents are rendered by a worker process
+        print("Adding Network element %s..." % (self.uuid))
+        self.buildNetworkElementModel(False)
+        self.leaseMacAddresses()
+
+    def buildNetworkElementModel(self, buildXml):
+        if buildXml is True:
+            self.buildCoreModelXml()
+            self.buildCoreModelStatusXml()
+
+            if self.ptpEnabled is True:
+                self.buildPtpModelConfigXml()
+                self.buildPtpModelStatusXml()
 
-        self.buildNotificationStatusXml()
+            self.buildNotificationStatusXml()
 
-        self.createInterfaces()
-        self.addEthCrossConnections()
+        self.createInterfaces(buildXml)
+        self.addEthCrossConnections(buildXml)
 
-        self.createDockerContainer()
+    def leaseMacAddresses(self):
+        # only here, not in the worker processes rendering the XML documents; the bonds and the VLAN interfaces take
+        # the address of the interfaces under them
+        for intfObj in self.interfaceList:
+            if intfObj.layer in ('MWPS', 'ETY'):
+                intfObj.macAddress = self.emEnv.macAddressFactory.generateMacAddress(
+                    self.id, intfObj.id, getLeaseKey(self.uuid, intfObj.getInterfaceUuid()))
 
-        self.copyXmlConfigFileToDockerContainer()
-        self.copyXmlStatusFileToDockerContainer()
-        self.copyYangFilesToDockerContainer()
+    def provisionNetworkElement(self):
+        profiler = self.emEnv.profiler
+        phase = 'provision-network-elements'
 
-        self.startDockerContainer()
+        # already done when the XML documents were rendered by the worker processes
+        if self.xmlConfigurationBytes is None:
+            with profiler.phase(phase, self.uuid, 'xml-render'):
+                self.renderXmlDocuments()
+
+        with profiler.phase(phase, self.uuid, 'container-create'):
+            self.createDockerContainer()
+
+        with profiler.phase(phase, self.uuid, 'file-copy'):
+            self.copyFilesToDockerContainer()
+
+        with profiler.phase(phase, self.uuid, 'container-start'):
+            self.startDockerContainer()
         if self.emEnv.registerToOdl == True:
            # registerNeToOdl(self.emEnv.controllerInfo, self.uuid, self.managementIPAddressString)
-           for controller in self.emEnv.controllerList:
-               try:
-                    registerNeToOdlNewVersion(controller, self.uuid, self.managementIPAddressString,
-                                         self.netconfPortNumber)
-                    break
-               except:
-                    print("Failed to register NE=%s having IP=%s and port=%s to the ODL controller having IP=%s" %
-                         (self.uuid, self.managementIPAddressString, self.netconfPortNumber, controller['ip-address']))
-                    continue
-
-        self.saveNetworkNamespace()
-
-        #debug
-        self.xmlConfigurationTree.write('output-config-' + self.dockerName + '.xml')
-        self.xmlStatusTree.write('output-status-' + self.dockerName + '.xml')
+           self.emEnv.registerNetworkElementWhenReady(self)
+
+        with profiler.phase(phase, self.uuid, 'namespace-lookup'):
+            self.saveNetworkNamespace()
+
+        if self.emEnv.writeDebugXmlFiles is True:
+            self.writeXmlDebugFiles()
 
     def addInterfacesInDockerContainer(self):
 
@@ -717,7 +607,8 @@ class NetworkElement:
                 "Adding ETY interface %s to docker container %s..." %
                 (interfaceObj.getInterfaceName(), self.uuid))
 
-            command = "ip link add name %s type dummy" % interfaceObj.getInterfaceName()
+            command = "ip link add name %s address %s type dummy" % (interfaceObj.getInterfaceName(),
+                                                                     interfaceObj.getMacAddress())
             self.executeCommandInContainer(command)
 
             command = "ip link set dev %s up" % interfaceObj.getInterfaceName()
@@ -757,7 +648,8 @@ class NetworkElement:
                 "Adding dummy interface %s to docker container %s..." %
                 (interfaceObj.getInterfaceName(), self.uuid))
 
-            command = "ip link add name %s type dummy" % interfaceObj.getInterfaceName()
+            command = "ip link add name %s address %s type dummy" % (interfaceObj.getInterfaceName(),
+                                                                     interfaceObj.getMacAddress())
             self.executeCommandInContainer(command)
 
             # command = "ip address add %s/30 dev %s" % (interfaceObj.getIpAddress(), interfaceObj.getInterfaceName())
@@ -769,21 +661,19 @@ class NetworkElement:
     def executeCommandInContainer(self, command):
         if command == '' or command is None:
             return
-        stringCmd = "docker exec -it %s %s" % (self.dockerName, command)
-        cmd = subprocess.Popen(stringCmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        exitCode, stdout, stderr = getDockerClient().execInContainer(self.dockerName, ['/bin/sh', '-c', command])
 
-        for line in cmd.stderr:
+        for line in stderr.decode("utf-8").splitlines():
             logger.critical("Failed executing command %s", command)
-            strLine = line.decode("utf-8").rstrip('\n')
-            logger.critical("Stderr: %s", strLine)
+            logger.critical("Stderr: %s", line)
             raise RuntimeError
-        for line in cmd.stdout:
-            print(line.decode("utf-8").rstrip('\n'))
+        for line in stdout.decode("utf-8").splitlines():
+            print(line)
 
     def getCpuUsage(self, interval, index, results):
         cpu_percent = 0.0
         for i in range(0, interval):
-            cmd = "ps -g `docker inspect -f '{{.State.Pid}}' %s` --no-headers -o \"pcpu\"" % self.dockerName
+            cmd = "ps -g %s --no-headers -o \"pcpu\"" % self.networkNamespace
             output = self.emEnv.executeCommandAndGetResultInOS(cmd)
             for line in output:
                 cpu_percent += float(line)
@@ -792,6 +682,7 @@ class NetworkElement:
         results[index] = cpu_percent
 
     def addInterfacesInDockerContainerToScript(self):
+        # the script is copied in the container together with the XML files, before the container is started
 
         for intf in self.interfaceList:
             if intf.layer == 'MWPS':
@@ -807,9 +698,6 @@ class NetworkElement:
         for xconn in self.ethCrossConnectList:
             xconn.addXConnToScript()
 
-        self.copyInterfaceScriptToDockerContainer()
-        self.runInterfaceScriptInDockerContainer()
-
     def addMwsInterfaceToScript(self, interfaceObj):
         command = "ip link add name %s type bond\n" % interfaceObj.getInterfaceName()
         self.scriptIntf.write(command)
@@ -860,7 +748,8 @@ class NetworkElement:
         if self.emEnv.isInterfaceObjPartOfLink(interfaceObj) is True:
             pass
         else:
-            command = "ip link add name %s type dummy\n" % interfaceObj.getInterfaceName()
+            command = "ip link add name %s address %s type dummy\n" % (interfaceObj.getInterfaceName(),
+                                                                       interfaceObj.getMacAddress())
             self.scriptIntf.write(command)
 
             command = "ip link set dev %s up\n" % interfaceObj.getInterfaceName()
@@ -890,7 +779,8 @@ class NetworkElement:
         if self.emEnv.isInterfaceObjPartOfLink(interfaceObj) is True:
             pass
         else:
-            command = "ip link add name %s type dummy\n" % interfaceObj.getInterfaceName()
+            command = "ip link add name %s address %s type dummy\n" % (interfaceObj.getInterfaceName(),
+                                                                       interfaceObj.getMacAddress())
             self.scriptIntf.write(command)
 
             # command = "ip address add %s/30 dev %s" % (interfaceObj.getIpAddress(), interfaceObj.getInterfaceName())
@@ -904,24 +794,32 @@ class NetworkElement:
         command = "tc class add dev %s parent 5:0 classid 5:1 hfsc sc rate 100Mbit ul rate 100Mbit\n" % interfaceObj.getInterfaceName()
         self.scriptIntf.write(command)
 
-    def copyInterfaceScriptToDockerContainer(self):
-        outFileName = "buildIntf.sh"
-
-        f = open(outFileName, 'w+')
-        f.write(self.scriptIntf.getvalue())
-        f.close()
-
-        targetPath = "/usr/src/OpenYuma"
-
-        os.chmod('./buildIntf.sh', 777)
-
-        stringCmd = "docker cp %s %s:%s" % \
-                    (outFileName, self.dockerName, targetPath)
-        self.emEnv.executeCommandInOS(stringCmd)
-
-        stringCmd = "rm -f %s" % (outFileName)
-        self.emEnv.executeCommandInOS(stringCmd)
+    def getLinkEndScript(self, interfaceObj):
+        # configures the veth end of a link added to the running container, as the interface script did for the end
+        # it replaces: its queue, the bonds it is a slave of, the VLAN interfaces on top of it and their bridges
+        interfaceName = interfaceObj.getInterfaceName()
+        rate = '100Mbit' if interfaceObj.layer == 'MWPS' else '10Gbit'
+        commands = ["tc qdisc add dev %s root handle 5:0 hfsc default 1" % interfaceName,
+                    "tc class add dev %s parent 5:0 classid 5:1 hfsc sc rate %s ul rate %s" %
+                    (interfaceName, rate, rate)]
+        for intf in self.interfaceList:
+            if intf.layer == 'MWS' and interfaceObj.uuid in intf.serverLtpsList or \
+                    intf.layer == 'ETC' and interfaceObj.uuid in intf.serverLtps:
+                commands.append("ip link set %s down" % interfaceName)
+                commands.append("ip link set %s master %s" % (interfaceName, intf.getInterfaceName()))
+            elif intf.layer == 'ETH' and intf.serverLtpsList == [interfaceObj.uuid]:
+                commands.append("ip link add name %s link %s type vlan id 0" % (intf.getInterfaceName(), interfaceName))
+                commands.append("ip link set dev %s up" % intf.getInterfaceName())
+                for xconn in self.ethCrossConnectList:
+                    if intf in xconn.interfacesObj:
+                        commands.append("ip link set dev %s master xc_br%d" % (intf.getInterfaceName(), xconn.id))
+        return '\n'.join(commands) + '\n'
+
+    def addLinkEndInDockerContainer(self, interfaceObj):
+        print("Configuring interface %s of docker container %s..." % (interfaceObj.getInterfaceName(), self.uuid))
+        self.executeCommandInContainer(self.getLinkEndScript(interfaceObj))
 
     def runInterfaceScriptInDockerContainer(self):
-        cmd = "/usr/src/OpenYuma/buildIntf.sh"
-        self.executeCommandInContainer(cmd)
\ No newline at end of file
+        cmd = "/" + OPENYUMA_PATH + "/buildIntf.sh"
+        with self.emEnv.profiler.phase('run-interface-scripts', self.uuid, 'interface-script'):
+            self.executeCommandInContainer(cmd)
\ No newline at end of file
@@ -1,10 +1,100 @@
 import requests, json
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+import hashlib
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+
+from wireless_emulator.journal import ODL_MOUNT
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# number of keep-alive connections kept to each controller, and of requests sent in parallel by the bulk operations
+ODL_CONNECTIONS = 8
+
+# what createNewXmlPayloadForOdl builds, rendered with str.format instead of building an ElementTree for each NE
+ODL_NODE_PAYLOAD = ('<node xmlns="urn:TBD:params:xml:ns:yang:network-topology">'
+                    '<node-id>{uuid}</node-id>'
+                    '<host xmlns="urn:opendaylight:netconf-node-topology">{host}</host>'
+                    '<port xmlns="urn:opendaylight:netconf-node-topology">{port}</port>'
+                    '<username xmlns="urn:opendaylight:netconf-node-topology">admin</username>'
+                    '<password xmlns="urn:opendaylight:netconf-node-topology">admin</password>'
+                    '<tcp-only xmlns="urn:opendaylight:netconf-node-topology">false</tcp-only>'
+                    '<keepalive-delay xmlns="urn:opendaylight:netconf-node-topology">120</keepalive-delay>'
+                    '</node>')
+
+# how the NEs are spread over the controllers, the "controllerPlacement" of config.json
+ROUND_ROBIN_PLACEMENT = 'round-robin'
+HASH_PLACEMENT = 'hash'
+WEIGHTED_PLACEMENT = 'weighted'
+CONTROLLER_PLACEMENTS = (ROUND_ROBIN_PLACEMENT, HASH_PLACEMENT, WEIGHTED_PLACEMENT)
+
+# a controller which failed a request is only tried after the others during this time
+CONTROLLER_RETRY_SECONDS = 30
+# the controllers holding mounts are probed this often, the NEs of a controller which does not answer are mounted
+# on another one; and the probe gives up after the timeout
+CONTROLLER_HEALTH_CHECK_INTERVAL = 10
+CONTROLLER_HEALTH_CHECK_TIMEOUT = 5
+
+ODL_TOPOLOGY_URL = 'http://{}:{}/restconf/config/network-topology:network-topology/topology/topology-netconf'
+ODL_NODE_URL = ODL_TOPOLOGY_URL + '/node/{}'
+
+ODL_HEADERS = {
+    'content-type': "application/xml",
+    'cache-control': "no-cache"
+}
+
+def renderOdlNodePayload(neUuid, neManagementIp, nePort):
+    return ODL_NODE_PAYLOAD.format(uuid=escape(str(neUuid)), host=escape(str(neManagementIp)),
+                                   port=escape(str(nePort))).encode('utf-8')
+
+class OdlClient:
+    """RESTCONF client of one ODL controller, keeping a pool of keep-alive connections shared by the threads."""
+
+    def __init__(self, controllerInfo, connections=ODL_CONNECTIONS):
+        self.controllerInfo = controllerInfo
+        self.session = requests.Session()
+        self.session.auth = (controllerInfo['username'], controllerInfo['password'])
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+        self.session.mount('http://', adapter)
+
+    def getNodeUrl(self, neUuid):
+        return ODL_NODE_URL.format(self.controllerInfo['ip-address'], self.controllerInfo['port'], neUuid)
+
+    def mountNetworkElement(self, neUuid, neManagementIp, nePort):
+        return self.session.put(self.getNodeUrl(neUuid), data=renderOdlNodePayload(neUuid, neManagementIp, nePort),
+                                headers=ODL_HEADERS)
+
+    def unmountNetworkElement(self, neUuid):
+        return self.session.delete(self.getNodeUrl(neUuid), headers=ODL_HEADERS)
+
+    def getTopology(self, timeout=CONTROLLER_HEALTH_CHECK_TIMEOUT):
+        return self.session.get(ODL_TOPOLOGY_URL.format(self.controllerInfo['ip-address'], self.controllerInfo['port']),
+                                headers=ODL_HEADERS, timeout=timeout)
+
+_odlClients = {}
+_odlClientsLock = threading.Lock()
+
+def getOdlClient(controllerInfo):
+    key = (controllerInfo['ip-address'], controllerInfo['port'], controllerInfo['username'],
+           controllerInfo['password'])
+    with _odlClientsLock:
+        if key not in _odlClients:
+            _odlClients[key] = OdlClient(controllerInfo)
+        return _odlClients[key]
+
+def logOdlError(response):
+    if response.text:
+        try:
+            logger.error(json.dumps(json.loads(response.text), indent=4))
+        except ValueError:
+            logger.error(response.text)
+
 def registerNeToOdl(controllerInfo, neUuid, neManagementIp):
 
     print("Registering NE=%s having IP=%s to ODL controller" % (neUuid, neManagementIp))
@@ -143,54 +233,251 @@ def registerNeToOdlNewVersion(controllerInfo, neUuid, neManagementIp, nePort):
     print("Registering NE=%s having IP=%s and port=%s to ODL controller having IP=%s" %
           (neUuid, neManagementIp, nePort, controllerInfo['ip-address']))
 
-    xmlTree = createNewXmlPayloadForOdl(neUuid, neManagementIp, nePort)
-
-    root = xmlTree.getroot()
-
-    url = 'http://{}:{}/restconf/config/network-topology:network-topology/topology/topology-netconf/node/{}'.format(
-        controllerInfo['ip-address'], controllerInfo['port'], neUuid)
-    headers = {
-        'content-type': "application/xml",
-        'cache-control': "no-cache"
-    }
-
-    payload = ET.tostring(root)
-
-    #debug
-    xmlTree.write("odlNewRegistration.xml")
-
-    response = requests.request("PUT", url, data=payload, headers=headers, auth=(controllerInfo['username'], controllerInfo['password']))
+    response = getOdlClient(controllerInfo).mountNetworkElement(neUuid, neManagementIp, nePort)
 
     if response.status_code in range(200, 208):
         print("Successfully registered NE=%s to ODL controller" % neUuid)
         logger.info("Successfully registered NE=%s to ODL controller", neUuid)
     else:
         logger.error("Could not register NE=%s to ODL controller", neUuid)
-        if response.text is not None:
-            logger.error(json.dumps(json.loads(response.text), indent=4))
+        logOdlError(response)
         raise RuntimeError
 
 def unregisterNeFromOdlNewVersion(controllerInfo, neUuid):
 
     print("Unregistering NE=%s from ODL controller having IP=%s" % (neUuid, controllerInfo['ip-address']))
 
-    url = "http://{}:{}/restconf/config/network-topology:network-topology/topology/topology-netconf/node/" \
-          "{}".format(controllerInfo['ip-address'], controllerInfo['port'], neUuid)
-    headers = {
-        'content-type': "application/xml",
-        'cache-control': "no-cache"
-    }
-    response = requests.request("DELETE", url, headers=headers, auth=(controllerInfo['username'], controllerInfo['password']))
+    response = getOdlClient(controllerInfo).unmountNetworkElement(neUuid)
 
+    if response.status_code == 404:
+        # e.g. unmounted by an earlier cleanup
+        logger.info("NE=%s is not mounted on ODL controller having IP=%s", neUuid, controllerInfo['ip-address'])
+        return False
     if response.status_code in range(200, 208):
         print("Successfully unregistered NE=%s from ODL controller having IP=%s" % (neUuid, controllerInfo['ip-address']))
         logger.info("Successfully unregistered NE=%s from ODL controller having IP=%s", neUuid, controllerInfo['ip-address'])
     else:
         logger.error("Could not unregister NE=%s from ODL controller having IP=%s", neUuid, controllerInfo['ip-address'])
-        if response.text is not None:
-            logger.error(json.dumps(json.loads(response.text), indent=4))
+        logOdlError(response)
         raise RuntimeError
 
+def getControllerName(controllerInfo):
+    return "%s:%s" % (controllerInfo['ip-address'], controllerInfo['port'])
+
+def getRendezvousScore(controllerInfo, neUuid, weight=1):
+    # weighted rendezvous hashing: each NE goes to the controller with the highest score, and only the NEs of a
+    # controller which is removed or fails move to another one
+    digest = hashlib.sha1(("%s/%s" % (getControllerName(controllerInfo), neUuid)).encode('utf-8')).digest()
+    value = (int.from_bytes(digest[:8], 'big') + 1) / float(2 ** 64 + 2)
+    return -weight / math.log(value)
+
+def isControllerUp(controllerInfo):
+    # the topology is missing until the first NE is mounted, any other error status means the controller is down
+    try:
+        response = getOdlClient(controllerInfo).getTopology()
+    except OSError as err:
+        logger.error("ODL controller %s does not answer: %s", getControllerName(controllerInfo), err)
+        return False
+    if response.status_code in range(200, 208) or response.status_code == 404:
+        return True
+    logger.error("ODL controller %s answered the health check with status %d", getControllerName(controllerInfo),
+                 response.status_code)
+    return False
+
+class ControllerBalancer:
+    """Spreads the NE mounts over the ODL controllers and keeps the mount count and latencies of each controller.
+
+    An NE is mounted on the first controller of its placement order accepting it; the controllers which failed in
+    the last CONTROLLER_RETRY_SECONDS come last in the order of every NE. Once started, the controllers holding
+    mounts are checked in a background thread, and the NEs of a controller which does not answer are mounted on the
+    next controller of their order.
+    """
+
+    def __init__(self, controllerList, placement=HASH_PLACEMENT, journal=None):
+        if placement not in CONTROLLER_PLACEMENTS:
+            raise ValueError("Invalid controller placement %s" % placement)
+        self.controllerList = controllerList
+        self.placement = placement
+        self.journal = journal
+        self.lock = threading.Lock()
+        self.nextController = 0
+        self.failedAt = {}
+        # uuid of the NE -> index of the controller it is mounted on, and its management IP and NETCONF port
+        self.mounts = {}
+        self.nodes = {}
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.statistics = [{'requests': 0, 'failures': 0, 'seconds': 0.0, 'maxSeconds': 0.0}
+                           for controller in controllerList]
+
+    def getControllerOrder(self, neUuid):
+        indexes = list(range(len(self.controllerList)))
+        if self.placement == ROUND_ROBIN_PLACEMENT:
+            with self.lock:
+                first = self.nextController
+                self.nextController = (self.nextController + 1) % max(1, len(indexes))
+            indexes = indexes[first:] + indexes[:first]
+        else:
+            weights = [1] * len(indexes)
+            if self.placement == WEIGHTED_PLACEMENT:
+                weights = [controller.get('weight', 1) for controller in self.controllerList]
+            indexes.sort(key=lambda index: getRendezvousScore(self.controllerList[index], neUuid, weights[index]),
+                         reverse=True)
+
+        now = time.monotonic()
+        with self.lock:
+            failedIndexes = set(index for index, failedAt in self.failedAt.items()
+                                if now - failedAt < CONTROLLER_RETRY_SECONDS)
+        # sort is stable, the placement order is kept among the available controllers and among the failed ones
+        return sorted(indexes, key=lambda index: index in failedIndexes)
+
+    def addRequest(self, index, seconds, failed):
+        with self.lock:
+            statistics = self.statistics[index]
+            statistics['requests'] += 1
+            statistics['seconds'] += seconds
+            statistics['maxSeconds'] = max(statistics['maxSeconds'], seconds)
+            if failed is True:
+                statistics['failures'] += 1
+                self.failedAt[index] = time.monotonic()
+            else:
+                self.failedAt.pop(index, None)
+
+    def registerNetworkElement(self, neUuid, neManagementIp, nePort):
+        for index in self.getControllerOrder(neUuid):
+            controller = self.controllerList[index]
+            if self.journal is not None:
+                self.journal.record(ODL_MOUNT, neUuid, controller=controller['ip-address'], port=controller['port'])
+            start = timer()
+            try:
+                registerNeToOdlNewVersion(controller, neUuid, neManagementIp, nePort)
+            except (RuntimeError, OSError):
+                self.addRequest(index, timer() - start, True)
+                print("Failed to register NE=%s having IP=%s and port=%s to the ODL controller having IP=%s" %
+                      (neUuid, neManagementIp, nePort, controller['ip-address']))
+                continue
+            self.addRequest(index, timer() - start, False)
+            with self.lock:
+                self.mounts[neUuid] = index
+                self.nodes[neUuid] = (neManagementIp, nePort)
+            return True
+        return False
+
+    def unregisterNetworkElement(self, neUuid):
+        # the controller the NE was mounted on is tried first
+        indexes = self.getControllerOrder(neUuid)
+        with self.lock:
+            mountedIndex = self.mounts.get(neUuid)
+        if mountedIndex is not None:
+            indexes.remove(mountedIndex)
+            indexes.insert(0, mountedIndex)
+
+        # a controller answering 404 does not have the NE, which may be mounted on the next one
+        notMounted = 0
+        for index in indexes:
+            controller = self.controllerList[index]
+            try:
+                if unregisterNeFromOdlNewVersion(controller, neUuid) is False:
+                    notMounted += 1
+                    continue
+            except (RuntimeError, OSError):
+                print("Failed to unregister NE=%s from the ODL controller having IP=%s" %
+                      (neUuid, controller['ip-address']))
+                continue
+            with self.lock:
+                self.mounts.pop(neUuid, None)
+                self.nodes.pop(neUuid, None)
+            return True
+        if notMounted == len(indexes):
+            with self.lock:
+                self.mounts.pop(neUuid, None)
+                self.nodes.pop(neUuid, None)
+        return False
+
+    def start(self, interval=CONTROLLER_HEALTH_CHECK_INTERVAL):
+        if interval <= 0 or self.thread is not None:
+            return
+        logger.debug("Checking the ODL controllers every %.1f seconds", interval)
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.run, args=(interval,), name='controller-health-check', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stopEvent.set()
+        self.thread.join()
+        self.thread = None
+
+    def run(self, interval):
+        while not self.stopEvent.wait(interval):
+            self.checkControllers()
+
+    def checkControllers(self):
+        """Mounts the NEs of the controllers which do not answer on the next controller of their order.
+
+        Returns the uuids of the NEs which were moved; the NEs which no controller accepted stay on their controller,
+        and are moved by a later check.
+        """
+        with self.lock:
+            mountedIndexes = sorted(set(self.mounts.values()))
+        moved = []
+        for index in mountedIndexes:
+            controller = self.controllerList[index]
+            if isControllerUp(controller) is True:
+                continue
+            with self.lock:
+                self.failedAt[index] = time.monotonic()
+                nodes = [(neUuid, ) + self.nodes[neUuid] for neUuid, mountedIndex in self.mounts.items()
+                         if mountedIndex == index]
+            print("ODL controller %s does not answer, mounting its %d NEs on the other controllers" %
+                  (getControllerName(controller), len(nodes)))
+            failed = registerNesToOdl(self, nodes)
+            moved.extend(neUuid for neUuid, neManagementIp, nePort in nodes
+                         if neUuid not in failed and self.mounts.get(neUuid) != index)
+        return moved
+
+    def getMounts(self):
+        # uuid of the NE -> name of the controller it is mounted on
+        with self.lock:
+            return {neUuid: getControllerName(self.controllerList[index]) for neUuid, index in self.mounts.items()}
+
+    def getStatistics(self):
+        with self.lock:
+            mountCounts = [0] * len(self.controllerList)
+            for index in self.mounts.values():
+                mountCounts[index] += 1
+            result = []
+            for index, controller in enumerate(self.controllerList):
+                statistics = self.statistics[index]
+                averageSeconds = 0.0
+                if statistics['requests'] > 0:
+                    averageSeconds = statistics['seconds'] / statistics['requests']
+                result.append({'controller': getControllerName(controller), 'mounts': mountCounts[index],
+                               'requests': statistics['requests'], 'failures': statistics['failures'],
+                               'seconds': statistics['seconds'], 'averageSeconds': averageSeconds,
+                               'maxSeconds': statistics['maxSeconds']})
+            return result
+
+    def printStatistics(self):
+        print("%-24s %8s %9s %9s %12s %12s" % ("controller", "mounts", "requests", "failures", "average [s]", "max [s]"))
+        for statistics in self.getStatistics():
+            print("%-24s %8d %9d %9d %12.4f %12.4f" %
+                  (statistics['controller'], statistics['mounts'], statistics['requests'], statistics['failures'],
+                   statistics['averageSeconds'], statistics['maxSeconds']))
+
+def registerNesToOdl(balancer, nodes, workers=ODL_CONNECTIONS):
+    """Registers the (uuid, management IP, NETCONF port) nodes in parallel, returns the uuids which failed."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(lambda node: balancer.registerNetworkElement(*node), nodes))
+    return [node[0] for node, result in zip(nodes, results) if result is False]
+
+def unregisterNesFromOdlInParallel(balancer, neUuids, workers=ODL_CONNECTIONS):
+    """Unregisters the NEs in parallel, returns the uuids which failed."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(balancer.unregisterNetworkElement, neUuids))
+    return [neUuid for neUuid, result in zip(neUuids, results) if result is False]
+
 def createNewXmlPayloadForOdl(neUuid, neManagementIp, nePort):
     netconfNs = "urn:opendaylight:netconf-node-topology"
 
@@ -0,0 +1,59 @@
+import datetime
+
+HISTORY_15_MINUTES_RECORDS = 96
+HISTORY_24_HOURS_RECORDS = 7
+
+# children of a historical-performance-data-list record which are different in every record
+HISTORY_RECORD_FIELDS = ['history-data-id', 'granularity-period', 'suspect-interval-flag', 'period-end-time']
+
+def formatTimestamp(timestamp):
+    return timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"
+
+def getHistoricalPerformancesValues(timeNow=None):
+    # the values of the 96 15-minutes and 7 24-hours records, all computed from the same timestamp
+    if timeNow is None:
+        timeNow = datetime.datetime.utcnow()
+
+    values = []
+    for i in range(0, HISTORY_15_MINUTES_RECORDS):
+        values.append({'history-data-id': str(i),
+                       'granularity-period': "period-15-min",
+                       'suspect-interval-flag': "false",
+                       'period-end-time': formatTimestamp(timeNow - datetime.timedelta(minutes=15*i))})
+    for i in range(0, HISTORY_24_HOURS_RECORDS):
+        values.append({'history-data-id': str(i + HISTORY_15_MINUTES_RECORDS),
+                       'granularity-period': "period-24-hours",
+                       'suspect-interval-flag': "false",
+                       'period-end-time': formatTimestamp(timeNow - datetime.timedelta(days=1*i))})
+    return values
+
+def getPerformanceTimestamps(timeNow):
+    # all the timestamps written in the performance XML values from timeNow, the current performances use timeNow
+    timestamps = [formatTimestamp(timeNow)]
+    for values in getHistoricalPerformancesValues(timeNow):
+        timestamps.append(values['period-end-time'])
+    return timestamps
+
+def addHistoricalPerformancesRecords(parentNode, timeNow=None):
+    """Replaces the historical-performance-data-list template child of parentNode with the 103 records.
+
+    The records are new elements only for the top node and for the fields that differ between them, the other
+    children of the template (the performance-data counters) are the same elements in all the records. The
+    resulting XML must therefore only be serialized, not modified in place.
+    """
+    templateNode = parentNode.find('historical-performance-data-list')
+    parentNode.remove(templateNode)
+
+    for values in getHistoricalPerformancesValues(timeNow):
+        record = templateNode.makeelement(templateNode.tag, templateNode.attrib)
+        record.text = templateNode.text
+        record.tail = templateNode.tail
+        for child in templateNode:
+            if child.tag in values:
+                field = child.makeelement(child.tag, child.attrib)
+                field.text = values[child.tag]
+                field.tail = child.tail
+                record.append(field)
+            else:
+                record.append(child)
+        parentNode.append(record)
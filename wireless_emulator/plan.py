@@ -0,0 +1,251 @@
+import json
+import logging
+import os
+
+from wireless_emulator.xmlcache import getFileDigest
+from wireless_emulator.topology import LINK_LAYERS
+
+logger = logging.getLogger(__name__)
+
+# changed when the format of the plan files changes
+PLAN_VERSION = 1
+
+# the minimum number of supported alarms of the interfaces of each layer
+INTERFACE_LAYERS = {'MWPS': 6, 'MWS': 1, 'ETC': 2, 'ETY': 0, 'ETH': 0}
+# the string keys the interfaces of each layer read from their LTPs, besides the id, and whether they have server LTPs
+LTP_STRING_KEYS = {'MWPS': ['supportedAlarms', 'physical-port-reference', 'conditional-package'],
+                   'MWS': ['supportedAlarms', 'conditional-package'],
+                   'ETC': ['supportedAlarms', 'conditional-package'],
+                   'ETY': ['physical-port-reference'],
+                   'ETH': ['conditional-package']}
+SERVER_LTP_LAYERS = ['MWS', 'ETC', 'ETH']
+
+def validateTopology(topoJson):
+    """Returns the errors of the JSON topology, which would otherwise only be found while it is started.
+
+    The NEs and their LTPs are indexed in one pass, the server LTPs, the links and the cross connections are then
+    checked against the index, so all the errors are found at once and in a time linear in the size of the topology.
+    """
+    errors = []
+    if not isinstance(topoJson, dict):
+        return ["The topology is not a JSON object"]
+    # (NE uuid, LTP uuid) -> layer
+    ltpLayers = {}
+    neUuids = set()
+    nes = topoJson.get('network-elements', [])
+    if not isinstance(nes, list):
+        errors.append("The network-elements of the topology are not a list")
+        nes = []
+    for ne in nes:
+        neJson = ne.get('network-element') if isinstance(ne, dict) else None
+        if not isinstance(neJson, dict):
+            errors.append("A network element has no network-element object")
+            continue
+        neUuid = neJson.get('uuid')
+        if neUuid is None:
+            errors.append("A network element has no uuid")
+            continue
+        if not isinstance(neUuid, str):
+            errors.append("A network element has a uuid which is not a string: %s" % (neUuid,))
+            continue
+        if neUuid in neUuids:
+            errors.append("NE=%s is defined more than once" % neUuid)
+            continue
+        neUuids.add(neUuid)
+
+        interfaces = neJson.get('interfaces', [])
+        if not isinstance(interfaces, list):
+            errors.append("NE=%s has interfaces which are not a list" % neUuid)
+            interfaces = []
+        # (LTP uuid, server LTP uuid) of the NE, checked once all its LTPs are indexed
+        serverLtps = []
+        for intf in interfaces:
+            if not isinstance(intf, dict):
+                errors.append("NE=%s has an interface which is not an object: %s" % (neUuid, intf))
+                continue
+            layer = intf.get('layer')
+            if not isinstance(layer, str) or layer not in INTERFACE_LAYERS:
+                errors.append("NE=%s has interfaces of the illegal layer %s" % (neUuid, layer))
+                continue
+            ports = intf.get('LTPs', [])
+            if not isinstance(ports, list):
+                errors.append("NE=%s has %s LTPs which are not a list" % (neUuid, layer))
+                continue
+            for port in ports:
+                if not isinstance(port, dict) or not isinstance(port.get('id'), str):
+                    errors.append("NE=%s has a %s LTP which is not an object with a string id: %s" %
+                                  (neUuid, layer, port))
+                    continue
+                if (neUuid, port['id']) in ltpLayers:
+                    errors.append("LTP=%s of NE=%s is defined more than once" % (port['id'], neUuid))
+                    continue
+                ltpLayers[(neUuid, port['id'])] = layer
+                for key in LTP_STRING_KEYS[layer]:
+                    if key not in port:
+                        errors.append("%s LTP=%s of NE=%s has no %s" % (layer, port['id'], neUuid, key))
+                    elif not isinstance(port[key], str):
+                        errors.append("LTP=%s of NE=%s has %s which is not a string: %s" %
+                                      (port['id'], neUuid, key, port[key]))
+                if layer in SERVER_LTP_LAYERS:
+                    servers = port.get('serverLTPs')
+                    if not isinstance(servers, list):
+                        errors.append("%s LTP=%s of NE=%s has no serverLTPs list" % (layer, port['id'], neUuid))
+                        servers = []
+                    for server in servers:
+                        if not isinstance(server, dict) or not isinstance(server.get('id'), str):
+                            errors.append("LTP=%s of NE=%s has a server LTP which is not an object with a string id: "
+                                          "%s" % (port['id'], neUuid, server))
+                            continue
+                        serverLtps.append((port['id'], server['id']))
+                supportedAlarms = port.get('supportedAlarms', '')
+                if not isinstance(supportedAlarms, str):
+                    continue
+                if len(supportedAlarms.split(',')) < INTERFACE_LAYERS[layer]:
+                    errors.append("LTP=%s of NE=%s does not supply at least %d supported alarms" %
+                                  (port['id'], neUuid, INTERFACE_LAYERS[layer]))
+
+        for ltp, serverLtp in serverLtps:
+            if (neUuid, serverLtp) not in ltpLayers:
+                errors.append("The server LTP=%s of LTP=%s of NE=%s is not an LTP of the NE" % (serverLtp, ltp, neUuid))
+
+        xconns = neJson.get('eth-cross-connections', [])
+        if not isinstance(xconns, list):
+            errors.append("NE=%s has eth-cross-connections which are not a list" % neUuid)
+            xconns = []
+        for xconn in xconns:
+            fcPorts = xconn.get('fcPorts') if isinstance(xconn, dict) else None
+            if not isinstance(fcPorts, list) or len(fcPorts) != 2:
+                errors.append("An ethernet cross connection of NE=%s does not contain exactly two interfaces" %
+                              neUuid)
+                continue
+            for fcPort in fcPorts:
+                ltp = fcPort.get('ltp') if isinstance(fcPort, dict) else fcPort
+                if not isinstance(ltp, str) or ltpLayers.get((neUuid, ltp)) != 'ETH':
+                    errors.append("Interface=%s of an ethernet cross connection of NE=%s is not an ETH interface "
+                                  "of the NE" % (ltp, neUuid))
+
+    topologies = topoJson.get('topologies', {})
+    if not isinstance(topologies, dict):
+        errors.append("The topologies of the topology are not an object")
+        topologies = {}
+    linkedLtps = set()
+    for layer in LINK_LAYERS:
+        if layer not in topologies:
+            errors.append("The topology has no %s links" % layer)
+            continue
+        links = topologies[layer].get('links', []) if isinstance(topologies[layer], dict) else None
+        if not isinstance(links, list):
+            errors.append("The %s links of the topology are not a list" % layer)
+            continue
+        for link in links:
+            if not isinstance(link, list) or len(link) != 2 or \
+                    not all(isinstance(linkEnd, dict) for linkEnd in link):
+                errors.append("A %s link does not contain exactly two interfaces: %s" % (layer, link))
+                continue
+            for linkEnd in link:
+                ltp = (linkEnd.get('uuid'), linkEnd.get('ltp'))
+                if not all(isinstance(key, str) for key in ltp) or ltp not in ltpLayers:
+                    errors.append("The %s link end NE=%s interface=%s is not an interface of the topology" %
+                                  (layer, ltp[0], ltp[1]))
+                    continue
+                if ltp in linkedLtps:
+                    errors.append("Interface=%s of NE=%s is the end of more than one link" % (ltp[1], ltp[0]))
+                linkedLtps.add(ltp)
+    return errors
+
+def getNetworkElementPlan(neObj):
+    networkElement = {'uuid': neObj.uuid,
+                      'id': neObj.id,
+                      'type': neObj.dockerType,
+                      'dockerName': neObj.dockerName,
+                      'managementNetwork': neObj.networkIPAddress.with_prefixlen,
+                      'managementIp': neObj.managementIPAddressString,
+                      'netconfPort': neObj.netconfPortNumber,
+                      'sshPort': neObj.sshPortNumber,
+                      'dockerNetwork': None,
+                      'xmlCacheKey': getattr(neObj, 'xmlCacheKey', None),
+                      'interfaces': [],
+                      'interfaceScript': None}
+    if neObj.emEnv.portBasedEmulation is not True:
+        networkElement['dockerNetwork'] = neObj.networkName
+    for intf in neObj.interfaceList:
+        interface = {'uuid': intf.getInterfaceUuid(), 'name': intf.getInterfaceName(), 'layer': intf.layer}
+        if intf.layer == 'ETH':
+            interface['vlanId'] = intf.vlanId
+        networkElement['interfaces'].append(interface)
+    if hasattr(neObj, 'scriptIntf'):
+        networkElement['interfaceScript'] = neObj.scriptIntf.getvalue()
+    return networkElement
+
+def buildPlan(emulator):
+    """The NEs and the links of the compiled topology of the emulator, with everything resolved: NE ids,
+    addresses, ports, interface names, VLANs, link ends and interface scripts, and the leases giving them."""
+    plan = {'version': PLAN_VERSION,
+            'files': {'topology': os.path.abspath(emulator.topologyFileName),
+                      'topologyDigest': getFileDigest(emulator.topologyFileName),
+                      'xml': os.path.abspath(emulator.xmlConfigFile),
+                      'xmlDigest': getFileDigest(emulator.xmlConfigFile),
+                      'xmlStatusDigest': getFileDigest(emulator.xmlStatusFile)},
+            'networkElements': [getNetworkElementPlan(neObj) for neObj in emulator.networkElementList],
+            'links': [],
+            'leases': []}
+    for topo in emulator.topologies:
+        for linkObj in topo.linkList:
+            plan['links'].append({'layer': topo.topologyLayer,
+                                  'name': linkObj.getJournalName(),
+                                  'ends': [{'ne': intf.neObj.uuid, 'interface': intf.getInterfaceName()}
+                                           for intf in linkObj.interfacesObj]})
+
+    # only the leases of the NEs of the plan, their keys start with the NE uuid
+    neUuids = set(neObj.uuid for neObj in emulator.networkElementList)
+    for leaseType, key, value in sorted(emulator.leaseStore.getLeases(), key=lambda lease: lease[0:2]):
+        if key.split('/')[0] in neUuids:
+            plan['leases'].append({'type': leaseType, 'key': key, 'value': value})
+    return plan
+
+def writePlan(plan, fileName):
+    with open(fileName, 'w') as f:
+        json.dump(plan, f, indent=1, sort_keys=True)
+        f.write('\n')
+    logger.info("Wrote the plan of %d NEs and %d links to %s", len(plan['networkElements']), len(plan['links']),
+                fileName)
+
+def loadPlan(fileName):
+    try:
+        with open(fileName) as f:
+            plan = json.load(f)
+    except (IOError, ValueError) as err:
+        raise ValueError("Could not read the plan %s: %s" % (fileName, err))
+    if plan.get('version') != PLAN_VERSION:
+        raise ValueError("The plan %s was written by another version of the emulator" % fileName)
+    return plan
+
+def getPlanDifferences(plan, compiledPlan):
+    """Returns what the compiled topology would do differently than the plan, empty when it follows it."""
+    differences = []
+    for name in ['topologyDigest', 'xmlDigest', 'xmlStatusDigest']:
+        if plan['files'][name] != compiledPlan['files'][name]:
+            differences.append("%s changed since the plan was written" % name.replace('Digest', ' file'))
+    if differences:
+        return differences
+
+    networkElements = dict((ne['uuid'], ne) for ne in compiledPlan['networkElements'])
+    for ne in plan['networkElements']:
+        compiled = networkElements.pop(ne['uuid'], None)
+        if compiled is None:
+            differences.append("NE=%s is not in the topology" % ne['uuid'])
+            continue
+        for key in sorted(ne):
+            if ne[key] != compiled.get(key):
+                differences.append("NE=%s has another %s: %s instead of %s" % (ne['uuid'], key, compiled.get(key),
+                                                                            ne[key]))
+    for neUuid in networkElements:
+        differences.append("NE=%s is not in the plan" % neUuid)
+
+    links = set(link['name'] for link in compiledPlan['links'])
+    plannedLinks = set(link['name'] for link in plan['links'])
+    for name in sorted(plannedLinks - links):
+        differences.append("Link %s is not in the topology" % name)
+    for name in sorted(links - plannedLinks):
+        differences.append("Link %s is not in the plan" % name)
+    return differences
@@ -0,0 +1,101 @@
+import datetime
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+logger = logging.getLogger(__name__)
+
+class StartupProfiler:
+    """Records the duration of the startup phases, identified by their path, e.g.
+    ('provision-network-elements', 'NE1', 'container-start').
+
+    Phases may be recorded from several threads. The parent of a phase which was not timed itself gets the sum of
+    the durations of its children.
+    """
+
+    def __init__(self, rootName='startup'):
+        self.rootName = rootName
+        self.startTime = datetime.datetime.utcnow()
+        self.durations = {}
+        self.order = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, *path):
+        start = timer()
+        try:
+            yield
+        finally:
+            self.addDuration(path, timer() - start)
+
+    def addDuration(self, path, seconds):
+        path = tuple(str(name) for name in path)
+        with self.lock:
+            if path not in self.durations:
+                self.order.append(path)
+                self.durations[path] = 0.0
+            self.durations[path] += seconds
+
+    def buildTree(self):
+        root = {'name': self.rootName, 'seconds': None, 'children': []}
+        nodes = {(): root}
+        with self.lock:
+            paths = list(self.order)
+            durations = dict(self.durations)
+
+        for path in paths:
+            for i in range(1, len(path) + 1):
+                if path[:i] not in nodes:
+                    node = {'name': path[i - 1], 'seconds': durations.get(path[:i]), 'children': []}
+                    nodes[path[:i - 1]]['children'].append(node)
+                    nodes[path[:i]] = node
+
+        self.fillMissingDurations(root)
+        return root
+
+    def fillMissingDurations(self, node):
+        childrenSeconds = 0.0
+        for child in node['children']:
+            childrenSeconds += self.fillMissingDurations(child)
+        if node['seconds'] is None:
+            node['seconds'] = childrenSeconds
+        return node['seconds']
+
+    def getFoldedLines(self, node=None, stack=None):
+        # one "frame;frame;frame microseconds" line per node, with the time not spent in its children; children
+        # run in parallel may take longer than their parent, their parent then has no time of its own
+        if node is None:
+            node = self.buildTree()
+            stack = []
+        stack = stack + [node['name'].replace(';', '_').replace(' ', '_')]
+
+        lines = []
+        childrenSeconds = 0.0
+        for child in node['children']:
+            childrenSeconds += child['seconds']
+            lines += self.getFoldedLines(child, stack)
+
+        selfMicroseconds = int(round(max(0.0, node['seconds'] - childrenSeconds) * 1000000))
+        if selfMicroseconds > 0:
+            lines.insert(0, "%s %d" % (';'.join(stack), selfMicroseconds))
+        return lines
+
+    def writeReports(self, fileNamePrefix, extraInfo=None):
+        report = {'startTime': self.startTime.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-5] + "Z"}
+        if extraInfo is not None:
+            report.update(extraInfo)
+        report['profile'] = self.buildTree()
+
+        jsonFileName = fileNamePrefix + '.json'
+        with open(jsonFileName, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        foldedFileName = fileNamePrefix + '.folded'
+        with open(foldedFileName, 'w') as f:
+            for line in self.getFoldedLines():
+                f.write(line + '\n')
+
+        logger.info("Startup profile written to %s and %s", jsonFileName, foldedFileName)
+        return jsonFileName, foldedFileName
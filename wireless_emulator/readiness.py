@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+
+logger = logging.getLogger(__name__)
+
+# seconds the NETCONF server of an NE is given to send its banner, before it is registered anyway
+DEFAULT_READY_TIMEOUT = 120
+PROBE_INTERVAL = 0.5
+# upper bounds, in seconds, of the buckets of the time-to-ready histogram
+HISTOGRAM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+class NetconfReadinessProber:
+    """Waits until the NETCONF servers of the NEs send their SSH banner.
+
+    All the NEs are probed by one asyncio event loop, running in a background thread, and the callers get a
+    concurrent.futures.Future. The function given with an NE, e.g. its ODL registration, is run by a pool of
+    workers once the NE is ready. A timeout of 0 disables the probing.
+
+    Accepting the connection is not enough: with port based emulation docker-proxy accepts it before netconfd
+    listens in the container, and then closes it.
+    """
+
+    def __init__(self, timeout=DEFAULT_READY_TIMEOUT, interval=PROBE_INTERVAL, workers=8):
+        self.timeout = timeout
+        self.interval = interval
+        self.workers = workers
+        self.loop = None
+        self.thread = None
+        self.executor = None
+        self.lock = threading.Lock()
+        self.readySeconds = {}
+        self.notReady = []
+
+    def getLoop(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.executor = ThreadPoolExecutor(max_workers=max(1, self.workers))
+                self.thread = threading.Thread(target=self.loop.run_forever, name='netconf-readiness', daemon=True)
+                self.thread.start()
+            return self.loop
+
+    def stop(self):
+        with self.lock:
+            if self.loop is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.executor.shutdown(wait=True)
+            self.loop = None
+            self.thread = None
+            self.executor = None
+
+    async def readBanner(self, host, port, timeout):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        try:
+            return await asyncio.wait_for(reader.readline(), timeout)
+        finally:
+            writer.close()
+
+    async def probe(self, host, port):
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.timeout
+        while True:
+            remaining = deadline - loop.time()
+            try:
+                banner = await self.readBanner(host, port, max(self.interval, min(remaining, 5)))
+                if banner.startswith(b'SSH-'):
+                    return True
+            except (OSError, asyncio.TimeoutError):
+                pass
+            if loop.time() + self.interval >= deadline:
+                return False
+            await asyncio.sleep(self.interval)
+
+    async def probeNetworkElement(self, name, host, port, startTime, onReady):
+        ready = None
+        if self.timeout > 0:
+            ready = await self.probe(host, int(port))
+            self.addResult(name, host, port, timer() - startTime, ready)
+        if onReady is not None:
+            await asyncio.get_event_loop().run_in_executor(self.executor, onReady, ready)
+        return ready
+
+    def submitNetworkElement(self, name, host, port, startTime=None, onReady=None):
+        """Returns a future which is True once the NE is ready, False if it was not ready before the timeout, None
+        without probing; onReady(ready) is run before the future is done.
+
+        The time to ready is counted from startTime, e.g. the start of the container, or from now.
+        """
+        if startTime is None:
+            startTime = timer()
+        return asyncio.run_coroutine_threadsafe(self.probeNetworkElement(name, host, port, startTime, onReady),
+                                                self.getLoop())
+
+    def addResult(self, name, host, port, seconds, ready):
+        with self.lock:
+            if ready:
+                self.readySeconds[name] = seconds
+            else:
+                self.notReady.append(name)
+        if ready:
+            logger.info("NETCONF server of NE=%s at %s:%s was ready after %6.3f seconds", name, host, port, seconds)
+        else:
+            logger.error("NETCONF server of NE=%s at %s:%s was not ready after %6.3f seconds", name, host, port, seconds)
+
+    def getHistogram(self):
+        with self.lock:
+            values = list(self.readySeconds.values())
+        histogram = []
+        for bucket in HISTOGRAM_BUCKETS:
+            histogram.append({'le': bucket, 'count': sum(1 for value in values if value <= bucket)})
+        histogram.append({'le': '+Inf', 'count': len(values)})
+        return histogram
+
+    def getStatistics(self):
+        with self.lock:
+            values = sorted(self.readySeconds.values())
+            notReady = len(self.notReady)
+        statistics = {'ready': len(values), 'notReady': notReady, 'sumSeconds': sum(values), 'medianSeconds': None,
+                      'p90Seconds': None, 'maxSeconds': None, 'histogram': self.getHistogram()}
+        if values:
+            statistics['medianSeconds'] = values[(len(values) - 1) // 2]
+            statistics['p90Seconds'] = values[min(len(values) - 1, int(len(values) * 0.9))]
+            statistics['maxSeconds'] = values[-1]
+        return statistics
+
+    def printStatistics(self):
+        statistics = self.getStatistics()
+        if statistics['ready'] == 0 and statistics['notReady'] == 0:
+            return
+        print("NETCONF servers ready: %d, not ready: %d" % (statistics['ready'], statistics['notReady']))
+        if statistics['ready'] > 0:
+            print("Time to ready: median %6.3f, p90 %6.3f, max %6.3f seconds" %
+                  (statistics['medianSeconds'], statistics['p90Seconds'], statistics['maxSeconds']))
+        previousCount = 0
+        for bucket in statistics['histogram']:
+            # the counts of the histogram are cumulative
+            print("  <= %5s s: %d" % (bucket['le'], bucket['count'] - previousCount))
+            previousCount = bucket['count']
@@ -0,0 +1,95 @@
+import json
+import logging
+
+from wireless_emulator.topology import LINK_LAYERS, getLinkEnds, getNetworkElementLinkEnds, getLinkKey
+
+logger = logging.getLogger(__name__)
+
+# the steps of a reload, besides the bring-up ones
+REMOVE_NETWORK_ELEMENT_STEP = 'remove-network-element'
+REMOVE_LINK_STEP = 'remove-link'
+LINK_END_STEP = 'link-end'
+
+def getNetworkElementFingerprints(topoJson):
+    """Returns, by NE uuid, everything its container is built from: its JSON and the ends of its links.
+
+    Two NEs having the same fingerprint have the same XML documents and interface script, a running NE is kept when
+    its fingerprint did not change.
+    """
+    linkEnds = getLinkEnds(topoJson)
+    fingerprints = {}
+    for ne in topoJson['network-elements']:
+        neJson = ne['network-element']
+        fingerprints[neJson['uuid']] = json.dumps({'ne': neJson,
+                                                   'linkEnds': getNetworkElementLinkEnds(linkEnds, neJson['uuid'],
+                                                                                         neJson)},
+                                                  sort_keys=True)
+    return fingerprints
+
+def getLinkKeys(topoJson):
+    # (layer, link key) of every link, in the order of the JSON topology
+    return [(layer, getLinkKey(link)) for layer in LINK_LAYERS for link in topoJson['topologies'][layer]['links']]
+
+class TopologyChanges:
+    """What must be done to go from a running topology to another one.
+
+    A changed NE, i.e. one whose JSON or link ends changed, is created again with its addresses and ports. A link is
+    kept only when it is in both topologies and its two NEs are kept; the links of the removed and changed NEs are
+    removed with their containers, the others are removed from the NEs which are kept.
+    """
+
+    def __init__(self, oldTopoJson, newTopoJson):
+        oldFingerprints = getNetworkElementFingerprints(oldTopoJson)
+        newFingerprints = getNetworkElementFingerprints(newTopoJson)
+
+        # uuids of the NEs, in the order of the JSON topologies
+        self.removedNetworkElements = [ne['network-element']['uuid'] for ne in oldTopoJson['network-elements']
+                                       if ne['network-element']['uuid'] not in newFingerprints]
+        self.addedNetworkElements = []
+        self.changedNetworkElements = []
+        self.keptNetworkElements = set()
+        for ne in newTopoJson['network-elements']:
+            neUuid = ne['network-element']['uuid']
+            if neUuid not in oldFingerprints:
+                self.addedNetworkElements.append(neUuid)
+            elif oldFingerprints[neUuid] != newFingerprints[neUuid]:
+                self.changedNetworkElements.append(neUuid)
+            else:
+                self.keptNetworkElements.add(neUuid)
+
+        oldLinks = getLinkKeys(oldTopoJson)
+        newLinks = getLinkKeys(newTopoJson)
+        self.keptLinks = set(link for link in set(oldLinks) & set(newLinks) if self.isLinkKept(link))
+        self.removedLinks = [link for link in oldLinks if link not in self.keptLinks]
+        self.addedLinks = [link for link in newLinks if link not in self.keptLinks]
+
+    def recreateNetworkElements(self, neUuids):
+        # the NEs which a former reload could not create completely are created again, even when they did not change
+        for neUuid in neUuids:
+            if neUuid in self.keptNetworkElements:
+                self.keptNetworkElements.discard(neUuid)
+                self.changedNetworkElements.append(neUuid)
+        self.removedLinks += [link for link in self.keptLinks if not self.isLinkKept(link)]
+        self.addedLinks += [link for link in self.keptLinks if not self.isLinkKept(link)]
+        self.keptLinks = set(link for link in self.keptLinks if self.isLinkKept(link))
+
+    def isLinkKept(self, link):
+        layer, linkKey = link
+        return all(neUuid in self.keptNetworkElements for neUuid, ltp in linkKey)
+
+    def isEmpty(self):
+        return not (self.removedNetworkElements or self.addedNetworkElements or self.changedNetworkElements or
+                    self.removedLinks or self.addedLinks)
+
+    def printChanges(self):
+        print("Network Elements: %d added, %d removed, %d changed, %d unchanged" %
+              (len(self.addedNetworkElements), len(self.removedNetworkElements), len(self.changedNetworkElements),
+               len(self.keptNetworkElements)))
+        print("Links: %d added, %d removed, %d unchanged" %
+              (len(self.addedLinks), len(self.removedLinks), len(self.keptLinks)))
+        for neUuid in self.addedNetworkElements:
+            logger.info("NE=%s is added", neUuid)
+        for neUuid in self.removedNetworkElements:
+            logger.info("NE=%s is removed", neUuid)
+        for neUuid in self.changedNetworkElements:
+            logger.info("NE=%s is created again", neUuid)
@@ -0,0 +1,286 @@
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# samples kept for each NE, and seconds between two samples, when the configuration file does not give them
+RESOURCE_SAMPLES = 60
+RESOURCE_SAMPLE_INTERVAL = 1.0
+
+CGROUP_V1 = 'v1'
+CGROUP_V2 = 'v2'
+
+# flags of a network interface which is administratively up and has a carrier, e.g. both ends of a veth pair are up
+IFF_UP = 0x1
+IFF_RUNNING = 0x40
+
+def getCgroupMounts(mountsFileName='/proc/mounts'):
+    # the mount point of the cgroup v2 hierarchy and of the cpuacct and memory v1 controllers
+    mounts = {}
+    with open(mountsFileName) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 4:
+                continue
+            if fields[2] == 'cgroup2':
+                mounts.setdefault(CGROUP_V2, fields[1])
+            elif fields[2] == 'cgroup':
+                options = fields[3].split(',')
+                for controller in ['cpuacct', 'memory']:
+                    if controller in options:
+                        mounts.setdefault(controller, fields[1])
+    return mounts
+
+def getCgroupPaths(pid):
+    # the cgroup of each v1 controller of the process, and its v2 cgroup under the key ''
+    paths = {}
+    with open('/proc/%s/cgroup' % pid) as f:
+        for line in f:
+            fields = line.rstrip('\n').split(':', 2)
+            if len(fields) != 3:
+                continue
+            for controller in fields[1].split(','):
+                paths[controller] = fields[2]
+    return paths
+
+def readInterfaceCounters(pid):
+    # the counters of the interfaces of the network namespace of the process, by interface name
+    counters = {}
+    with open('/proc/%s/net/dev' % pid) as f:
+        for line in f.readlines()[2:]:
+            name, separator, values = line.partition(':')
+            fields = values.split()
+            if not separator or len(fields) < 16:
+                continue
+            counters[name.strip()] = tuple(int(field) for field in fields[0:4] + fields[8:12])
+    return counters
+
+def readInterfaceFlags(pid, interfaceNames, netDirectory=None):
+    # the flags of the interfaces, from the sysfs mounted in the container, which shows its network namespace
+    if netDirectory is None:
+        netDirectory = '/proc/%s/root/sys/class/net' % pid
+    flags = {}
+    for name in interfaceNames:
+        try:
+            with open(os.path.join(netDirectory, name, 'flags')) as f:
+                flags[name] = int(f.read().strip(), 16)
+        except (IOError, ValueError):
+            continue
+    return flags
+
+def isInterfaceUp(flags):
+    return flags is not None and flags & (IFF_UP | IFF_RUNNING) == IFF_UP | IFF_RUNNING
+
+def readInteger(fileName):
+    with open(fileName) as f:
+        value = f.read().strip()
+    if value == 'max':
+        return None
+    return int(value)
+
+def readKeyValues(fileName):
+    values = {}
+    with open(fileName) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 2:
+                values[fields[0]] = int(fields[1])
+    return values
+
+def getHostMemoryBytes():
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('MemTotal:'):
+                return int(line.split()[1]) * 1024
+    return None
+
+class ContainerCgroup:
+    """The cpu and memory accounting files of the cgroup of a container, found from the pid of its init process.
+
+    The cgroup v1 cpuacct and memory controllers are used when the container is in them, the v2 hierarchy
+    otherwise. The memory usage does not count the inactive page cache, like docker stats.
+    """
+
+    def __init__(self, pid, mounts):
+        paths = getCgroupPaths(pid)
+        if 'cpuacct' in mounts and 'memory' in mounts and 'cpuacct' in paths and 'memory' in paths:
+            self.version = CGROUP_V1
+            self.cpuDirectory = mounts['cpuacct'] + paths['cpuacct']
+            self.memoryDirectory = mounts['memory'] + paths['memory']
+        elif CGROUP_V2 in mounts and '' in paths:
+            self.version = CGROUP_V2
+            self.cpuDirectory = self.memoryDirectory = mounts[CGROUP_V2] + paths['']
+        else:
+            raise RuntimeError("Could not find the cgroup of the process %s" % pid)
+
+    def getCpuSeconds(self):
+        if self.version == CGROUP_V1:
+            return readInteger(os.path.join(self.cpuDirectory, 'cpuacct.usage')) / 1e9
+        return readKeyValues(os.path.join(self.cpuDirectory, 'cpu.stat'))['usage_usec'] / 1e6
+
+    def getMemory(self):
+        # the memory used and the limit of the container, None when it has no limit
+        if self.version == CGROUP_V1:
+            usage = readInteger(os.path.join(self.memoryDirectory, 'memory.usage_in_bytes'))
+            inactive = readKeyValues(os.path.join(self.memoryDirectory, 'memory.stat')).get('total_inactive_file', 0)
+            limit = readInteger(os.path.join(self.memoryDirectory, 'memory.limit_in_bytes'))
+        else:
+            usage = readInteger(os.path.join(self.memoryDirectory, 'memory.current'))
+            inactive = readKeyValues(os.path.join(self.memoryDirectory, 'memory.stat')).get('inactive_file', 0)
+            limit = readInteger(os.path.join(self.memoryDirectory, 'memory.max'))
+        return max(0, usage - inactive), limit
+
+class ResourceSampler:
+    """Samples the cpu and memory usage of the NE containers from their cgroups, in a background thread.
+
+    The last samples of every NE are kept in a ring buffer, the usage is then computed without waiting. The cpu
+    usage is in percent of one cpu, the memory usage in percent of the limit of the container, or of the memory of
+    the host, like docker stats.
+    """
+
+    def __init__(self, interval=RESOURCE_SAMPLE_INTERVAL, samples=RESOURCE_SAMPLES):
+        self.interval = interval
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.cgroups = {}
+        self.pids = {}
+        # NE uuid -> deque of (time, cpu percent, memory bytes, memory percent)
+        self.buffers = {}
+        # NE uuid -> interface name -> (rx bytes, packets, errors, dropped, tx bytes, packets, errors, dropped)
+        self.interfaceCounters = {}
+        # NE uuid -> interface name -> flags
+        self.interfaceFlags = {}
+        self.lastCpu = {}
+        self.hostMemoryBytes = None
+
+    def start(self, networkElements):
+        # networkElements gives the uuid and the pid of the init process of each container
+        self.hostMemoryBytes = getHostMemoryBytes()
+        self.addNetworkElements(networkElements)
+        logger.debug("Sampling the resources of %d containers every %.1f seconds", len(self.cgroups), self.interval)
+
+        self.thread = threading.Thread(target=self.run, name='resource-sampler', daemon=True)
+        self.thread.start()
+
+    def addNetworkElements(self, networkElements):
+        # also the NEs whose containers are created again, when the topology is reloaded
+        mounts = getCgroupMounts()
+        for neUuid, pid in networkElements:
+            try:
+                cgroup = ContainerCgroup(pid, mounts)
+            except (IOError, RuntimeError) as err:
+                logger.error("Could not find the cgroup of NE=%s: %s", neUuid, err)
+                cgroup = None
+            with self.lock:
+                self.pids[neUuid] = pid
+                self.lastCpu.pop(neUuid, None)
+                self.cgroups.pop(neUuid, None)
+                if cgroup is not None:
+                    self.cgroups[neUuid] = cgroup
+                    self.buffers[neUuid] = collections.deque(maxlen=self.samples)
+
+    def removeNetworkElements(self, neUuids):
+        with self.lock:
+            for neUuid in neUuids:
+                for values in [self.pids, self.cgroups, self.buffers, self.interfaceCounters, self.interfaceFlags,
+                               self.lastCpu]:
+                    values.pop(neUuid, None)
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stopEvent.set()
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while True:
+            self.takeSamples()
+            if self.stopEvent.wait(self.interval):
+                return
+
+    def takeSamples(self):
+        with self.lock:
+            cgroups = list(self.cgroups.items())
+            pids = list(self.pids.items())
+        for neUuid, cgroup in cgroups:
+            now = time.monotonic()
+            try:
+                cpuSeconds = cgroup.getCpuSeconds()
+                memoryBytes, limit = cgroup.getMemory()
+            except (IOError, ValueError, KeyError) as err:
+                # e.g. the container was stopped
+                logger.debug("Could not sample the resources of NE=%s: %s", neUuid, err)
+                continue
+
+            if limit is None or (self.hostMemoryBytes is not None and limit > self.hostMemoryBytes):
+                limit = self.hostMemoryBytes
+            memoryPercent = 0.0
+            if limit:
+                memoryPercent = 100.0 * memoryBytes / limit
+
+            with self.lock:
+                # the NE may have been removed or created again meanwhile
+                if self.cgroups.get(neUuid) is not cgroup:
+                    continue
+                previous = self.lastCpu.get(neUuid)
+                self.lastCpu[neUuid] = (now, cpuSeconds)
+                if previous is None or now <= previous[0]:
+                    continue
+                cpuPercent = 100.0 * max(0.0, cpuSeconds - previous[1]) / (now - previous[0])
+                self.buffers[neUuid].append((now, cpuPercent, memoryBytes, memoryPercent))
+
+        for neUuid, pid in pids:
+            try:
+                counters = readInterfaceCounters(pid)
+            except (IOError, ValueError) as err:
+                logger.debug("Could not read the interface counters of NE=%s: %s", neUuid, err)
+                counters = {}
+            flags = readInterfaceFlags(pid, counters)
+            with self.lock:
+                if self.pids.get(neUuid) == pid:
+                    self.interfaceCounters[neUuid] = counters
+                    self.interfaceFlags[neUuid] = flags
+
+    def getInterfaceCounters(self):
+        with self.lock:
+            return dict(self.interfaceCounters)
+
+    def getInterfaceFlags(self):
+        with self.lock:
+            return dict(self.interfaceFlags)
+
+    def getUsage(self, numberOfSamples=None):
+        """Returns the average cpu percent, memory bytes and memory percent of every NE over its last samples, and
+        their sum over all the NEs."""
+        perNe = {}
+        with self.lock:
+            for neUuid, buffer in self.buffers.items():
+                samples = list(buffer)
+                if numberOfSamples is not None:
+                    samples = samples[-numberOfSamples:]
+                if not samples:
+                    continue
+                perNe[neUuid] = tuple(sum(sample[i] for sample in samples) / len(samples) for i in range(1, 4))
+        total = tuple(sum(usage[i] for usage in perNe.values()) for i in range(3))
+        return perNe, total
+
+    def printUsage(self, numberOfSamples=None):
+        perNe, total = self.getUsage(numberOfSamples)
+        if not perNe:
+            print("No resource samples yet, they are taken every %.1f seconds" % self.interval)
+            return
+        print("%-20s %10s %12s %10s" % ("NE", "CPU [%]", "Memory [MiB]", "Memory [%]"))
+        for neUuid in sorted(perNe):
+            cpuPercent, memoryBytes, memoryPercent = perNe[neUuid]
+            print("%-20s %10.2f %12.1f %10.2f" % (neUuid, cpuPercent, memoryBytes / 1048576.0, memoryPercent))
+        print("%-20s %10.2f %12.1f %10.2f" % ("total", total[0], total[1] / 1048576.0, total[2]))
+        # the total in percent of all the cpus of the host
+        print('CPU Usage: %2.2f%%' % (total[0] / float(multiprocessing.cpu_count())))
+        print('Memory usage: %2.2f%%' % total[2])
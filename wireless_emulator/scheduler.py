@@ -0,0 +1,162 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+
+logger = logging.getLogger(__name__)
+
+# the resources used by the startup tasks, each one with its own number of workers
+DOCKER_TASKS = 'docker'
+NETLINK_TASKS = 'netlink'
+
+class Task:
+
+    def __init__(self, name, resource, function, dependencies):
+        self.name = name
+        self.resource = resource
+        self.function = function
+        self.dependencies = list(dependencies)
+        self.dependents = []
+        self.remainingDependencies = 0
+        self.startTime = None
+        self.endTime = None
+
+    def getSeconds(self):
+        return self.endTime - self.startTime
+
+class TaskScheduler:
+    """Runs each task as soon as the tasks it depends on are done, with at most limits[resource] tasks of a resource
+    running at once.
+
+    The first task which fails stops the scheduling: the running tasks are allowed to finish, the others are not
+    started, and run() raises the exception of the failed task, whose name is then in failedTask.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.tasks = {}
+        self.order = []
+        self.lock = threading.Condition()
+        self.running = 0
+        self.failedTask = None
+        self.exception = None
+
+    def addTask(self, name, resource, function, dependencies=()):
+        if name in self.tasks:
+            raise ValueError("Task %s was already added" % (name,))
+        if resource not in self.limits:
+            raise ValueError("Invalid resource %s of task %s" % (resource, name))
+        self.tasks[name] = Task(name, resource, function, dependencies)
+        self.order.append(name)
+        return name
+
+    def validate(self):
+        for task in self.tasks.values():
+            for dependency in task.dependencies:
+                if dependency not in self.tasks:
+                    raise ValueError("Task %s depends on the unknown task %s" % (task.name, dependency))
+
+        # Kahn's algorithm, every task must be reachable from the tasks without dependencies
+        remaining = {name: len(task.dependencies) for name, task in self.tasks.items()}
+        dependents = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dependency in task.dependencies:
+                dependents[dependency].append(task.name)
+        ready = [name for name in self.order if remaining[name] == 0]
+        visited = 0
+        while ready:
+            name = ready.pop()
+            visited += 1
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if visited != len(self.tasks):
+            raise ValueError("The dependencies of the tasks have a cycle")
+
+    def run(self):
+        self.validate()
+        for task in self.tasks.values():
+            task.remainingDependencies = len(task.dependencies)
+            for dependency in task.dependencies:
+                self.tasks[dependency].dependents.append(task)
+
+        executors = {resource: ThreadPoolExecutor(max_workers=max(1, limit)) for resource, limit in self.limits.items()}
+        try:
+            with self.lock:
+                for name in self.order:
+                    if self.tasks[name].remainingDependencies == 0:
+                        self.submit(executors, self.tasks[name])
+                while self.running > 0:
+                    self.lock.wait()
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+        if self.exception is not None:
+            raise self.exception
+
+    def submit(self, executors, task):
+        # called with the lock held
+        self.running += 1
+        executors[task.resource].submit(self.runTask, executors, task)
+
+    def runTask(self, executors, task):
+        task.startTime = timer()
+        exception = None
+        try:
+            task.function()
+        except BaseException as err:
+            exception = err
+        task.endTime = timer()
+
+        with self.lock:
+            self.running -= 1
+            if exception is not None:
+                if self.exception is None:
+                    logger.critical("Startup task %s failed: %s", task.name, exception)
+                    self.failedTask = task.name
+                    self.exception = exception
+            elif self.exception is None:
+                for dependent in task.dependents:
+                    dependent.remainingDependencies -= 1
+                    if dependent.remainingDependencies == 0:
+                        self.submit(executors, dependent)
+            self.lock.notify_all()
+
+    def isTaskDone(self, name):
+        # the task ran and did not fail, the tasks after a failure are not run
+        task = self.tasks.get(name)
+        return task is not None and task.endTime is not None and name != self.failedTask
+
+    def getCriticalPathSeconds(self):
+        # the longest chain of dependent tasks which ran, the shortest possible duration of the whole run
+        longest = {}
+        for name in self.getTopologicalOrder():
+            task = self.tasks[name]
+            if task.endTime is None:
+                continue
+            longest[name] = task.getSeconds() + max([longest.get(dependency, 0.0) for dependency in task.dependencies]
+                                                     or [0.0])
+        return max(longest.values() or [0.0])
+
+    def getTopologicalOrder(self):
+        order = []
+        visited = set()
+        for name in self.order:
+            stack = [(name, False)]
+            while stack:
+                current, expanded = stack.pop()
+                if expanded:
+                    order.append(current)
+                    continue
+                if current in visited:
+                    continue
+                visited.add(current)
+                stack.append((current, True))
+                for dependency in self.tasks[current].dependencies:
+                    stack.append((dependency, False))
+        return order
+
+    def getTotalTaskSeconds(self):
+        return sum(task.getSeconds() for task in self.tasks.values() if task.endTime is not None)
@@ -4,36 +4,57 @@ from wireless_emulator.link import Link
 
 logger=logging.getLogger(__name__)
 
+LINK_LAYERS = ['mwps', 'ety']
+
+def getLinkEnds(topoJson):
+    # the link ends of the JSON topology, by layer and (NE uuid, interface uuid)
+    linkEnds = {}
+    for layer in LINK_LAYERS:
+        linkEnds[layer] = {}
+        for link in topoJson['topologies'][layer]['links']:
+            for linkEnd in link:
+                linkEnds[layer].setdefault((linkEnd['uuid'], linkEnd['ltp']), linkEnd)
+    return linkEnds
+
+def getNetworkElementLinkEnds(linkEnds, neUuid, neJson):
+    # the link ends of the interfaces of an NE, which are used in its XML documents and interface script
+    result = []
+    for layer in sorted(linkEnds):
+        for intf in neJson.get('interfaces') or []:
+            for port in intf['LTPs']:
+                linkEnd = linkEnds[layer].get((neUuid, port['id']))
+                if linkEnd is not None:
+                    result.append([layer, port['id'], linkEnd])
+    return result
+
+def getLinkKey(linkEnds):
+    # the same for the same link ends, whatever their order
+    return tuple(sorted((linkEnd['uuid'], linkEnd['ltp']) for linkEnd in linkEnds))
+
 class Topology:
 
     def __init__(self, topologyDescription, topologyLayer):
         self.topologyDescription = topologyDescription
 
         self.linkList = []
+        self.linkedInterfaces = set()
 
         self.topologyLayer = topologyLayer
         logger.debug("Topology object was created")
 
-    def buildTopology(self):
-
-        if self.topologyLayer == 'mwps':
-            for link in self.topologyDescription['links']:
-                logger.debug("Creating link...")
+    def createLinks(self, keptLinks=None):
+        # only validates the link ends, the veth pairs are added by the emulator, once their containers are running;
+        # keptLinks gives the link objects, by link key, which are kept when the topology is reloaded
+        for link in self.topologyDescription['links']:
+            logger.debug("Creating link...")
+            linkObj = None
+            if keptLinks is not None:
+                linkObj = keptLinks.get(getLinkKey(link))
+            if linkObj is None:
                 linkObj = Link(link)
-                linkObj.addLink()
-                self.linkList.append(linkObj)
-                logger.debug("Link added to linkList...")
-        elif self.topologyLayer == 'ety':
-            for link in self.topologyDescription['links']:
-                logger.debug("Creating link...")
-                linkObj = Link(link)
-                linkObj.addLink()
-                self.linkList.append(linkObj)
-                logger.debug("Link added to linkList...")
+            self.linkList.append(linkObj)
+            self.linkedInterfaces.update(linkObj.interfacesObj)
+            logger.debug("Link added to linkList...")
 
     def isInterfaceObjPartOfLink(self, intfObj):
-
-        for link in self.linkList:
-            if link.isIntfPartOfLink(intfObj) is True:
-                return True
-        return False
\ No newline at end of file
+        return intfObj in self.linkedInterfaces
@@ -0,0 +1,171 @@
+import logging
+import threading
+
+from wireless_emulator.dockerapi import getDockerClient, DockerApiError
+
+logger = logging.getLogger(__name__)
+
+# the images of the NEs whose containers can be created in advance; the containers of the NETCONF server simulator
+# get their configuration in their environment, when they are created
+WARM_CONTAINER_IMAGES = ['openyuma']
+# the names of the warm containers start with it, followed by the run id
+WARM_CONTAINER_PREFIX = 'wte_warm_'
+# the network of the warm containers until an NE takes them, the default docker bridge
+WARM_CONTAINER_NETWORK = 'bridge'
+# seconds before trying again to create a warm container, after docker failed to
+WARM_CONTAINER_RETRY_INTERVAL = 10.0
+
+class WarmContainerPool:
+    """Docker containers created in advance, per image, which the NEs take instead of creating theirs.
+
+    The containers are created but not started: the NETCONF server reads its startup configuration when the
+    container starts, so the NE taking one renames it, connects it to its docker network, copies its files in it and
+    starts it. Their published ports cannot be changed once they are created, so a container publishing ports can
+    only be taken by the NE which reserved it, and which then has its ports. A background thread creates a new
+    container for every one taken, up to the size of the pool of each image.
+    """
+
+    def __init__(self, sizes, createContainer, namePrefix):
+        # sizes gives the number of warm containers of each image, createContainer(name, image) creates one and
+        # returns the NETCONF and SSH ports it publishes, or None
+        self.sizes = sizes
+        self.createContainer = createContainer
+        self.namePrefix = namePrefix
+        self.lock = threading.Lock()
+        self.wakeEvent = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self.createdContainers = 0
+        # image -> list of (container name, ports) which were not taken
+        self.containers = dict((image, []) for image in sizes)
+        # NE docker name -> (image, container name, ports) of the container it reserved
+        self.reservedContainers = {}
+        self.takenContainers = 0
+        self.coldContainers = 0
+
+    def start(self):
+        logger.debug("Keeping %s warm containers", ', '.join('%d %s' % (size, image)
+                                                              for image, size in sorted(self.sizes.items())))
+        self.thread = threading.Thread(target=self.run, name='warm-container-pool', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # the containers which were not taken are removed with the other containers of the run
+        if self.thread is None:
+            return
+        self.stopping = True
+        self.wakeEvent.set()
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while self.stopping is False:
+            image = self.getMissingImage()
+            if image is None:
+                self.wakeEvent.wait()
+                self.wakeEvent.clear()
+                continue
+            try:
+                self.addContainer(image)
+            except (DockerApiError, OSError) as err:
+                logger.error("Could not create a warm %s container: %s", image, err)
+                self.wakeEvent.wait(WARM_CONTAINER_RETRY_INTERVAL)
+                self.wakeEvent.clear()
+
+    def getMissingImage(self):
+        with self.lock:
+            for image, size in sorted(self.sizes.items()):
+                if len(self.containers[image]) < size:
+                    return image
+        return None
+
+    def addContainer(self, image):
+        with self.lock:
+            self.createdContainers += 1
+            name = '%s%d' % (self.namePrefix, self.createdContainers)
+        ports = self.createContainer(name, image)
+        with self.lock:
+            self.containers[image].append((name, ports))
+        logger.debug("Created warm %s container %s", image, name)
+
+    def reserveContainer(self, image, neName):
+        """Returns the NETCONF and SSH ports of a warm container publishing ports, which is then kept for the NE,
+        or None when there is none."""
+        with self.lock:
+            for index, (name, ports) in enumerate(self.containers.get(image, [])):
+                if ports is not None:
+                    del self.containers[image][index]
+                    self.reservedContainers[neName] = (image, name, ports)
+                    break
+            else:
+                return None
+        self.wakeEvent.set()
+        return ports
+
+    def releaseReservation(self, neName):
+        # the container reserved by an NE which failed or was removed before taking it goes back to the pool
+        with self.lock:
+            reservation = self.reservedContainers.pop(neName, None)
+            if reservation is None:
+                return
+            image, name, ports = reservation
+            self.containers[image].append((name, ports))
+        logger.debug("NE=%s released the warm container %s", neName, name)
+
+    def claimContainer(self, image, neName, network=None):
+        """Gives the NE the container it reserved, or a warm container publishing no ports, under its name and
+        connected to its network. Returns False when there is none, or when the container could not be given to the
+        NE and was removed; the NE then creates its container."""
+        with self.lock:
+            reservation = self.reservedContainers.pop(neName, None)
+            name = reservation[1] if reservation is not None else None
+            if name is None:
+                for index, (containerName, ports) in enumerate(self.containers.get(image, [])):
+                    if ports is None:
+                        name = containerName
+                        del self.containers[image][index]
+                        break
+            if name is None:
+                self.coldContainers += 1
+                return False
+        self.wakeEvent.set()
+
+        client = getDockerClient()
+        currentName = name
+        try:
+            client.renameContainer(name, neName)
+            currentName = neName
+            if network is not None:
+                client.disconnectNetwork(WARM_CONTAINER_NETWORK, neName)
+                client.connectNetwork(network, neName)
+        except (DockerApiError, OSError) as err:
+            logger.error("NE=%s could not take the warm container %s: %s", neName, name, err)
+            self.removeContainer(currentName)
+            with self.lock:
+                self.coldContainers += 1
+            return False
+        with self.lock:
+            self.takenContainers += 1
+        logger.debug("NE=%s took the warm container %s", neName, name)
+        return True
+
+    def removeContainer(self, name):
+        # its ports are then free for the container the NE creates
+        try:
+            getDockerClient().removeContainer(name, force=True)
+        except DockerApiError as err:
+            if err.status != 404:
+                logger.error("Could not remove the warm container %s: %s", name, err)
+        except OSError as err:
+            logger.error("Could not remove the warm container %s: %s", name, err)
+
+    def getStatistics(self):
+        with self.lock:
+            return {'taken': self.takenContainers,
+                    'created': self.coldContainers,
+                    'warm': sum(len(containers) for containers in self.containers.values())}
+
+    def printStatistics(self):
+        statistics = self.getStatistics()
+        print("Warm containers: %d taken by NEs, %d NEs created their container, %d warm containers left" %
+              (statistics['taken'], statistics['created'], statistics['warm']))
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+
+from wireless_emulator.performance import getPerformanceTimestamps
+
+logger = logging.getLogger(__name__)
+
+# changed when the format of the cache files changes
+XML_CACHE_VERSION = 1
+XML_CACHE_SUFFIX = '.xmlcache'
+
+# every timestamp is formatted by formatTimestamp, e.g. 2017-01-01T00:00:00.0Z
+TIMESTAMP = re.compile(rb'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\dZ')
+TIMESTAMP_LENGTH = 22
+
+def getFileDigest(fileName):
+    digest = hashlib.sha256()
+    with open(fileName, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def getSourceDigest():
+    # stands for the version of the emulator: any change of its code gives new keys
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for fileName in sorted(os.listdir(directory)):
+        if fileName.endswith('.py'):
+            digest.update(fileName.encode('utf-8'))
+            digest.update(getFileDigest(os.path.join(directory, fileName)).encode('utf-8'))
+    return digest.hexdigest()
+
+def getTimestamps(timeNow):
+    return [timestamp.encode('utf-8') for timestamp in getPerformanceTimestamps(timeNow)]
+
+def findTimestamps(data, timestamps):
+    """Returns the offset of every timestamp of data which is one of timestamps, followed by its index there.
+
+    The fixed timestamps of the XML templates are not in the list, they are kept as they are.
+    """
+    indexes = {timestamp: index for index, timestamp in enumerate(timestamps)}
+    positions = []
+    for match in TIMESTAMP.finditer(data):
+        index = indexes.get(match.group(0))
+        if index is not None:
+            positions.extend([match.start(), index])
+    return positions
+
+def insertTimestamps(data, positions, timestamps):
+    parts = []
+    last = 0
+    for i in range(0, len(positions), 2):
+        parts.append(data[last:positions[i]])
+        parts.append(timestamps[positions[i + 1]])
+        last = positions[i] + TIMESTAMP_LENGTH
+    parts.append(data[last:])
+    return b''.join(parts)
+
+class XmlDocumentCache:
+    """The serialized XML configuration and status documents of the NEs, kept in a folder across runs.
+
+    A document is found by a hash of everything it is built from: the JSON of the NE, the ends of its links, its
+    management address, the XML templates, the configuration values used in it and the code of the emulator. The
+    offsets of the performance timestamps are stored with the documents, the ones of the current run are put there
+    when they are loaded.
+    """
+
+    def __init__(self, directory, xmlConfigFile, xmlStatusFile, configJson):
+        self.directory = directory
+        self.lock = threading.Lock()
+        # the performance timestamps of the last time given to load or store
+        self.timestamps = (None, None)
+        self.hits = 0
+        self.misses = 0
+
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'version': XML_CACHE_VERSION,
+                                  'source': getSourceDigest(),
+                                  'configTemplate': getFileDigest(xmlConfigFile),
+                                  'statusTemplate': getFileDigest(xmlStatusFile),
+                                  'notificationPeriod': configJson.get('notificationPeriod')},
+                                 sort_keys=True).encode('utf-8'))
+        self.baseDigest = digest
+
+    def getKey(self, neJson, linkEnds, managementIp):
+        digest = self.baseDigest.copy()
+        digest.update(json.dumps({'ne': neJson, 'linkEnds': linkEnds, 'managementIp': managementIp},
+                                 sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def getFileName(self, key):
+        return os.path.join(self.directory, key + XML_CACHE_SUFFIX)
+
+    def load(self, key, timeNow):
+        # returns the configuration and status documents, or None when they are not in the cache
+        cached = None
+        fileName = self.getFileName(key)
+        if os.path.isfile(fileName):
+            try:
+                cached = self.readFile(fileName, timeNow)
+            except (IOError, ValueError, KeyError, IndexError) as err:
+                logger.warning("Ignoring the cached XML documents %s: %s", fileName, err)
+        with self.lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return cached
+
+    def readFile(self, fileName, timeNow):
+        with open(fileName, 'rb') as f:
+            header = json.loads(f.readline().decode('utf-8'))
+            data = f.read()
+        configLength = header['configLength']
+        if len(data) != configLength + header['statusLength']:
+            raise ValueError("truncated file")
+        timestamps = self.getTimestamps(timeNow)
+        return (insertTimestamps(data[:configLength], header['configTimestamps'], timestamps),
+                insertTimestamps(data[configLength:], header['statusTimestamps'], timestamps))
+
+    def getTimestamps(self, timeNow):
+        with self.lock:
+            if self.timestamps[0] != timeNow:
+                self.timestamps = (timeNow, getTimestamps(timeNow))
+            return self.timestamps[1]
+
+    def store(self, key, timeNow, config, status):
+        timestamps = self.getTimestamps(timeNow)
+        header = json.dumps({'configLength': len(config),
+                             'statusLength': len(status),
+                             'configTimestamps': findTimestamps(config, timestamps),
+                             'statusTimestamps': findTimestamps(status, timestamps)})
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # written under another name first, so a concurrent run never reads a partial file
+            fd, tempName = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header.encode('utf-8') + b'\n')
+                f.write(config)
+                f.write(status)
+            os.replace(tempName, self.getFileName(key))
+        except OSError as err:
+            logger.error("Could not write the cached XML documents %s: %s", key, err.strerror)
+
+    def getStatistics(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,39 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import wireless_emulator.emulator
+
+logger = logging.getLogger(__name__)
+
+def renderNetworkElementXml(index):
+    # runs in a worker process, on its own copy of the NE object: the XML model is built and serialized there, only
+    # the bytes of the documents are sent back
+    neObj = wireless_emulator.emulator.Emulator().networkElementList[index]
+    neObj.buildNetworkElementModel(True)
+    neObj.renderXmlDocuments()
+    return neObj.xmlConfigurationBytes, neObj.xmlStatusBytes
+
+class XmlRenderPool:
+    """Builds and serializes the XML documents of the NEs in worker processes, so that it is not serialized by the GIL.
+
+    The workers are forked once the emulator created all the NE objects: each one gets a copy of the topology, of the
+    parsed XML templates and of the NEs, with the addresses and ports already given to them, so nothing is allocated
+    twice and nothing but the serialized documents is pickled.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = None
+
+    def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('fork'))
+        logger.debug("Rendering the XML documents of the NEs in %d processes", self.workers)
+
+    def submit(self, index):
+        # index is the position of the NE in the networkElementList of the emulator
+        return self.executor.submit(renderNetworkElementXml, index)
+
+    def stop(self):
+        self.executor.shutdown(wait=True)
+        self.executor = None
@@ -0,0 +1,126 @@
+import logging
+import xml.etree.ElementTree as ET
+import copy
+import io
+
+logger = logging.getLogger(__name__)
+
+# XML namespaces needed when searching the config XML
+XML_NAMESPACES = {'microwave-model' : 'urn:onf:params:xml:ns:yang:microwave-model',
+                  'core-model' : 'urn:onf:params:xml:ns:yang:core-model',
+                  'onf-ethernet-conditional-packages' : 'urn:onf:params:xml:ns:yang:onf-ethernet-conditional-packages',
+                  'ptp' : 'urn:ietf:params:xml:ns:yang:ietf-ptp-dataset',
+                  'ptp-ex': 'urn:onf:params:xml:ns:yang:onf-ptp-dataset'}
+
+CONFIG_UNUSED_NODES = ['microwave-model:co-channel-group',
+                       'microwave-model:mw-air-interface-hsb-end-point-pac',
+                       'microwave-model:mw-air-interface-hsb-fc-switch-pac',
+                       'microwave-model:mw-air-interface-diversity-pac',
+                       'microwave-model:mw-hybrid-mw-structure-pac',
+                       'microwave-model:mw-tdm-container-pac',
+                       'core-model:operation-envelope',
+                       'ptp:transparent-clock-default-ds',
+                       'ptp:transparent-clock-port-ds-list']
+
+STATUS_UNUSED_NODES = ['co-channel-group',
+                       'mw-air-interface-hsb-end-point-pac',
+                       'mw-air-interface-hsb-fc-switch-pac',
+                       'mw-air-interface-diversity-pac',
+                       'mw-hybrid-mw-structure-pac',
+                       'mw-tdm-container-pac',
+                       'operation-envelope',
+                       'transparent-clock-default-ds',
+                       'transparent-clock-port-ds-list']
+
+def parseXmlFile(fileName, description):
+    try:
+        return ET.parse(fileName)
+    except (IOError, ET.ParseError) as err:
+        logger.critical("Could not parse XML default values %s file=%s: %s", description, fileName, err)
+        raise ValueError("Could not parse XML default values %s file=%s" % (description, fileName))
+
+def cutNode(parentNode, path, namespaces=None):
+    node = parentNode.find(path, namespaces)
+    parentNode.remove(node)
+    return node
+
+class XmlTemplates:
+    """The XML default values files, parsed and split in templates only once.
+
+    The skeletons are the documents without the repeated subtrees, every NE gets its own copy of them. The other
+    template nodes are shared by all the NEs and they must be deep copied before being changed.
+    """
+
+    def __init__(self, xmlConfigFile, xmlStatusFile):
+        self.namespaces = XML_NAMESPACES
+
+        self.configSkeleton = parseXmlFile(xmlConfigFile, "configuration").getroot()
+        self.splitConfigXml()
+
+        self.statusSkeleton = parseXmlFile(xmlStatusFile, "status").getroot()
+        self.splitStatusXml()
+
+        logger.debug("Parsed XML templates from %s and %s", xmlConfigFile, xmlStatusFile)
+
+    def splitConfigXml(self):
+        root = self.configSkeleton
+        ns = self.namespaces
+
+        self.airInterfacePacConfigXmlNode = cutNode(root, 'microwave-model:mw-air-interface-pac', ns)
+
+        networkElement = root.find('core-model:network-element', ns)
+        forwardingDomain = networkElement.find('core-model:fd', ns)
+        self.forwardingDomainForwardingConstructXmlNode = cutNode(forwardingDomain, 'core-model:fc', ns)
+        self.fdLtpXmlNode = cutNode(forwardingDomain, 'core-model:ltp', ns)
+        self.ltpConfigXmlNode = cutNode(networkElement, 'core-model:ltp', ns)
+
+        self.pureEthernetPacConfigXmlNode = cutNode(root, 'microwave-model:mw-pure-ethernet-structure-pac', ns)
+        self.ethernetContainerPacConfigXmlNode = cutNode(root, 'microwave-model:mw-ethernet-container-pac', ns)
+        self.forwardingConstructConfigXmlNode = cutNode(root, 'core-model:forwarding-construct', ns)
+        self.ethernetPacConfigXmlNode = cutNode(root, 'onf-ethernet-conditional-packages:ethernet-pac', ns)
+
+        self.ptpInstanceListConfigXmlNode = cutNode(root, 'ptp:instance-list', ns)
+        self.ptpPortDsListConfigXmlNode = cutNode(self.ptpInstanceListConfigXmlNode, 'ptp:port-ds-list', ns)
+
+        self.equipmentConfigXmlNode = cutNode(root, 'core-model:equipment', ns)
+
+        for path in CONFIG_UNUSED_NODES:
+            cutNode(root, path, ns)
+
+    def splitStatusXml(self):
+        root = self.statusSkeleton
+
+        self.airInterfaceStatusXmlNode = cutNode(root, 'mw-air-interface-pac')
+
+        networkElement = root.find('network-element')
+        self.ltpStatusXmlNode = cutNode(networkElement, 'ltp')
+
+        self.pureEthernetStatusXmlNode = cutNode(root, 'mw-pure-ethernet-structure-pac')
+        self.ethernetContainerStatusXmlNode = cutNode(root, 'mw-ethernet-container-pac')
+        self.forwardingConstructStatusXmlNode = cutNode(root, 'forwarding-construct')
+        self.ethernetPacStatusXmlNode = cutNode(root, 'ethernet-pac')
+
+        self.ptpInstanceListStatusXmlNode = cutNode(root, 'instance-list')
+        self.ptpPortDsListStatusXmlNode = cutNode(self.ptpInstanceListStatusXmlNode, 'port-ds-list')
+
+        self.equipmentStatusXmlNode = cutNode(root, 'equipment')
+
+        for path in STATUS_UNUSED_NODES:
+            cutNode(root, path)
+
+    def newConfigTree(self):
+        return ET.ElementTree(copy.deepcopy(self.configSkeleton))
+
+    def newStatusTree(self):
+        return ET.ElementTree(copy.deepcopy(self.statusSkeleton))
+
+def serializeXmlTree(tree):
+    # streams the tree into an in-memory buffer, the result is the same as tree.write(fileName) and it can be
+    # reused by every sink (archive uploaded in the container, debug dump)
+    buffer = io.BytesIO()
+    tree.write(buffer)
+    return buffer.getvalue()
+
+def writeXmlDebugFile(fileName, data):
+    with open(fileName, 'wb') as f:
+        f.write(data)